@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Cold-data archive: finished service_requests and payments, one file per month.
+
+    python archive.py [--database PATH] [--after-days N]    move due rows now
+    python archive.py status [--database PATH]
+
+Service requests that ended (completed, cancelled or missed) and completed
+payments older than ARCHIVE_AFTER_DAYS are moved out of the hot tables.
+Each row goes to archive/<database>-YYYY-MM.db next to the database, chosen
+by its scheduled_date or payment_date. The scheduler runs the move daily,
+batch_size rows at a time. A batch is first copied into its month files and
+committed there, and only then deleted from the hot table in a second
+transaction. Rows that changed in between are not deleted and are copied
+again on the next pass (each pass walks the ids once). A crash therefore never loses a row. It can leave a
+row in both places, and readers resolve that in favour of the hot copy.
+
+The dashboard counters still include archived rows: archived_totals (see
+stats.py) takes over the completed jobs and spend of every row moved out.
+
+History endpoints name their tables as {payments} and {service_requests}
+in their query. Archive.page() and Archive.rows() fill those in with a
+UNION ALL of the hot table and the month files. SQLite attaches at most 10
+databases to a connection, so the months are read ATTACH_LIMIT at a time,
+and the pieces are merged in keyset order. Archive.rows() reads every
+group on its own connection and merges the cursors as they are consumed.
+"""
+import argparse
+import functools
+import glob
+import heapq
+import json
+import os
+import re
+import sqlite3
+import sys
+from datetime import date
+
+from db_pool import PRAGMAS
+from pagination import Page, ordered, page_size
+from stats import ARCHIVED_TOTALS
+
+ARCHIVE_AFTER_DAYS = 180
+BATCH_SIZE = 500
+# Month files attached to one connection at a time (SQLite's limit is 10)
+ATTACH_LIMIT = 8
+
+ARCHIVED_STATUSES = ('completed', 'cancelled', 'missed')
+
+_IDS = '(SELECT value FROM json_each(:ids))'
+
+# table: (due rows as (id, 'YYYY-MM'), statements folding the rows into archived_totals)
+TABLES = {
+    'service_requests': (
+        '''SELECT id, substr(scheduled_date, 1, 7) FROM service_requests
+           WHERE status IN ('completed', 'cancelled', 'missed') AND scheduled_date < date(:today, :after)
+             AND id > :after_id
+           ORDER BY id LIMIT :batch_size''',
+        [f'''INSERT INTO archived_totals (user_id, completed_requests)
+             SELECT service_provider_id, COUNT(*) FROM service_requests
+             WHERE id IN {_IDS} AND status = 'completed' AND service_provider_id IS NOT NULL
+             GROUP BY service_provider_id
+             ON CONFLICT (user_id) DO UPDATE SET
+                 completed_requests = completed_requests + excluded.completed_requests''',
+         # Cancels out what the user_stats delete trigger is about to subtract
+         f'''UPDATE user_stats SET completed_requests = completed_requests + moved.n
+             FROM (SELECT service_provider_id AS user_id, COUNT(*) AS n FROM service_requests
+                   WHERE id IN {_IDS} AND status = 'completed' GROUP BY service_provider_id) AS moved
+             WHERE user_stats.user_id = moved.user_id''']),
+    # No (status, payment_date) index: payment-history would pick it over the customer's
+    # subscriptions. Due payments are the oldest rowids, so the scan finds them first.
+    'payments': (
+        '''SELECT id, substr(payment_date, 1, 7) FROM payments
+           WHERE status = 'completed' AND payment_date < date(:today, :after) AND id > :after_id
+           ORDER BY id LIMIT :batch_size''',
+        [f'''INSERT INTO archived_totals (user_id, total_spent)
+             SELECT s.customer_id, SUM(p.amount) FROM payments p JOIN subscriptions s ON s.id = p.subscription_id
+             WHERE p.id IN {_IDS} AND p.amount IS NOT NULL AND s.customer_id IS NOT NULL
+             GROUP BY s.customer_id
+             ON CONFLICT (user_id) DO UPDATE SET total_spent = total_spent + excluded.total_spent''',
+         f'''UPDATE user_stats SET total_spent = total_spent + moved.amount
+             FROM (SELECT s.customer_id AS user_id, SUM(p.amount) AS amount
+                   FROM payments p JOIN subscriptions s ON s.id = p.subscription_id
+                   WHERE p.id IN {_IDS} AND p.amount IS NOT NULL GROUP BY s.customer_id) AS moved
+             WHERE user_stats.user_id = moved.user_id''']),
+}
+
+# Created in every month file, for the history queries
+ARCHIVE_INDEXES = {
+    'service_requests': [('customer', 'customer_id, created_at'),
+                         ('provider_status', 'service_provider_id, status, scheduled_date'),
+                         ('subscription', 'subscription_id, status, scheduled_date')],
+    'payments': [('subscription_status', 'subscription_id, status, amount')],
+}
+
+
+def create_archive(c):
+    """Migration: counters of archived rows (created by migration 4 on new databases)"""
+    c.execute(ARCHIVED_TOTALS)
+
+
+def directory(database):
+    return os.path.join(os.path.dirname(os.path.abspath(database)), 'archive')
+
+
+def month_path(database, month):
+    stem = os.path.splitext(os.path.basename(database))[0]
+    return os.path.join(directory(database), f'{stem}-{month}.db')
+
+
+def months(database):
+    """Months with an archive file, newest first"""
+    stem = re.escape(os.path.splitext(os.path.basename(database))[0])
+    pattern = re.compile(rf'{stem}-(\d{{4}}-\d{{2}})\.db$')
+    found = (pattern.search(path) for path in glob.glob(os.path.join(directory(database), '*.db')))
+    return sorted((match.group(1) for match in found if match), reverse=True)
+
+
+def _schema(month):
+    return 'archive_' + month.replace('-', '_')
+
+
+def _columns(c, schema, table):
+    return [(row[1], row[2], row[5]) for row in c.execute(f'PRAGMA {schema}.table_info({table})')]
+
+
+def _attach(c, database, months, create=False):
+    if create:
+        os.makedirs(directory(database), exist_ok=True)
+    for month in months:
+        c.execute('ATTACH DATABASE ? AS ' + _schema(month), (month_path(database, month),))
+    return [_schema(month) for month in months]
+
+
+def _detach(c, schemas):
+    for schema in schemas:
+        c.execute(f'DETACH DATABASE {schema}')
+
+
+def _prepare(c, schema, table):
+    """Create or widen schema.table to match the hot table, with its indexes"""
+    c.execute(f'PRAGMA {schema}.journal_mode=WAL')
+    have = {name for name, _, _ in _columns(c, schema, table)}
+    hot = _columns(c, 'main', table)
+    if not have:
+        definitions = ', '.join(f'{name} INTEGER PRIMARY KEY' if pk else f'{name} {kind}'
+                                for name, kind, pk in hot)
+        c.execute(f'CREATE TABLE {schema}.{table} ({definitions})')
+    else:
+        for name, kind, _ in hot:
+            if name not in have:
+                c.execute(f'ALTER TABLE {schema}.{table} ADD COLUMN {name} {kind}')
+    for suffix, columns in ARCHIVE_INDEXES[table]:
+        c.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_{suffix} ON {table} ({columns})')
+
+
+def _move_batch(conn, database, table, rows):
+    """Copy rows [(id, month)] to their month files, then delete the unchanged ones"""
+    c = conn.cursor()
+    by_month = {}
+    for row_id, month in rows:
+        by_month.setdefault(month, []).append(row_id)
+    names = [name for name, _, _ in _columns(c, 'main', table)]
+    columns = ', '.join(names)
+    total = 0
+    months = sorted(by_month)
+    for start in range(0, len(months), ATTACH_LIMIT):
+        chunk = months[start:start + ATTACH_LIMIT]
+        schemas = _attach(c, database, chunk, create=True)
+        try:
+            for schema in schemas:
+                _prepare(c, schema, table)
+            c.execute('BEGIN IMMEDIATE')
+            try:
+                for month, schema in zip(chunk, schemas):
+                    c.execute(f'''INSERT OR REPLACE INTO {schema}.{table} ({columns})
+                                  SELECT {columns} FROM main.{table} WHERE id IN {_IDS}''',
+                              {'ids': json.dumps(by_month[month])})
+                c.execute('COMMIT')
+            except Exception:
+                c.execute('ROLLBACK')
+                raise
+
+            moved = []
+            c.execute('BEGIN IMMEDIATE')
+            try:
+                for month, schema in zip(chunk, schemas):
+                    same = ' AND '.join(f'a.{name} IS h.{name}' for name in names)
+                    moved += [row[0] for row in c.execute(
+                        f'''SELECT h.id FROM main.{table} h JOIN {schema}.{table} a ON a.id = h.id
+                            WHERE h.id IN {_IDS} AND {same}''', {'ids': json.dumps(by_month[month])})]
+                params = {'ids': json.dumps(moved)}
+                for statement in TABLES[table][1]:
+                    c.execute(statement, params)
+                c.execute(f'DELETE FROM main.{table} WHERE id IN {_IDS}', params)
+                c.execute('COMMIT')
+            except Exception:
+                c.execute('ROLLBACK')
+                raise
+        finally:
+            _detach(c, schemas)
+        total += len(moved)
+    return total
+
+
+def _database(conn):
+    return next(row[2] for row in conn.execute('PRAGMA database_list') if row[1] == 'main')
+
+
+def archive_history(conn, today, batch_size, heartbeat=None, after_days=ARCHIVE_AFTER_DAYS):
+    """Move finished rows older than after_days into the month files; returns rows moved"""
+    database = _database(conn)
+    params = {'today': today if isinstance(today, str) else today.isoformat(),
+              'after': f'-{after_days} days', 'batch_size': batch_size}
+    total = 0
+    for table, (due_sql, _) in TABLES.items():
+        # Keyset over id: rows that changed mid-move stay due, and wait for the next pass
+        params['after_id'] = 0
+        while True:
+            rows = conn.execute(due_sql, params).fetchall()
+            if rows:
+                total += _move_batch(conn, database, table, rows)
+                params['after_id'] = rows[-1][0]
+            if len(rows) < batch_size:
+                break
+            if heartbeat:
+                heartbeat()
+    return total
+
+
+def _sort_key(keyset):
+    """Key ordering row dicts as keyset orders rows; NULLs sort first in SQLite"""
+    columns = [(key, descending) for _, key, descending in keyset.columns]
+
+    def compare(a, b):
+        for key, descending in columns:
+            x, y = (a[key] is not None, a[key]), (b[key] is not None, b[key])
+            if x != y:
+                return (-1 if x < y else 1) * (-1 if descending else 1)
+        return 0
+    return functools.cmp_to_key(compare)
+
+
+def _sort(rows, keyset):
+    rows.sort(key=_sort_key(keyset))
+    return rows
+
+
+def _fetch(c, batch_size=BATCH_SIZE):
+    """c's rows as dicts, read batch_size at a time"""
+    while True:
+        rows = c.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield dict(row)
+
+
+class Archive:
+    """History reads over the hot tables plus the month files of database"""
+
+    def __init__(self, database):
+        self.database = database
+        self._hot_columns = {}
+
+    def months(self):
+        return months(self.database)
+
+    def hot(self, template):
+        """template over the hot tables only"""
+        return template.format(**{table: table for table in TABLES})
+
+    def _source(self, c, table, schemas, hot):
+        names = self._hot_columns.get(table)
+        if names is None:
+            names = self._hot_columns[table] = [name for name, _, _ in _columns(c, 'main', table)]
+        parts = [f'SELECT {", ".join(names)} FROM main.{table}'] if hot else []
+        for schema in schemas:
+            have = {name for name, _, _ in _columns(c, schema, table)}
+            if not have:
+                continue
+            select = ', '.join(name if name in have else f'NULL AS {name}' for name in names)
+            # A row still in the hot table (interrupted move) is read from there
+            parts.append(f'''SELECT {select} FROM {schema}.{table} a
+                             WHERE NOT EXISTS (SELECT 1 FROM main.{table} h WHERE h.id = a.id)''')
+        return f'({" UNION ALL ".join(parts)})' if parts else f'(SELECT * FROM main.{table} WHERE 0)'
+
+    def _groups(self, months):
+        return [months[start:start + ATTACH_LIMIT] for start in range(0, max(len(months), 1), ATTACH_LIMIT)]
+
+    def _fill(self, c, template, schemas, hot):
+        return template.format(**{table: self._source(c, table, schemas, hot) for table in TABLES})
+
+    def _chunks(self, c, template, months):
+        """Yield template filled in for each group of attached months, the hot tables first"""
+        for i, group in enumerate(self._groups(months)):
+            schemas = _attach(c, self.database, group)
+            try:
+                yield self._fill(c, template, schemas, i == 0)
+            finally:
+                _detach(c, schemas)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=10.0, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def rows(self, template, params, keyset, args, months=None):
+        """
+        (rows, close): every row of template in keyset order from the cursor
+        in args on, and the function that releases what produces them. Each
+        group of months is read on a connection of its own, and the cursors
+        are merged lazily, so only one fetch batch per group is in memory.
+        The statements run before this returns.
+        """
+        months = self.months() if months is None else months
+        connections = []
+
+        def close():
+            for conn in connections:
+                conn.close()
+
+        fingerprint = keyset.fingerprint(template, params)
+        cursors = []
+        try:
+            for i, group in enumerate(self._groups(months)):
+                conn = self._connect()
+                connections.append(conn)
+                c = conn.cursor()
+                query = self._fill(c, template, _attach(c, self.database, group), i == 0)
+                query, chunk_params = ordered(query, params, keyset, args, fingerprint)
+                cursors.append(c.execute(query, chunk_params))
+        except Exception:
+            close()
+            raise
+        return heapq.merge(*map(_fetch, cursors), key=_sort_key(keyset)), close
+
+    def page(self, c, template, params, keyset, args, months=None):
+        """One page of template, as pagination.paginate() would return it"""
+        months = self.months() if months is None else months
+        limit = page_size(args.get('limit'))
+        count = args.get('count') in ('1', 'true')
+        rows = []
+        total = 0 if count else None
+        fingerprint = keyset.fingerprint(template, params)
+        for query in self._chunks(c, template, months):
+            if count:
+                total += c.execute(f'SELECT COUNT(*) FROM ({query})', list(params)).fetchone()[0]
+            query, chunk_params = ordered(query, params, keyset, args, fingerprint)
+            rows += [dict(row) for row in c.execute(f'{query} LIMIT ?', chunk_params + [limit + 1])]
+        rows = _sort(rows, keyset)[:limit + 1]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = keyset.encode(rows[-1], fingerprint)
+        return Page(rows, next_cursor, total)
+
+
+def status(database):
+    """[(month, service_requests rows, payments rows, bytes)] for every month file"""
+    conn = sqlite3.connect(database)
+    report = []
+    for month in months(database):
+        schemas = _attach(conn, database, [month])
+        try:
+            counts = [conn.execute(f'SELECT COUNT(*) FROM {schemas[0]}.{table}').fetchone()[0]
+                      if _columns(conn, schemas[0], table) else 0 for table in TABLES]
+        finally:
+            _detach(conn, schemas)
+        report.append((month, *counts, os.path.getsize(month_path(database, month))))
+    conn.close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Move finished rows into the monthly archive')
+    parser.add_argument('command', nargs='?', choices=['run', 'status'], default='run')
+    parser.add_argument('--database', default='service_platform.db')
+    parser.add_argument('--after-days', type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.command == 'status':
+        for month, requests, payments, size in status(args.database):
+            print(f'{month}  {requests:>8} requests  {payments:>8} payments  {size / 1024:>10.1f} KiB')
+        return 0
+
+    conn = sqlite3.connect(args.database, timeout=10.0, isolation_level=None)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    moved = archive_history(conn, date.today(), args.batch_size, after_days=args.after_days)
+    conn.close()
+    print(f'Archived {moved} rows')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
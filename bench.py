@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+In-process endpoint benchmarks.
+
+Every /api route is driven through Flask's test client against generated
+datasets (dataset.py) of several sizes, as an anonymous visitor or as a
+logged-in customer or provider. For each scenario we record p50/p95/p99
+latency, throughput, error count and the peak memory allocated per request
+(tracemalloc, in a separate pass so tracing does not skew the timings).
+
+    python bench.py run --sizes small,medium --out results.json
+    python bench.py run --baseline baseline.json --threshold 0.25
+    python bench.py compare baseline.json results.json
+    python bench.py writes --clients 16 --ops 100
+
+Results are JSON; compare exits non-zero when any scenario's p95 grew by
+more than the threshold (and by more than --min-ms, to ignore noise).
+`writes` measures job-claim throughput and latency from concurrent client
+processes. It compares each process writing on its own connection, as
+request handlers do today, with every claim going through serve.py's
+single writer (writer.py).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+SIZES = {'small': 0.05, 'medium': 0.5, 'large': 2.0}
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'service_platform_bench')
+PASSWORD = 'password123'
+THRESHOLD = 0.25
+MIN_MS = 0.5
+
+
+class Scenario:
+    """
+    One request shape. path and body are callables taking the Context so
+    every iteration can target different rows; prepare runs unmeasured
+    before each request (e.g. creating the order a payment verifies).
+    """
+
+    def __init__(self, name, method, route, path, role=None, body=None, prepare=None, stream=False):
+        self.name = name
+        self.method = method
+        self.route = route
+        self.path = path
+        self.role = role
+        self.body = body
+        self.prepare = prepare
+        self.stream = stream
+
+
+class Context:
+    """Ids sampled from the dataset plus logged-in clients"""
+
+    def __init__(self, app_module, database, seed=0):
+        self.rng = random.Random(seed)
+        self.counter = 0
+        conn = sqlite3.connect(database)
+        ids = lambda sql: [row[0] for row in conn.execute(sql)]
+        self.customer_ids = ids("SELECT id FROM users WHERE role = 'customer' LIMIT 1000")
+        self.provider_ids = ids("SELECT id FROM users WHERE role = 'provider' LIMIT 1000")
+        self.service_ids = ids('SELECT id FROM services ORDER BY total_bookings DESC LIMIT 1000')
+        self.categories = ids('SELECT DISTINCT category FROM services')
+        self.customer = self.customer_ids[0]
+        self.provider = conn.execute('''SELECT service_provider_id FROM service_requests
+                                        WHERE service_provider_id IS NOT NULL
+                                        GROUP BY service_provider_id ORDER BY COUNT(*) DESC
+                                        LIMIT 1''').fetchone()[0]
+        self.provider_requests = ids(f'SELECT id FROM service_requests WHERE service_provider_id = {self.provider}'
+                                     ' LIMIT 1000')
+        self.open_jobs = ids("SELECT id FROM service_requests WHERE status = 'scheduled' ORDER BY id DESC")
+        self.notification_ids = ids('SELECT id FROM notifications WHERE user_id = 1 LIMIT 1000') or [1]
+        self.subscription_ids = ids('SELECT id FROM subscriptions WHERE customer_id = 1 LIMIT 100') or [1]
+        # /api/profile still edits the hardcoded test user 8
+        self.profile_email = (ids('SELECT email FROM users WHERE id = 8') or ['customer8@example.com'])[0]
+        conn.close()
+
+        self.app = app_module.app
+        self.clients = {None: self.app.test_client()}
+        for role, user_id in (('customer', self.customer), ('provider', self.provider)):
+            client = self.app.test_client()
+            response = client.post('/api/login', json={'email': f'{role}{user_id}@example.com',
+                                                        'password': PASSWORD})
+            assert response.status_code == 200, f'could not log in as {role} {user_id}'
+            self.clients[role] = client
+
+    def pick(self, items):
+        return self.rng.choice(items)
+
+    def unique(self):
+        self.counter += 1
+        return f'{os.getpid()}-{time.time_ns()}-{self.counter}'
+
+    def future(self, days=7):
+        return (date.today() + timedelta(days=days)).isoformat()
+
+
+def _create_order(ctx):
+    response = ctx.clients['customer'].post('/api/create-order', json={
+        'service_id': ctx.pick(ctx.service_ids), 'frequency': 'weekly', 'duration': 'monthly',
+        'start_date': ctx.future(), 'preferred_time': 'morning'})
+    order = response.get_json()
+    return {'razorpay_order_id': order['order_id'], 'razorpay_payment_id': f'pay_{ctx.unique()}',
+            'razorpay_signature': 'sig', 'subscription_id': order['subscription_id']}
+
+
+def scenarios():
+    return [
+        # Catalogue
+        Scenario('services list', 'GET', '/api/services', lambda ctx: '/api/services?limit=50'),
+        Scenario('services by category', 'GET', '/api/services',
+                 lambda ctx: f'/api/services?category={ctx.pick(ctx.categories)}&limit=50'),
+        Scenario('services search', 'GET', '/api/services',
+                 lambda ctx: f"/api/services?search={ctx.pick(['clean', 'repair', 'yoga', 'pest'])}"),
+        Scenario('service detail', 'GET', '/api/services/<int:service_id>',
+                 lambda ctx: f'/api/services/{ctx.pick(ctx.service_ids)}'),
+        Scenario('categories', 'GET', '/api/categories', lambda ctx: '/api/categories'),
+        Scenario('my services', 'GET', '/api/my-services', lambda ctx: '/api/my-services', 'provider'),
+        Scenario('create service', 'POST', '/api/services', lambda ctx: '/api/services', 'provider',
+                 body=lambda ctx: {'name': f'Bench Service {ctx.unique()}', 'description': 'Benchmark',
+                                   'category': ctx.pick(ctx.categories), 'price': 500,
+                                   'frequency_options': 'weekly,monthly'}),
+        # Accounts
+        Scenario('register', 'POST', '/api/register', lambda ctx: '/api/register',
+                 body=lambda ctx: {'name': 'Bench User', 'email': f'bench-{ctx.unique()}@example.com',
+                                   'password': PASSWORD}),
+        Scenario('login', 'POST', '/api/login', lambda ctx: '/api/login',
+                 body=lambda ctx: {'email': f'customer{ctx.pick(ctx.customer_ids)}@example.com',
+                                   'password': PASSWORD}),
+        Scenario('logout', 'POST', '/api/logout', lambda ctx: '/api/logout'),
+        Scenario('profile', 'GET', '/api/profile', lambda ctx: '/api/profile', 'customer'),
+        Scenario('update profile', 'PUT', '/api/profile', lambda ctx: '/api/profile', 'customer',
+                 body=lambda ctx: {'name': 'Test Customer', 'email': ctx.profile_email, 'city': 'Pune'}),
+        # Ordering and payment
+        Scenario('razorpay config', 'GET', '/api/razorpay/config', lambda ctx: '/api/razorpay/config'),
+        Scenario('create order', 'POST', '/api/create-order', lambda ctx: '/api/create-order', 'customer',
+                 body=lambda ctx: {'service_id': ctx.pick(ctx.service_ids), 'frequency': 'weekly',
+                                   'duration': 'monthly', 'start_date': ctx.future(),
+                                   'preferred_time': 'morning'}),
+        Scenario('verify payment', 'POST', '/api/verify-payment', lambda ctx: '/api/verify-payment',
+                 'customer', prepare=_create_order),
+        Scenario('cart checkout', 'POST', '/api/cart/checkout', lambda ctx: '/api/cart/checkout', 'customer',
+                 body=lambda ctx: {'items': [{'service_id': ctx.pick(ctx.service_ids), 'frequency': 'weekly',
+                                              'duration': 'monthly', 'start_date': ctx.future(),
+                                              'preferred_time': 'morning'} for _ in range(5)]}),
+        # Customer dashboard
+        Scenario('subscriptions', 'GET', '/api/subscriptions', lambda ctx: '/api/subscriptions', 'customer'),
+        Scenario('pause subscription', 'PUT', '/api/subscriptions/<int:sub_id>',
+                 lambda ctx: f'/api/subscriptions/{ctx.pick(ctx.subscription_ids)}', 'customer',
+                 body=lambda ctx: {'status': 'active'}),
+        Scenario('cancel subscription', 'DELETE', '/api/subscriptions/<int:sub_id>',
+                 lambda ctx: f'/api/subscriptions/{ctx.pick(ctx.subscription_ids)}', 'customer'),
+        Scenario('customer dashboard stats', 'GET', '/api/dashboard/stats',
+                 lambda ctx: '/api/dashboard/stats', 'customer'),
+        Scenario('upcoming schedules', 'GET', '/api/upcoming-schedules',
+                 lambda ctx: '/api/upcoming-schedules', 'customer'),
+        Scenario('payment history', 'GET', '/api/payment-history',
+                 lambda ctx: '/api/payment-history', 'customer'),
+        Scenario('customer requests', 'GET', '/api/customer/service-requests',
+                 lambda ctx: '/api/customer/service-requests', 'customer'),
+        Scenario('create request', 'POST', '/api/customer/service-requests',
+                 lambda ctx: '/api/customer/service-requests', 'customer',
+                 body=lambda ctx: {'service_category': ctx.pick(ctx.categories), 'location': 'Pune',
+                                   'scheduled_date': ctx.future(3), 'scheduled_time': '10:00 AM'}),
+        Scenario('notifications', 'GET', '/api/notifications', lambda ctx: '/api/notifications', 'customer'),
+        Scenario('mark notification read', 'PUT', '/api/notifications/<int:notification_id>/read',
+                 lambda ctx: f'/api/notifications/{ctx.pick(ctx.notification_ids)}/read', 'customer'),
+        Scenario('notifications since', 'GET', '/api/notifications',
+                 lambda ctx: f'/api/notifications?since_id={ctx.pick(ctx.notification_ids)}', 'customer'),
+        Scenario('unread count', 'GET', '/api/notifications/unread-count',
+                 lambda ctx: '/api/notifications/unread-count', 'customer'),
+        Scenario('mark notifications read', 'PUT', '/api/notifications/read',
+                 lambda ctx: '/api/notifications/read', 'customer',
+                 body=lambda ctx: {'ids': [ctx.pick(ctx.notification_ids) for _ in range(10)]}),
+        Scenario('event stream first byte', 'GET', '/api/events', lambda ctx: '/api/events', 'customer',
+                 stream=True),
+        # Provider dashboard
+        Scenario('provider dashboard stats', 'GET', '/api/dashboard/stats',
+                 lambda ctx: '/api/dashboard/stats', 'provider'),
+        Scenario('available jobs', 'GET', '/api/available-jobs',
+                 lambda ctx: '/api/available-jobs?limit=50', 'provider'),
+        Scenario('provider requests', 'GET', '/api/service-requests',
+                 lambda ctx: '/api/service-requests?status=completed', 'provider'),
+        Scenario('update request', 'PUT', '/api/service-requests/<int:req_id>',
+                 lambda ctx: f'/api/service-requests/{ctx.pick(ctx.provider_requests)}', 'provider',
+                 body=lambda ctx: {'provider_notes': 'benchmark'}),
+        Scenario('provider customer requests', 'GET', '/api/provider/customer-requests',
+                 lambda ctx: '/api/provider/customer-requests', 'provider'),
+        Scenario('accept job', 'POST', '/api/accept-job/<int:job_id>',
+                 lambda ctx: f'/api/accept-job/{ctx.open_jobs.pop()}', 'provider'),
+        # Exports
+        Scenario('export payments', 'GET', '/api/exports/<kind>',
+                 lambda ctx: f"/api/exports/payments?since={(date.today() - timedelta(days=365)).isoformat()}",
+                 'provider'),
+        Scenario('export service history', 'GET', '/api/exports/<kind>',
+                 lambda ctx: '/api/exports/service_requests?format=ndjson', 'customer'),
+        # Operational endpoints
+        Scenario('pool stats', 'GET', '/api/pool/stats', lambda ctx: '/api/pool/stats'),
+        Scenario('cache stats', 'GET', '/api/cache/stats', lambda ctx: '/api/cache/stats'),
+        Scenario('claim stats', 'GET', '/api/claims/stats', lambda ctx: '/api/claims/stats'),
+    ]
+
+
+def _request(ctx, scenario):
+    client = ctx.clients[scenario.role]
+    kwargs = scenario.prepare(ctx) if scenario.prepare else {}
+    body = scenario.body(ctx) if scenario.body else kwargs or None
+    path = scenario.path(ctx)
+
+    start = time.perf_counter()
+    response = client.open(path, method=scenario.method, json=body, buffered=not scenario.stream)
+    if scenario.stream:
+        next(iter(response.response))
+    elapsed = time.perf_counter() - start
+    response.close()
+    return elapsed, response.status_code
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def measure(ctx, scenario, iterations, warmup=3, traced=10):
+    for _ in range(warmup):
+        _request(ctx, scenario)
+
+    latencies, errors = [], 0
+    wall = time.perf_counter()
+    for _ in range(iterations):
+        elapsed, status = _request(ctx, scenario)
+        latencies.append(elapsed)
+        errors += status >= 400
+    wall = time.perf_counter() - wall
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(traced):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            _request(ctx, scenario)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'route': scenario.route,
+        'method': scenario.method,
+        'iterations': iterations,
+        'errors': errors,
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'throughput_rps': round(iterations / wall, 1),
+        'alloc_peak_kib': round(_percentile(peaks, 0.50) / 1024, 1),
+    }
+
+
+def dataset_path(size, scale, seed, data_dir=DATA_DIR):
+    """Generated once per (size, seed) and reused; generation is deterministic"""
+    from migrations import LATEST_VERSION
+    path = os.path.join(data_dir, f'{size}-{scale}-{seed}-v{LATEST_VERSION}.db')
+    if not os.path.exists(path):
+        from dataset import generate
+        from manage import connect, init_database
+        os.makedirs(data_dir, exist_ok=True)
+        partial = path + '.partial'
+        for leftover in (partial, partial + '-wal', partial + '-shm'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        init_database(partial, catalogue=False)
+        conn = connect(partial)
+        generate(conn, scale=scale, seed=seed)
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.close()
+        os.replace(partial, path)
+    return path
+
+
+def run(sizes, iterations=100, seed=0, only=None, data_dir=DATA_DIR, log=print):
+    import app as app_module
+
+    results = {}
+    for size in sizes:
+        scale = SIZES.get(size) or float(size)
+        source = dataset_path(size, scale, seed, data_dir)
+        # Scenarios write, so every run works on a throwaway copy
+        workdir = tempfile.mkdtemp(prefix='bench-')
+        database = os.path.join(workdir, 'bench.db')
+        shutil.copyfile(source, database)
+        try:
+            app_module.DATABASE = database
+            app_module.app.extensions.pop('response_cache', None)
+            ctx = Context(app_module, database, seed)
+            results[size] = {}
+            for scenario in scenarios():
+                if only and not any(term in scenario.name for term in only):
+                    continue
+                stats = measure(ctx, scenario, iterations)
+                results[size][scenario.name] = stats
+                log(f"{size:7} {scenario.name:28} p50 {stats['p50_ms']:8.2f}  p95 {stats['p95_ms']:8.2f}  "
+                    f"p99 {stats['p99_ms']:8.2f} ms  {stats['throughput_rps']:8.1f} req/s  "
+                    f"{stats['alloc_peak_kib']:8.1f} KiB" + (f"  {stats['errors']} errors" if stats['errors'] else ''))
+        finally:
+            pool = app_module.app.extensions.pop('db_pool', None)
+            if pool is not None:
+                pool.close_all()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'iterations': iterations,
+            'seed': seed,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def _write_client(database, address, jobs, provider_id, results):
+    """Client process: claim jobs one after another, like a provider clicking through"""
+    import claims
+    import writer
+    from db_pool import PRAGMAS
+    conn = sqlite3.connect(database, timeout=10.0, isolation_level=None)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    client = writer.WriterClient(address) if address else None
+    latencies, errors = [], 0
+    for job_id in jobs:
+        start = time.perf_counter()
+        outcome, _ = claims.claim_job(conn, job_id, provider_id, client=client)
+        latencies.append(time.perf_counter() - start)
+        errors += outcome != claims.CLAIMED
+    results.put((latencies, errors))
+
+
+def write_load(size='small', clients=16, ops=100, max_batch=64, max_wait=0.002, seed=0,
+               data_dir=DATA_DIR, log=print):
+    """Claims from `clients` processes: per-process connections ('direct') vs the single writer"""
+    import claims  # noqa: F401 -- registers the claim_job intent before the writer forks
+    import writer
+    scale = SIZES.get(size) or float(size)
+    source = dataset_path(size, scale, seed, data_dir)
+    context = multiprocessing.get_context('fork')
+    results = {}
+    for mode in ('direct', 'writer'):
+        workdir = tempfile.mkdtemp(prefix='bench-writes-')
+        database = os.path.join(workdir, 'bench.db')
+        shutil.copyfile(source, database)
+        conn = sqlite3.connect(database)
+        jobs = [row[0] for row in conn.execute(
+            "SELECT id FROM service_requests WHERE status = 'scheduled' ORDER BY id LIMIT ?", (clients * ops,))]
+        providers = [row[0] for row in conn.execute("SELECT id FROM users WHERE role = 'provider' LIMIT ?",
+                                                    (clients,))]
+        conn.close()
+
+        server = address = None
+        if mode == 'writer':
+            address = os.path.join(workdir, 'writer.sock')
+            server = context.Process(target=writer.WriterServer(database, address, max_batch, max_wait).serve_forever)
+            server.start()
+            while not os.path.exists(address):
+                time.sleep(0.01)
+        queue = context.Queue()
+        processes = [context.Process(target=_write_client,
+                                     args=(database, address, jobs[i::clients], providers[i % len(providers)], queue))
+                     for i in range(clients)]
+        wall = time.perf_counter()
+        for process in processes:
+            process.start()
+        latencies, errors = [], 0
+        for _ in processes:
+            client_latencies, client_errors = queue.get()
+            latencies += client_latencies
+            errors += client_errors
+        wall = time.perf_counter() - wall
+        for process in processes:
+            process.join()
+        if server is not None:
+            server.terminate()
+            server.join()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+        stats = results[mode] = {
+            'clients': clients,
+            'writes': len(latencies),
+            'errors': errors,
+            'p50_ms': round(_percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(_percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(_percentile(latencies, 0.99) * 1000, 3),
+            'max_ms': round(max(latencies) * 1000, 3),
+            'throughput_wps': round(len(latencies) / wall, 1),
+        }
+        log(f"{mode:7} {stats['writes']:6} claims  p50 {stats['p50_ms']:8.2f}  p95 {stats['p95_ms']:8.2f}  "
+            f"p99 {stats['p99_ms']:8.2f}  max {stats['max_ms']:8.2f} ms  {stats['throughput_wps']:8.1f} writes/s"
+            + (f"  {errors} errors" if errors else ''))
+    return results
+
+
+def compare(baseline, current, threshold=THRESHOLD, min_ms=MIN_MS, metric='p95_ms'):
+    """[(size, scenario, baseline, current)] for every scenario that regressed"""
+    regressions = []
+    for size, scenarios_ in current['results'].items():
+        for name, stats in scenarios_.items():
+            before = baseline['results'].get(size, {}).get(name)
+            if before is None:
+                continue
+            if stats[metric] > before[metric] * (1 + threshold) and stats[metric] - before[metric] > min_ms:
+                regressions.append((size, name, before[metric], stats[metric]))
+    return regressions
+
+
+def _report(regressions, threshold):
+    for size, name, before, after in regressions:
+        print(f'❌ {size} {name}: p95 {before:.2f} ms -> {after:.2f} ms')
+    if regressions:
+        print(f'\n{len(regressions)} scenarios regressed by more than {threshold:.0%}')
+        return 1
+    print('✅ No regressions')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    bench = commands.add_parser('run')
+    bench.add_argument('--sizes', default='small', help=f"comma separated: {', '.join(SIZES)} or a scale")
+    bench.add_argument('--iterations', type=int, default=100)
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--only', default=None, help='comma separated scenario name filters')
+    bench.add_argument('--data-dir', default=DATA_DIR)
+    bench.add_argument('--out', default=None)
+    bench.add_argument('--baseline', default=None)
+    bench.add_argument('--threshold', type=float, default=THRESHOLD)
+    bench.add_argument('--min-ms', type=float, default=MIN_MS)
+
+    check = commands.add_parser('compare')
+    check.add_argument('baseline')
+    check.add_argument('current')
+    check.add_argument('--threshold', type=float, default=THRESHOLD)
+    check.add_argument('--min-ms', type=float, default=MIN_MS)
+
+    writes = commands.add_parser('writes')
+    writes.add_argument('--size', default='small')
+    writes.add_argument('--clients', type=int, default=16)
+    writes.add_argument('--ops', type=int, default=100, help='claims per client')
+    writes.add_argument('--max-batch', type=int, default=64)
+    writes.add_argument('--max-wait-ms', type=float, default=2.0)
+    writes.add_argument('--data-dir', default=DATA_DIR)
+    writes.add_argument('--out', default=None)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'writes':
+        results = write_load(args.size, args.clients, args.ops, args.max_batch, args.max_wait_ms / 1000,
+                             data_dir=args.data_dir)
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f'Wrote {args.out}')
+        return 0
+
+    if args.command == 'run':
+        only = args.only.split(',') if args.only else None
+        results = run(args.sizes.split(','), args.iterations, args.seed, only, args.data_dir)
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f'Wrote {args.out}')
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            return _report(compare(baseline, results, args.threshold, args.min_ms), args.threshold)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    return _report(compare(baseline, current, args.threshold, args.min_ms), args.threshold)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Read-through cache for the catalogue endpoints.
+
+Entries are keyed on the endpoint plus its normalised query string and carry
+tags ('service:<id>', 'category:<name>', ...). Writes invalidate by tag, so
+creating a service only drops the listings it can appear in. The storage is a
+backend: MemoryBackend is a per-process LRU with TTLs, SQLiteBackend stores
+entries in a shared SQLite file as a local stand-in for a cache shared
+between worker processes.
+
+Tag invalidation only reaches the process that made the write, and a fill
+that started before an invalidation can store what it read afterwards. So an
+entry may also carry a version, the data_versions counters its query read
+(see versions.py), taken before the fill. A read whose current version
+differs is a miss. That way writes from other workers, and writes racing a
+fill, are never served.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+DEFAULT_TTL = 60
+MAX_ENTRIES = 1024
+
+
+def make_key(endpoint, args=()):
+    """'endpoint?a=1&b=2' with arguments sorted and empty values dropped"""
+    items = sorted((name, value) for name, value in args if value not in (None, ''))
+    return f'{endpoint}?{urlencode(items)}' if items else endpoint
+
+
+class MemoryBackend:
+    """Thread-safe LRU with per-entry expiry and a tag -> keys index"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tags = {}
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires, _ = entry
+            if expires <= time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, tags=()):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, time.monotonic() + ttl, frozenset(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tags):
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.get(tag, set())
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def size(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class SQLiteBackend:
+    """Entries in a shared SQLite file so every worker sees one cache"""
+
+    def __init__(self, path, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._local = threading.local()
+        c = self._conn()
+        c.execute('''CREATE TABLE IF NOT EXISTS cache_entries (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires REAL NOT NULL,
+            used REAL NOT NULL
+        )''')
+        c.execute('''CREATE TABLE IF NOT EXISTS cache_tags (
+            tag TEXT NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (tag, key)
+        ) WITHOUT ROWID''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags (key)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_cache_entries_used ON cache_entries (used)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        c = self._conn()
+        now = time.time()
+        row = c.execute('SELECT value, expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            self._delete(c, [key])
+            return None
+        c.execute('UPDATE cache_entries SET used = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl, tags=()):
+        c = self._conn()
+        now = time.time()
+        c.execute('BEGIN IMMEDIATE')
+        try:
+            c.execute('DELETE FROM cache_tags WHERE key = ?', (key,))
+            c.execute('INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?)',
+                      (key, json.dumps(value), now + ttl, now))
+            c.executemany('INSERT OR IGNORE INTO cache_tags VALUES (?, ?)',
+                          [(tag, key) for tag in tags])
+            excess = c.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0] - self.max_entries
+            if excess > 0:
+                victims = [row[0] for row in c.execute(
+                    'SELECT key FROM cache_entries ORDER BY used LIMIT ?', (excess,))]
+                self._delete(c, victims)
+                self.evictions += len(victims)
+            c.execute('COMMIT')
+        except Exception:
+            c.execute('ROLLBACK')
+            raise
+
+    def invalidate(self, tags):
+        c = self._conn()
+        marks = ', '.join('?' * len(tags))
+        keys = [row[0] for row in c.execute(
+            f'SELECT DISTINCT key FROM cache_tags WHERE tag IN ({marks})', list(tags))]
+        self._delete(c, keys)
+        return len(keys)
+
+    def clear(self):
+        c = self._conn()
+        c.execute('DELETE FROM cache_tags')
+        c.execute('DELETE FROM cache_entries')
+
+    def size(self):
+        return self._conn().execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+
+    def _delete(self, c, keys):
+        for key in keys:
+            c.execute('DELETE FROM cache_tags WHERE key = ?', (key,))
+            c.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+
+class Cache:
+    def __init__(self, backend=None, default_ttl=DEFAULT_TTL):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_or_set(self, key, compute, ttl=None, tags=(), version=None):
+        """
+        Return the cached value for key, or call compute() and store its
+        result. compute may return None to mean "don't cache this". version
+        (a JSON list, read before compute runs) must equal the stored one
+        for a hit.
+        """
+        entry = self.backend.get(key)
+        if entry is not None and entry[0] == version:
+            with self._lock:
+                self.hits += 1
+            return entry[1], True
+
+        with self._lock:
+            self.misses += 1
+        value = compute()
+        if value is not None:
+            self.backend.set(key, [version, value], ttl or self.default_ttl, tags)
+        return value, False
+
+    def invalidate(self, *tags):
+        if not tags:
+            return 0
+        dropped = self.backend.invalidate(tags)
+        with self._lock:
+            self.invalidations += dropped
+        return dropped
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            hits, misses, invalidations = self.hits, self.misses, self.invalidations
+        lookups = hits + misses
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': self.backend.size(),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'invalidated': invalidations,
+            'evictions': self.backend.evictions,
+        }
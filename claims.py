@@ -0,0 +1,112 @@
+"""
+Atomic job claiming for providers.
+
+A claim is a single conditional UPDATE ... WHERE status = 'scheduled'
+RETURNING inside BEGIN IMMEDIATE, so exactly one provider can win a request
+no matter how many click at once, and the writer lock is held for one
+statement plus the customer's outbox row (see outbox.py). The claim is an
+ordinary write intent, so SQLITE_BUSY is retried with jittered exponential
+backoff where the transaction begins (see writer.commit_group), and a
+database or writer that stays busy comes back as BUSY.
+"""
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import TimeoutError
+
+import outbox
+import writer
+from writer import is_busy, percentile_ms
+
+CLAIMED = 'claimed'
+LOST = 'lost'
+NOT_FOUND = 'not_found'
+BUSY = 'busy'
+
+MAX_RETRIES = writer.BUSY_RETRIES
+
+
+class ClaimMetrics:
+    def __init__(self, window=2048):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.counts = {CLAIMED: 0, LOST: 0, NOT_FOUND: 0, BUSY: 0}
+
+    def record(self, outcome, seconds):
+        with self._lock:
+            self.counts[outcome] += 1
+            self._latencies.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counts = dict(self.counts)
+
+        contested = counts[CLAIMED] + counts[LOST]
+        return {
+            'attempts': sum(counts.values()),
+            'claimed': counts[CLAIMED],
+            'lost_races': counts[LOST],
+            'not_found': counts[NOT_FOUND],
+            'busy_failures': counts[BUSY],
+            'conflict_rate': round(counts[LOST] / contested, 4) if contested else 0.0,
+            'latency_p50_ms': percentile_ms(latencies, 0.50),
+            'latency_p95_ms': percentile_ms(latencies, 0.95),
+            'latency_p99_ms': percentile_ms(latencies, 0.99),
+        }
+
+
+metrics = ClaimMetrics()
+
+
+@writer.intent('claim_job')
+def claim(c, job_id, provider_id):
+    """The claim itself, inside the caller's transaction; returns (outcome, job)"""
+    c.execute('''UPDATE service_requests
+                 SET service_provider_id = ?, status = 'accepted', updated_at = CURRENT_TIMESTAMP
+                 WHERE id = ? AND status = 'scheduled'
+                 RETURNING id, service_category,
+                     COALESCE(customer_id, (SELECT customer_id FROM subscriptions
+                                            WHERE id = service_requests.subscription_id))
+                         AS customer_id''',
+              (provider_id, job_id))
+    job = c.fetchone()
+
+    if job is None:
+        c.execute('SELECT 1 FROM service_requests WHERE id = ?', (job_id,))
+        return (LOST if c.fetchone() else NOT_FOUND), None
+
+    job = dict(zip(('id', 'service_category', 'customer_id'), job))
+    outbox.notify(c, job['customer_id'], 'Service Request Accepted',
+                  f"Your service request for {job['service_category'] or 'your subscription'} "
+                  'has been accepted by a provider.',
+                  'service_accepted', {'request_id': job['id']})
+    return CLAIMED, job
+
+
+def claim_job(conn, job_id, provider_id, max_retries=MAX_RETRIES, client=None):
+    """
+    Try to assign a scheduled request to provider_id.
+
+    Returns (outcome, job) where outcome is CLAIMED, LOST (another provider
+    got there first), NOT_FOUND or BUSY (the database stayed locked, or the
+    writer process did not answer in time or went away). With a writer.WriterClient or
+    WriteBatcher the claim is committed by that writer; otherwise on conn.
+    """
+    start = time.perf_counter()
+    try:
+        if client is not None:
+            outcome, job = client.call('claim_job', job_id=job_id, provider_id=provider_id)
+        else:
+            outcome, job = writer.run(conn, 'claim_job', {'job_id': job_id, 'provider_id': provider_id},
+                                      max_retries)
+    except (sqlite3.OperationalError, writer.WriteFailed) as e:
+        if not (is_busy(e) or isinstance(e, writer.WriterUnavailable)):
+            raise
+        outcome, job = BUSY, None
+    except TimeoutError:
+        outcome, job = BUSY, None
+
+    metrics.record(outcome, time.perf_counter() - start)
+    return outcome, job
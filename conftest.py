@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Shared test fixtures
+"""
+import pytest
+
+from manage import init_database
+
+# app.extensions entries tied to app.DATABASE, and how to shut each one down
+APP_RESOURCES = {
+    'outbox': 'stop',
+    'write_batcher': 'stop',
+    'writer': 'close',
+    'db_pool': 'close_all',
+    'response_cache': None,
+    'matching_index': None,
+    'archive': None,
+}
+
+
+def reset_app(app_module):
+    """Drop every pool, writer, dispatcher and cache the last test left on the app"""
+    for name, shutdown in APP_RESOURCES.items():
+        resource = app_module.app.extensions.pop(name, None)
+        if resource is not None and shutdown:
+            getattr(resource, shutdown)()
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """
+    Path of a fresh, migrated database without the demo catalogue (call
+    init_database(database) to add it). app.DATABASE points at it for the
+    test, and the app's pool, writer, dispatcher and cache are reset after.
+    """
+    import app as app_module
+    path = str(tmp_path / 'test.db')
+    init_database(path, catalogue=False)
+    monkeypatch.setattr(app_module, 'DATABASE', path)
+    yield path
+    reset_app(app_module)
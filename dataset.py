@@ -0,0 +1,309 @@
+"""
+Deterministic synthetic dataset for scale testing.
+
+generate() fills a freshly initialised database with customers, providers,
+services, subscriptions (expanded into service requests with the same
+frequency and horizon rules as recurrence.py), payments, reviews and
+notifications. Everything is drawn from one seeded random.Random, so the
+same profile and seed always produce the same database.
+
+Popularity is Zipf-distributed: a few services, customers and providers
+account for most of the activity, as in production. Rows are streamed
+through executemany in batched transactions with the triggers and secondary
+indexes dropped for the load; indexes, counters and the search index are
+rebuilt from the loaded rows afterwards.
+
+    python manage.py generate --database load.db --scale 10
+"""
+import bisect
+import itertools
+import random
+import time
+from datetime import date, timedelta
+
+import inbox
+import stats
+from recurrence import FREQUENCY_DAYS, SCHEDULE_HORIZON_DAYS
+from seed import BATCH_SIZE, services as catalogue_services
+
+# Sizes for scale=1; every count is multiplied by the scale
+PROFILE = {
+    'customers': 20000,
+    'providers': 2000,
+    'services': 5000,
+    'subscriptions': 40000,
+    'direct_requests': 20000,
+    # Zipf exponents for who/what gets picked; 0 means uniform
+    'service_skew': 1.1,
+    'customer_skew': 0.8,
+    'provider_skew': 0.9,
+    # How subscriptions are spread over time and frequency
+    'history_days': 365,
+    'horizon_days': SCHEDULE_HORIZON_DAYS,
+    'frequencies': {'daily': 0.05, 'weekly': 0.35, 'monthly': 0.4,
+                    'quarterly': 0.15, 'half-yearly': 0.05},
+    'durations': {30: 0.3, 90: 0.3, 180: 0.25, 365: 0.15},
+    # Outcomes of past visits and follow-up activity
+    'cancel_rate': 0.05,
+    'review_rate': 0.2,
+    'notification_rate': 0.5,
+    'payment_failure_rate': 0.03,
+}
+
+COUNTS = ('customers', 'providers', 'services', 'subscriptions', 'direct_requests')
+
+TIMES = ['morning', 'afternoon', 'evening']
+CITIES = [('Mumbai', 'Maharashtra'), ('Delhi', 'Delhi'), ('Bengaluru', 'Karnataka'),
+          ('Chennai', 'Tamil Nadu'), ('Hyderabad', 'Telangana'), ('Pune', 'Maharashtra'),
+          ('Kolkata', 'West Bengal'), ('Ahmedabad', 'Gujarat')]
+
+
+class Zipf:
+    """Draws from items with P(rank k) proportional to 1 / k**skew"""
+
+    def __init__(self, items, skew, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)  # popularity should not follow id order
+        self.cumulative = list(itertools.accumulate(1 / (k ** skew) for k in range(1, len(self.items) + 1)))
+        self.total = self.cumulative[-1]
+        self.rng = rng
+
+    def __call__(self):
+        return self.items[bisect.bisect(self.cumulative, self.rng.random() * self.total)]
+
+
+def _weighted(weights, rng):
+    choices, cumulative = list(weights), list(itertools.accumulate(weights.values()))
+    return lambda: rng.choices(choices, cum_weights=cumulative)[0]
+
+
+INSERT_SERVICES = '''INSERT INTO services
+    (id, name, description, category, subcategory, price, discount_percentage, duration_minutes,
+     frequency_options, provider_id, image_url, is_active, rating, total_bookings)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+INSERT_USERS = '''INSERT INTO users
+    (id, name, email, password, role, contact, address, city, state, pincode, is_verified)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+INSERT_SUBSCRIPTIONS = '''INSERT INTO subscriptions
+    (id, customer_id, service_id, start_date, end_date, next_service_date, frequency,
+     preferred_time, status, total_amount, payment_status, materialized_until, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+INSERT_REQUESTS = '''INSERT INTO service_requests
+    (subscription_id, customer_id, service_provider_id, service_category, service_description,
+     location, scheduled_date, scheduled_time, status, customer_rating, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+INSERT_PAYMENTS = '''INSERT INTO payments
+    (subscription_id, amount, payment_method, transaction_id, payment_date, status)
+    VALUES (?, ?, ?, ?, ?, ?)'''
+
+INSERT_REVIEWS = '''INSERT INTO reviews
+    (service_id, customer_id, provider_id, rating, comment, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)'''
+
+INSERT_NOTIFICATIONS = '''INSERT INTO notifications
+    (user_id, title, message, type, is_read, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)'''
+
+
+class _Writer:
+    """Buffers rows per statement and flushes them together in one transaction"""
+
+    def __init__(self, conn, batch_size):
+        self.c = conn.cursor()
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.pending = 0
+        self.counts = {}
+
+    def add(self, sql, row):
+        self.buffers.setdefault(sql, []).append(row)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.c.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, rows in self.buffers.items():
+                self.c.executemany(sql, rows)
+                table = sql.split()[2]
+                self.counts[table] = self.counts.get(table, 0) + len(rows)
+            self.c.execute('COMMIT')
+        except Exception:
+            self.c.execute('ROLLBACK')
+            raise
+        self.buffers = {}
+        self.pending = 0
+
+
+def _drop(conn, kind):
+    """Drop every trigger or explicit index; returns the SQL to recreate them"""
+    objects = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = ? AND sql IS NOT NULL",
+                           (kind,)).fetchall()
+    for name, _ in objects:
+        conn.execute(f'DROP {kind.upper()} {name}')
+    return [sql for _, sql in objects]
+
+
+def _occurrences(start, end, frequency, today, horizon_days):
+    """Visit dates of a subscription up to its materialisation horizon (see recurrence.py)"""
+    step = timedelta(days=FREQUENCY_DAYS.get(frequency, 30))
+    last_day = min(end, max(today, start) + timedelta(days=horizon_days))
+    day = start
+    while day <= last_day:
+        yield day
+        day += step
+
+
+def generate(conn, scale=1.0, seed=0, today=None, batch_size=BATCH_SIZE, **overrides):
+    """
+    Fill an empty, migrated database (conn in autocommit mode). overrides
+    replace PROFILE entries. Returns {table: rows written}.
+    """
+    profile = dict(PROFILE, **overrides)
+    counts = {name: max(1, int(profile[name] * scale)) for name in COUNTS}
+    if conn.execute('SELECT EXISTS (SELECT 1 FROM users) OR EXISTS (SELECT 1 FROM services)').fetchone()[0]:
+        raise ValueError('generate() expects an empty database (run manage.py init --no-catalogue)')
+
+    rng = random.Random(seed)
+    today = today or date.today()
+    writer = _Writer(conn, batch_size)
+    synchronous = conn.execute('PRAGMA synchronous').fetchone()[0]
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -262144')
+    # Building indexes once after the load is far cheaper than maintaining them per row
+    recreate = _drop(conn, 'trigger') + _drop(conn, 'index')
+    try:
+        # Users: customers first, then providers; all share one password hash
+        from werkzeug.security import generate_password_hash
+        password = generate_password_hash('password123')
+        customer_ids = range(1, counts['customers'] + 1)
+        provider_ids = range(counts['customers'] + 1, counts['customers'] + counts['providers'] + 1)
+        for user_id in itertools.chain(customer_ids, provider_ids):
+            role = 'customer' if user_id in customer_ids else 'provider'
+            city, state = CITIES[user_id % len(CITIES)]
+            writer.add(INSERT_USERS, (user_id, f'{role.title()} {user_id}', f'{role}{user_id}@example.com',
+                                      password, role, f'9{user_id:09d}', f'{user_id} Main Street',
+                                      city, state, f'{400001 + user_id % 500}', int(role == 'provider')))
+
+        # Services: the demo catalogue pattern, each owned by a provider
+        pick_provider = Zipf(provider_ids, profile['provider_skew'], rng)
+        service_info = {}
+        for row in catalogue_services(counts['services']):
+            service_id = len(service_info) + 1
+            provider_id = pick_provider()
+            service_info[service_id] = (row[2], row[4], provider_id)
+            writer.add(INSERT_SERVICES, (service_id,) + row[:8] + (provider_id,) + row[9:])
+
+        pick_service = Zipf(service_info, profile['service_skew'], rng)
+        pick_customer = Zipf(customer_ids, profile['customer_skew'], rng)
+        pick_frequency = _weighted(profile['frequencies'], rng)
+        pick_duration = _weighted(profile['durations'], rng)
+
+        for subscription_id in range(1, counts['subscriptions'] + 1):
+            customer_id, service_id = pick_customer(), pick_service()
+            category, price, provider_id = service_info[service_id]
+            frequency, duration = pick_frequency(), pick_duration()
+            start = today - timedelta(days=rng.randint(-30, profile['history_days']))
+            end = start + timedelta(days=duration)
+            days = list(_occurrences(start, end, frequency, today, profile['horizon_days']))
+            upcoming = next((d for d in days if d >= today), None)
+            status = 'active' if end >= today else 'expired'
+            paid = rng.random() >= profile['payment_failure_rate']
+            amount = round(price * (duration // FREQUENCY_DAYS.get(frequency, 30) + 1), 2)
+            created = f'{start - timedelta(days=rng.randint(0, 7))} 10:00:00'
+            writer.add(INSERT_SUBSCRIPTIONS, (
+                subscription_id, customer_id, service_id, start.isoformat(), end.isoformat(),
+                upcoming and upcoming.isoformat(), frequency, rng.choice(TIMES),
+                status if paid else 'pending', amount, 'completed' if paid else 'failed',
+                days[-1].isoformat() if paid and days else None, created))
+            writer.add(INSERT_PAYMENTS, (subscription_id, amount, 'razorpay', f'txn_{subscription_id}',
+                                         created, 'completed' if paid else 'failed'))
+            if not paid:
+                continue
+
+            for day in days:
+                if day >= today:
+                    visit, provider, rating = 'scheduled', None, None
+                elif rng.random() < profile['cancel_rate']:
+                    visit, provider, rating = 'cancelled', provider_id, None
+                else:
+                    visit, provider = 'completed', provider_id
+                    rating = rng.choice([3, 4, 4, 5, 5]) if rng.random() < profile['review_rate'] else None
+                writer.add(INSERT_REQUESTS, (subscription_id, None, provider, category, None, None,
+                                             day.isoformat(), None, visit, rating, created))
+                if rating:
+                    writer.add(INSERT_REVIEWS, (service_id, customer_id, provider_id, rating,
+                                                'Great service' if rating > 3 else 'Okay', f'{day} 18:00:00'))
+                if visit == 'completed' and rng.random() < profile['notification_rate']:
+                    writer.add(INSERT_NOTIFICATIONS, (customer_id, 'Service Completed',
+                                                      f'Your {category} visit on {day} is complete.',
+                                                      'service_completed', int(day < today - timedelta(days=7)),
+                                                      f'{day} 17:00:00'))
+
+        # One-off requests made from the customer dashboard
+        for _ in range(counts['direct_requests']):
+            customer_id = pick_customer()
+            category = service_info[pick_service()][0]
+            day = today + timedelta(days=rng.randint(-60, 30))
+            accepted = day < today and rng.random() > profile['cancel_rate']
+            city, state = CITIES[customer_id % len(CITIES)]
+            writer.add(INSERT_REQUESTS, (
+                None, customer_id, pick_provider() if accepted else None, category,
+                f'{category} request', f'{city}, {state}', day.isoformat(), rng.choice(TIMES),
+                'completed' if accepted else 'scheduled' if day >= today else 'cancelled',
+                None, f'{day - timedelta(days=3)} 09:00:00'))
+            writer.add(INSERT_NOTIFICATIONS, (customer_id, 'Service Request Created',
+                                              f'Your {category} request has been submitted.',
+                                              'request_created', int(day < today), f'{day} 09:00:00'))
+        writer.flush()
+
+        # Popularity and ratings follow from what was generated
+        c = conn.cursor()
+        c.execute('BEGIN IMMEDIATE')
+        c.execute('''UPDATE services SET total_bookings = agg.bookings
+                     FROM (SELECT service_id, COUNT(*) AS bookings FROM subscriptions
+                           GROUP BY service_id) AS agg
+                     WHERE services.id = agg.service_id''')
+        c.execute('''UPDATE services SET rating = agg.rating
+                     FROM (SELECT service_id, ROUND(AVG(rating), 1) AS rating FROM reviews
+                           GROUP BY service_id) AS agg
+                     WHERE services.id = agg.service_id''')
+        c.execute('''UPDATE users SET rating = agg.rating, total_reviews = agg.reviews
+                     FROM (SELECT provider_id, ROUND(AVG(rating), 1) AS rating, COUNT(*) AS reviews
+                           FROM reviews GROUP BY provider_id) AS agg
+                     WHERE users.id = agg.provider_id''')
+        c.execute('COMMIT')
+    finally:
+        for sql in recreate:
+            conn.execute(sql)
+        conn.execute(f'PRAGMA synchronous = {int(synchronous)}')
+
+    # Derived state the dropped triggers would have maintained
+    conn.execute("INSERT INTO services_fts (services_fts) VALUES ('rebuild')")
+    stats.rebuild(conn)
+    inbox.rebuild(conn)
+    conn.execute('ANALYZE')
+    return writer.counts
+
+
+def run(database, scale=1.0, seed=0, batch_size=BATCH_SIZE, **overrides):
+    """Create database if needed, generate into it and print a summary"""
+    from manage import connect, init_database
+    init_database(database, catalogue=False)
+    conn = connect(database)
+    start = time.perf_counter()
+    counts = generate(conn, scale=scale, seed=seed, batch_size=batch_size, **overrides)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    total = sum(counts.values())
+    for table, count in counts.items():
+        print(f'{table:18} {count:12,}')
+    print(f'{"total":18} {total:12,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)')
+    return counts
@@ -0,0 +1,197 @@
+"""
+Pooled SQLite connections for the request handlers.
+
+Opening a connection and running the PRAGMA setup is done once per pooled
+connection instead of once per request. Inside a Flask app context every
+get_db() call in the same thread shares one connection, which goes back to
+the pool when the app context is torn down.
+"""
+import sqlite3
+import threading
+import time
+
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=1000',
+    'PRAGMA temp_store=memory',
+)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    """Proxy around a sqlite3 connection that returns it to the pool on close()"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._shared = False
+        self.last_used = time.monotonic()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def close(self):
+        # Connections shared through the app context are released on teardown
+        if not self._shared:
+            self._pool.release(self)
+
+
+class ConnectionPool:
+    def __init__(self, database, max_size=16, timeout=10.0, health_check_interval=30.0):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.discarded = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=10.0, isolation_level=None,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return PooledConnection(self, conn)
+
+    def _healthy(self, pooled):
+        if time.monotonic() - pooled.last_used < self.health_check_interval:
+            return True
+        try:
+            pooled.raw.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, pooled):
+        try:
+            pooled.raw.close()
+        except sqlite3.Error:
+            pass
+        self.discarded += 1
+
+    def acquire(self):
+        start = None
+        with self._cond:
+            while True:
+                while self._idle:
+                    pooled = self._idle.pop()
+                    if self._healthy(pooled):
+                        self.hits += 1
+                        self._record_wait(start)
+                        return pooled
+                    self._discard(pooled)
+                    self._size -= 1
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    self.misses += 1
+                    self._record_wait(start)
+                    break
+
+                if start is None:
+                    start = time.monotonic()
+                    self.waits += 1
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._size >= self.max_size:
+                        self._record_wait(start)
+                        raise PoolTimeout(
+                            f'No database connection available after {self.timeout}s')
+
+        # Connect outside the lock so a slow open does not block other threads
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _record_wait(self, start):
+        if start is None:
+            return
+        waited = time.monotonic() - start
+        self.wait_time += waited
+        self.max_wait_time = max(self.max_wait_time, waited)
+
+    def release(self, pooled):
+        pooled._shared = False
+        conn = pooled.raw
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            healthy = True
+        except sqlite3.Error:
+            healthy = False
+
+        with self._cond:
+            if healthy:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            else:
+                self._discard(pooled)
+                self._size -= 1
+            self._cond.notify()
+
+    def connection(self):
+        """Return this thread's shared connection, acquiring one if needed"""
+        pooled = getattr(self._local, 'conn', None)
+        if pooled is None:
+            pooled = self.acquire()
+            pooled._shared = True
+            self._local.conn = pooled
+        return pooled
+
+    def release_thread(self):
+        """Give this thread's shared connection back to the pool"""
+        pooled = getattr(self._local, 'conn', None)
+        if pooled is not None:
+            self._local.conn = None
+            self.release(pooled)
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+                self._size -= 1
+
+    def stats(self):
+        with self._cond:
+            requests = self.hits + self.misses
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / requests, 4) if requests else 0.0,
+                'waits': self.waits,
+                'wait_time_total_ms': round(self.wait_time * 1000, 3),
+                'max_wait_time_ms': round(self.max_wait_time * 1000, 3),
+                'discarded': self.discarded,
+            }
@@ -0,0 +1,160 @@
+"""
+In-process pub/sub broker behind the /api/events Server-Sent Events stream.
+
+Write paths publish small events to topics ('user:<id>' for everything that
+concerns one user, 'jobs' for the providers' open-job feed). Every event gets
+a monotonically increasing id and the most recent ones are kept in a ring
+buffer, so a browser reconnecting with Last-Event-ID is replayed what it
+missed instead of refetching everything.
+
+Under serve.py every process has its own broker. Workers send their events
+to the writer process, whose broker numbers them and relays each one back to
+every worker (see writer.WriterServer), so all workers hold the same events
+under the same ids.
+"""
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+HISTORY_SIZE = 1000
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 256
+
+JOBS_TOPIC = 'jobs'
+
+
+def user_topic(user_id):
+    return f'user:{user_id}'
+
+
+class Event:
+    __slots__ = ('id', 'topic', 'type', 'data', 'created')
+
+    def __init__(self, event_id, topic, event_type, data):
+        self.id = event_id
+        self.topic = topic
+        self.type = event_type
+        self.data = data
+        self.created = time.time()
+
+    def encode(self):
+        return f'id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data)}\n\n'
+
+
+class Subscription:
+    def __init__(self, broker, topics):
+        self.broker = broker
+        self.topics = frozenset(topics)
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # A stalled client; make it resync instead of blocking publishers
+            self.overflowed = True
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def __init__(self, history_size=HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._history = deque(maxlen=history_size)
+        self._subscribers = {}
+        self._listeners = []
+        self.published = 0
+
+    def _add(self, event):
+        with self._lock:
+            self._history.append(event)
+            subscribers = list(self._subscribers.get(event.topic, ()))
+            self.published += 1
+            for listener in self._listeners:
+                listener(event)
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return event
+
+    def publish(self, topic, event_type, data):
+        return self._add(Event(next(self._ids), topic, event_type, data))
+
+    def receive(self, event_id, topic, event_type, data):
+        """Add an event another process's broker published, keeping its id"""
+        return self._add(Event(event_id, topic, event_type, data))
+
+    def listen(self, listener):
+        """Call listener(event) for every event, in id order; it must not block"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def subscribe(self, topics, last_event_id=None):
+        """
+        Register for topics. Returns (subscription, backlog, complete) where
+        backlog holds the buffered events after last_event_id and complete is
+        False when some of them have already fallen out of the buffer.
+        """
+        subscription = Subscription(self, topics)
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscribers.setdefault(topic, set()).add(subscription)
+            backlog, complete = [], True
+            if last_event_id is not None:
+                oldest = self._history[0].id if self._history else 1
+                latest = self._history[-1].id if self._history else 0
+                # Ids restart with the process, so an id from the future
+                # means the client missed everything since a restart
+                complete = oldest <= last_event_id + 1 and last_event_id <= latest
+                backlog = [event for event in self._history
+                           if event.id > last_event_id and event.topic in subscription.topics]
+        return subscription, backlog, complete
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[topic]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'published': self.published,
+                'buffered': len(self._history),
+                'subscribers': sum(len(s) for s in self._subscribers.values()),
+                'topics': len(self._subscribers),
+            }
+
+
+broker = Broker()
+
+
+def stream(topics, last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+    """Generator of SSE text for a subscriber; closes its subscription on exit"""
+    subscription, backlog, complete = broker.subscribe(topics, last_event_id)
+    try:
+        yield 'retry: 3000\n\n'
+        if not complete:
+            yield 'event: resync\ndata: {}\n\n'
+        for event in backlog:
+            yield event.encode()
+        while True:
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield 'event: resync\ndata: {}\n\n'
+            try:
+                event = subscription.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            yield event.encode()
+    finally:
+        subscription.close()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Bulk exports of payments, subscriptions and service requests.
+
+    python export.py payments --since 2025-01-01 --until 2025-12-31 --provider 12 -o payments.csv.gz
+    python export.py service_requests --customer 40 --format ndjson -o history.ndjson.gz
+
+The same exports are served by GET /api/exports/<kind>. Rows are read on a
+read-only connection inside one read transaction, so everything exported
+comes from a single snapshot. In WAL mode that snapshot never blocks
+writers. Rows are fetched, encoded and gzip-compressed one batch at a time,
+so memory use stays flat however long the date range is.
+"""
+import argparse
+import csv
+import io
+import os
+import sqlite3
+import sys
+import zlib
+from datetime import date
+from urllib.parse import quote
+
+from streaming import encode_rows
+
+BATCH_SIZE = 1000
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+class Export:
+    """A SELECT plus the columns its date-range and owner filters apply to"""
+
+    def __init__(self, select, date_column, customer_column, provider_column, order):
+        self.select = select
+        self.date_column = date_column
+        self.customer_column = customer_column
+        self.provider_column = provider_column
+        self.order = order
+
+
+EXPORTS = {
+    'payments': Export(
+        '''SELECT p.id, p.payment_date, p.amount, p.status, p.payment_method, p.transaction_id,
+                  p.razorpay_payment_id, p.subscription_id, sub.customer_id, srv.provider_id,
+                  srv.id AS service_id, srv.name AS service_name, srv.category
+           FROM payments p
+           JOIN subscriptions sub ON sub.id = p.subscription_id
+           JOIN services srv ON srv.id = sub.service_id''',
+        'p.payment_date', 'sub.customer_id', 'srv.provider_id', 'p.id'),
+    'subscriptions': Export(
+        '''SELECT s.id, s.customer_id, srv.provider_id, s.service_id, srv.name AS service_name,
+                  srv.category, s.frequency, s.preferred_time, s.start_date, s.end_date, s.status,
+                  s.total_amount, s.discount_applied, s.payment_status, s.created_at
+           FROM subscriptions s
+           JOIN services srv ON srv.id = s.service_id''',
+        's.start_date', 's.customer_id', 'srv.provider_id', 's.id'),
+    'service_requests': Export(
+        '''SELECT sr.id, sr.subscription_id, sr.customer_id, sr.service_provider_id,
+                  sr.service_category, srv.name AS service_name, sr.scheduled_date, sr.scheduled_time,
+                  sr.status, sr.actual_start_time, sr.actual_end_time, sr.customer_rating, sr.location,
+                  sr.created_at
+           FROM service_requests sr
+           LEFT JOIN subscriptions sub ON sub.id = sr.subscription_id
+           LEFT JOIN services srv ON srv.id = sub.service_id''',
+        'sr.scheduled_date', 'sr.customer_id', 'sr.service_provider_id', 'sr.id'),
+}
+
+
+class InvalidExport(ValueError):
+    pass
+
+
+def parse_date(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise InvalidExport(f'{name} must be a YYYY-MM-DD date')
+
+
+def build(kind, since=None, until=None, customer_id=None, provider_id=None):
+    """(sql, params) for one export; since and until are inclusive dates"""
+    spec = EXPORTS.get(kind)
+    if spec is None:
+        raise InvalidExport(f"Unknown export '{kind}' (expected one of {', '.join(EXPORTS)})")
+    since, until = parse_date(since, 'since'), parse_date(until, 'until')
+
+    where, params = [], []
+    if since:
+        where.append(f'{spec.date_column} >= ?')
+        params.append(since)
+    if until:
+        # Timestamps sort after their date, so compare against the next day
+        where.append(f"{spec.date_column} < date(?, '+1 day')")
+        params.append(until)
+    if customer_id is not None:
+        where.append(f'{spec.customer_column} = ?')
+        params.append(int(customer_id))
+    if provider_id is not None:
+        where.append(f'{spec.provider_column} = ?')
+        params.append(int(provider_id))
+
+    sql = spec.select
+    if where:
+        sql += '\nWHERE ' + ' AND '.join(where)
+    return f'{sql}\nORDER BY {spec.order}', params
+
+
+def snapshot(database):
+    """Read-only connection with an open read transaction"""
+    conn = sqlite3.connect(f'file:{quote(database)}?mode=ro', uri=True, timeout=10.0,
+                           isolation_level=None, check_same_thread=False)
+    conn.execute('BEGIN')
+    return conn
+
+
+def encode_csv(c, batch_size=BATCH_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column[0] for column in c.description])
+    while True:
+        rows = c.fetchmany(batch_size)
+        if not rows:
+            break
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(conn, kind, fmt='csv', compress=True, batch_size=BATCH_SIZE, **filters):
+    """Run one export on conn and yield its encoded (bytes if compressed) chunks"""
+    if fmt not in FORMATS:
+        raise InvalidExport(f"Unknown format '{fmt}' (expected csv or ndjson)")
+    sql, params = build(kind, **filters)
+    c = conn.execute(sql, params)
+    chunks = encode_csv(c, batch_size) if fmt == 'csv' else encode_rows(c, 'ndjson', batch_size)
+    return gzipped(chunks) if compress else (chunk.encode() for chunk in chunks)
+
+
+def filename(kind, fmt, compress, since=None, until=None, **_):
+    parts = [kind] + [part for part in (since, until) if part]
+    return '-'.join(parts) + f'.{fmt}' + ('.gz' if compress else '')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('kind', choices=list(EXPORTS) + ['all'])
+    parser.add_argument('--database', default='service_platform.db')
+    parser.add_argument('--since', default=None)
+    parser.add_argument('--until', default=None)
+    parser.add_argument('--customer', dest='customer_id', type=int, default=None)
+    parser.add_argument('--provider', dest='provider_id', type=int, default=None)
+    parser.add_argument('--format', choices=list(FORMATS), default='csv')
+    parser.add_argument('--no-gzip', dest='compress', action='store_false')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('-o', '--out', default=None,
+                        help="output file, or directory when exporting 'all'; default is a generated name")
+    args = parser.parse_args(argv)
+
+    filters = {name: getattr(args, name) for name in ('since', 'until', 'customer_id', 'provider_id')}
+    kinds = list(EXPORTS) if args.kind == 'all' else [args.kind]
+    conn = snapshot(args.database)
+    try:
+        for kind in kinds:
+            out = args.out if args.out and len(kinds) == 1 else None
+            if out is None:
+                out = filename(kind, args.format, args.compress, **filters)
+                if args.out:
+                    out = os.path.join(args.out, out)
+            chunks = stream(conn, kind, args.format, args.compress, args.batch_size, **filters)
+            written = 0
+            with open(out, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    written += len(chunk)
+            print(f'Wrote {out} ({written / 1024:.1f} KiB)')
+    except InvalidExport as e:
+        print(f'❌ {e}')
+        return 2
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
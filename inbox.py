@@ -0,0 +1,183 @@
+"""
+Notification inbox: unread counters, bulk mark-read and background pruning.
+
+notification_counts holds one row per user with the number of unread and
+total notifications. Triggers on notifications keep it current, so the
+badge is a primary-key lookup instead of a scan of the user's rows.
+Read notifications past READ_RETENTION_DAYS are deleted by a scheduler
+job, and so is everything past the newest READ_KEEP_PER_USER read rows of
+any one user. The table only grows with unread mail.
+
+    python inbox.py verify [database]
+    python inbox.py rebuild [database]
+"""
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+from lifecycle import batched
+
+READ_RETENTION_DAYS = 90
+READ_KEEP_PER_USER = 200
+# Most rows one incremental fetch returns
+FETCH_LIMIT = 100
+
+
+def _delta(row, sign):
+    return f'''UPDATE notification_counts SET
+            unread = unread {sign} (NOT COALESCE({row}.is_read, 0)),
+            total = total {sign} 1
+        WHERE user_id = {row}.user_id;'''
+
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS notification_counts (
+        user_id INTEGER PRIMARY KEY,
+        unread INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0
+    )''',
+    f'''CREATE TRIGGER IF NOT EXISTS notification_counts_insert
+        AFTER INSERT ON notifications WHEN new.user_id IS NOT NULL BEGIN
+        INSERT OR IGNORE INTO notification_counts (user_id) VALUES (new.user_id);
+        {_delta('new', '+')}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS notification_counts_update
+        AFTER UPDATE OF is_read, user_id ON notifications
+        WHEN old.is_read IS NOT new.is_read OR old.user_id IS NOT new.user_id BEGIN
+        {_delta('old', '-')}
+        INSERT OR IGNORE INTO notification_counts (user_id) SELECT new.user_id WHERE new.user_id IS NOT NULL;
+        {_delta('new', '+')}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS notification_counts_delete
+        AFTER DELETE ON notifications BEGIN
+        {_delta('old', '-')}
+    END''',
+    # Incremental fetch: id > since_id for one user, in id order
+    '''CREATE INDEX IF NOT EXISTS idx_notifications_user_id
+       ON notifications (user_id, id)''',
+    # Pruning only ever looks at read rows
+    '''CREATE INDEX IF NOT EXISTS idx_notifications_read_created
+       ON notifications (created_at) WHERE is_read''',
+]
+
+_RECOMPUTE_SQL = '''SELECT user_id, SUM(NOT COALESCE(is_read, 0)), COUNT(*)
+                    FROM notifications WHERE user_id IS NOT NULL GROUP BY user_id'''
+
+
+def create_notification_counts(c):
+    """Migration: create notification_counts with its triggers and fill it"""
+    for statement in SCHEMA:
+        c.execute(statement)
+    _rebuild(c)
+
+
+def _rebuild(c):
+    c.execute('DELETE FROM notification_counts')
+    c.execute(f'INSERT INTO notification_counts (user_id, unread, total) {_RECOMPUTE_SQL}')
+
+
+def rebuild(conn):
+    c = conn.cursor()
+    c.execute('BEGIN IMMEDIATE')
+    try:
+        _rebuild(c)
+        c.execute('COMMIT')
+    except Exception:
+        c.execute('ROLLBACK')
+        raise
+
+
+def verify(conn):
+    """Return [(user_id, stored (unread, total), expected)] for every drifted row"""
+    c = conn.cursor()
+    c.execute('BEGIN')
+    try:
+        expected = {row[0]: tuple(row[1:]) for row in c.execute(_RECOMPUTE_SQL)}
+        stored = {row[0]: tuple(row[1:]) for row in c.execute(
+            'SELECT user_id, unread, total FROM notification_counts')}
+    finally:
+        c.execute('COMMIT')
+    return [(user_id, stored.get(user_id, (0, 0)), expected.get(user_id, (0, 0)))
+            for user_id in sorted(set(expected) | set(stored))
+            if stored.get(user_id, (0, 0)) != expected.get(user_id, (0, 0))]
+
+
+def counts(c, user_id):
+    """(unread, total) for user_id"""
+    row = c.execute('SELECT unread, total FROM notification_counts WHERE user_id = ?', (user_id,)).fetchone()
+    return (row[0], row[1]) if row else (0, 0)
+
+
+def since(c, user_id, since_id, limit=FETCH_LIMIT):
+    """Up to limit of user_id's notifications newer than since_id, oldest first"""
+    c.execute('''SELECT * FROM notifications
+                 WHERE user_id = ? AND id > ?
+                 ORDER BY id LIMIT ?''', (user_id, since_id, limit))
+    return c.fetchall()
+
+
+def timestamp(value):
+    """ISO 8601 value as a created_at string (UTC, like CURRENT_TIMESTAMP); raises ValueError"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def mark_read(c, user_id, ids=None, before=None):
+    """
+    Mark user_id's unread notifications read: those in ids, or every one
+    created at or before the timestamp before. Returns the number changed.
+    """
+    if ids is not None:
+        c.execute('''UPDATE notifications SET is_read = 1
+                     WHERE user_id = ? AND NOT is_read
+                       AND id IN (SELECT value FROM json_each(?))''', (user_id, ids))
+    else:
+        c.execute('''UPDATE notifications SET is_read = 1
+                     WHERE user_id = ? AND NOT is_read AND created_at <= ?''', (user_id, before))
+    return c.rowcount
+
+
+_EXPIRED_DUE = '''SELECT id FROM notifications
+                  WHERE is_read AND created_at < datetime(:today, :retention)
+                  LIMIT :batch_size'''
+# Everything past the newest :keep read rows of users the counters show over the limit
+_OVERFLOW_DUE = '''SELECT id FROM (
+                       SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id DESC) AS n
+                       FROM notifications
+                       WHERE is_read AND user_id IN (SELECT user_id FROM notification_counts
+                                                     WHERE total - unread > :keep LIMIT :batch_size))
+                   WHERE n > :keep
+                   LIMIT :batch_size'''
+_DELETE = ['DELETE FROM notifications WHERE id IN (SELECT value FROM json_each(:ids))']
+
+
+def prune_read(conn, today, batch_size, heartbeat=None, retention_days=READ_RETENTION_DAYS,
+               keep=READ_KEEP_PER_USER):
+    """Delete read notifications past the retention window or each user's keep limit"""
+    expired = batched(conn, _EXPIRED_DUE, _DELETE, today, batch_size, heartbeat,
+                      retention=f'-{retention_days} days')
+    return expired + batched(conn, _OVERFLOW_DUE, _DELETE, today, batch_size, heartbeat, keep=keep)
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    database = sys.argv[2] if len(sys.argv) > 2 else 'service_platform.db'
+    conn = sqlite3.connect(database, timeout=10.0, isolation_level=None)
+
+    if command == 'rebuild':
+        rebuild(conn)
+        print('Rebuilt notification_counts')
+    elif command == 'verify':
+        drift = verify(conn)
+        for user_id, stored, expected in drift:
+            print(f'✗ user {user_id}: (unread, total) is {stored}, expected {expected}')
+        if drift:
+            print(f'\n❌ {len(drift)} drifted users (run "python inbox.py rebuild")')
+            sys.exit(1)
+        print('✅ notification_counts matches notifications')
+    else:
+        print('Usage: python inbox.py [verify|rebuild] [database]')
+        sys.exit(2)
+    conn.close()
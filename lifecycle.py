@@ -0,0 +1,135 @@
+"""
+Subscription lifecycle sweeps run by the scheduler (scheduler.py).
+
+Each sweep picks due rows through an indexed date predicate and updates them
+batch_size at a time, one short BEGIN IMMEDIATE transaction per batch, so a
+backlog of thousands of rows never turns into one long write lock. Updated
+rows stop matching the predicate, and that is how a sweep makes progress.
+Every sweep takes (conn, today, batch_size, heartbeat) and returns the
+number of rows it changed.
+"""
+import json
+
+from recurrence import SCHEDULE_HORIZON_DAYS, roll_forward
+
+# Renewal term for subscriptions whose start and end dates give no usable length
+DEFAULT_TERM_DAYS = 30
+
+_IDS = '(SELECT value FROM json_each(:ids))'
+
+_EXPIRE_DUE = '''SELECT id FROM subscriptions
+                 WHERE status = 'active' AND end_date < :today AND NOT auto_renew
+                 LIMIT :batch_size'''
+_EXPIRE = [
+    f'''UPDATE subscriptions SET status = 'expired', updated_at = CURRENT_TIMESTAMP
+        WHERE id IN {_IDS}''',
+    f'''INSERT INTO notifications (user_id, title, message, type)
+        SELECT s.customer_id, 'Subscription Ended',
+               'Your ' || srv.name || ' subscription ended on ' || s.end_date || '.', 'subscription_expired'
+        FROM subscriptions s JOIN services srv ON srv.id = s.service_id
+        WHERE s.id IN {_IDS}''',
+]
+
+_RENEW_DUE = '''SELECT id FROM subscriptions
+                WHERE status = 'active' AND end_date < :today AND auto_renew
+                LIMIT :batch_size'''
+_RENEW = [
+    # Whole terms of the same length are added until end_date is past today;
+    # the current term then starts one term before the new end_date
+    f'''UPDATE subscriptions
+        SET start_date = date(t.end_date, '-' || t.days || ' days'),
+            end_date = t.end_date,
+            updated_at = CURRENT_TIMESTAMP
+        FROM (SELECT id, days, date(end_date, '+' || (days * (
+                  CAST((julianday(:today) - julianday(end_date)) / days AS INTEGER) + 1)) || ' days') AS end_date
+              FROM (SELECT id, end_date, COALESCE(NULLIF(MAX(CAST(
+                        julianday(end_date) - julianday(start_date) AS INTEGER), 0), 0), {DEFAULT_TERM_DAYS}) AS days
+                    FROM subscriptions WHERE id IN {_IDS})) AS t
+        WHERE subscriptions.id = t.id''',
+    f'''INSERT INTO notifications (user_id, title, message, type)
+        SELECT s.customer_id, 'Subscription Renewed',
+               'Your ' || srv.name || ' subscription has been renewed until ' || s.end_date || '.',
+               'subscription_renewed'
+        FROM subscriptions s JOIN services srv ON srv.id = s.service_id
+        WHERE s.id IN {_IDS} AND s.end_date >= :today''',
+]
+
+_MISSED_DUE = '''SELECT id FROM service_requests
+                 WHERE status = 'scheduled' AND scheduled_date < :today
+                 LIMIT :batch_size'''
+_MISSED = [
+    f'''UPDATE service_requests SET status = 'missed', updated_at = CURRENT_TIMESTAMP
+        WHERE id IN {_IDS}''',
+]
+
+_NEXT_DATE_DUE = '''SELECT id FROM subscriptions
+                    WHERE status = 'active' AND next_service_date < :today
+                    LIMIT :batch_size'''
+_NEXT_DATE = [
+    f'''UPDATE subscriptions SET next_service_date = (
+            SELECT MIN(scheduled_date) FROM service_requests
+            WHERE subscription_id = subscriptions.id AND status = 'scheduled'
+              AND scheduled_date >= :today)
+        WHERE id IN {_IDS}''',
+]
+
+
+def _params(today, **extra):
+    return dict(extra, today=today if isinstance(today, str) else today.isoformat())
+
+
+def batched(conn, due_sql, statements, today, batch_size, heartbeat=None, **extra):
+    """Run statements over due_sql's ids, batch_size per transaction, until none are due"""
+    c = conn.cursor()
+    total = 0
+    while True:
+        params = _params(today, batch_size=batch_size, **extra)
+        c.execute('BEGIN IMMEDIATE')
+        try:
+            ids = [row[0] for row in c.execute(due_sql, params).fetchall()]
+            if ids:
+                params['ids'] = json.dumps(ids)
+                for statement in statements:
+                    c.execute(statement, params)
+            c.execute('COMMIT')
+        except Exception:
+            c.execute('ROLLBACK')
+            raise
+        total += len(ids)
+        if len(ids) < batch_size:
+            return total
+        if heartbeat:
+            heartbeat()
+
+
+def expire_subscriptions(conn, today, batch_size, heartbeat=None):
+    """Active subscriptions past end_date without auto_renew become 'expired'"""
+    return batched(conn, _EXPIRE_DUE, _EXPIRE, today, batch_size, heartbeat)
+
+
+def renew_subscriptions(conn, today, batch_size, heartbeat=None):
+    """Lapsed auto_renew subscriptions get another term of the same length"""
+    return batched(conn, _RENEW_DUE, _RENEW, today, batch_size, heartbeat)
+
+
+def mark_missed_visits(conn, today, batch_size, heartbeat=None):
+    """Visits still 'scheduled' after their date become 'missed'"""
+    return batched(conn, _MISSED_DUE, _MISSED, today, batch_size, heartbeat)
+
+
+def extend_schedules(conn, today, batch_size, heartbeat=None, horizon_days=SCHEDULE_HORIZON_DAYS):
+    """Materialise visits up to the rolling horizon (recurrence.roll_forward, batched)"""
+    return roll_forward(conn, today, horizon_days, batch_size=batch_size, heartbeat=heartbeat)
+
+
+def advance_next_service_dates(conn, today, batch_size, heartbeat=None):
+    """next_service_date moves on to the next scheduled visit once it has passed"""
+    return batched(conn, _NEXT_DATE_DUE, _NEXT_DATE, today, batch_size, heartbeat)
+
+
+INDEXES = [
+    '''CREATE INDEX IF NOT EXISTS idx_subscriptions_status_end
+       ON subscriptions (status, end_date)''',
+    '''CREATE INDEX IF NOT EXISTS idx_subscriptions_status_next
+       ON subscriptions (status, next_service_date)''',
+]
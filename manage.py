@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Database management, kept out of the web process.
+
+    python manage.py init [--database PATH]
+    python manage.py migrate [--to VERSION]
+    python manage.py check
+    python manage.py seed --services N --users N --subscriptions N [--batch-size N]
+    python manage.py generate [--scale X] [--seed N] [--service-skew S] ...
+    python manage.py bench-startup [--runs N]
+
+init creates the tables, applies migrations and seeds the demo catalogue;
+the web process itself only checks PRAGMA user_version when it starts.
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from migrations import LATEST_VERSION, SchemaOutOfDate, current_version, migrate, require_latest
+from schema import create_schema
+from seed import BATCH_SIZE, seed, seed_catalogue
+
+DATABASE = 'service_platform.db'
+
+
+def connect(database):
+    return sqlite3.connect(database, timeout=30.0, isolation_level=None)
+
+
+def init_database(database, catalogue=True):
+    """Tables, migrations and (optionally) the demo catalogue; returns the applied migrations"""
+    conn = connect(database)
+    try:
+        applied = create_schema(conn)
+        if catalogue:
+            seed_catalogue(conn)
+        return applied
+    finally:
+        conn.close()
+
+
+# What a process does before it can serve requests, timed from inside a
+# fresh interpreter so interpreter start-up itself is excluded
+_BOOT_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+from migrations import require_latest
+require_latest(sys.argv[1])
+checked = time.perf_counter()
+from manage import init_database
+init_database(sys.argv[1])
+legacy = time.perf_counter()
+print(json.dumps({"import": imported - start, "schema_check": checked - imported,
+                  "init_db": legacy - checked}))
+'''
+
+
+def bench_startup(database, runs=5):
+    """
+    Boot cost in fresh interpreters. Cold runs get an empty bytecode cache
+    (everything is compiled, as on a fresh deploy); warm runs reuse one.
+    init_db is what every boot used to run before serving.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    warm_cache = tempfile.mkdtemp(prefix='pycache-')
+    results = {}
+    try:
+        for mode in ('cold', 'warm'):
+            samples = []
+            for _ in range(runs + (1 if mode == 'warm' else 0)):
+                cache = tempfile.mkdtemp(prefix='pycache-') if mode == 'cold' else warm_cache
+                env = dict(os.environ, PYTHONPYCACHEPREFIX=cache)
+                env.pop('PYTHONDONTWRITEBYTECODE', None)
+                out = subprocess.run([sys.executable, '-c', _BOOT_PROBE, database], cwd=here, env=env,
+                                     capture_output=True, text=True, check=True).stdout
+                samples.append(json.loads(out.strip().splitlines()[-1]))
+                if mode == 'cold':
+                    shutil.rmtree(cache, ignore_errors=True)
+            if mode == 'warm':
+                samples = samples[1:]  # the first run only fills the cache
+            results[mode] = {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+    finally:
+        shutil.rmtree(warm_cache, ignore_errors=True)
+
+    for mode, timings in results.items():
+        print(f"{mode:5} import app {timings['import'] * 1000:8.1f} ms   "
+              f"schema check {timings['schema_check'] * 1000:6.2f} ms   "
+              f"init_db {timings['init_db'] * 1000:7.1f} ms")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database', default=DATABASE)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    init = commands.add_parser('init', help='create tables, migrate and seed the demo catalogue')
+    init.add_argument('--no-catalogue', action='store_true')
+
+    to = commands.add_parser('migrate', help='apply pending migrations')
+    to.add_argument('--to', type=int, default=None)
+
+    commands.add_parser('check', help='exit non-zero unless the schema is up to date')
+
+    fill = commands.add_parser('seed', help='append generated rows in batches')
+    fill.add_argument('--services', type=int, default=0)
+    fill.add_argument('--users', type=int, default=0)
+    fill.add_argument('--subscriptions', type=int, default=0)
+    fill.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    gen = commands.add_parser('generate', help='fill an empty database with a synthetic dataset')
+    gen.add_argument('--scale', type=float, default=1.0)
+    gen.add_argument('--seed', type=int, default=0)
+    gen.add_argument('--batch-size', type=int, default=10000)
+    for name in ('service_skew', 'customer_skew', 'provider_skew', 'cancel_rate', 'review_rate',
+                 'notification_rate'):
+        gen.add_argument('--' + name.replace('_', '-'), dest=name, type=float, default=None)
+    gen.add_argument('--history-days', dest='history_days', type=int, default=None)
+
+    bench = commands.add_parser('bench-startup', help='time cold and warm boots')
+    bench.add_argument('--runs', type=int, default=5)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'init':
+        for version, description in init_database(args.database, not args.no_catalogue):
+            print(f'Applied migration {version}: {description}')
+        print(f'✅ {args.database} is at schema version {LATEST_VERSION}')
+
+    elif args.command == 'migrate':
+        conn = connect(args.database)
+        for version, description in migrate(conn, args.to):
+            print(f'Applied migration {version}: {description}')
+        print(f'Schema version is now {current_version(conn)}')
+        conn.close()
+
+    elif args.command == 'check':
+        try:
+            print(f'✅ Schema version {require_latest(args.database)}')
+        except SchemaOutOfDate as e:
+            print(f'❌ {e}')
+            return 1
+
+    elif args.command == 'seed':
+        conn = connect(args.database)
+        start = time.perf_counter()
+        written = seed(conn, args.services, args.users, args.subscriptions, args.batch_size)
+        conn.close()
+        for table, count in written.items():
+            print(f'Seeded {count} {table}')
+        print(f'Done in {time.perf_counter() - start:.2f}s')
+
+    elif args.command == 'generate':
+        import dataset
+        overrides = {name: value for name, value in vars(args).items()
+                     if name in dataset.PROFILE and value is not None}
+        dataset.run(args.database, args.scale, args.seed, args.batch_size, **overrides)
+
+    elif args.command == 'bench-startup':
+        bench_startup(args.database, args.runs)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+In-memory matching of open customer requests to providers.
+
+The provider feed (/api/provider/customer-requests) used to scan every
+scheduled request in the provider's categories. MatchingIndex keeps the
+open requests keyed by (category, region) instead. A region is the first
+REGION_DIGITS digits of the request's PIN code: the pincode in its location
+text, or else the customer's pincode. A feed is then a lookup over the
+provider's categories, ranked by proximity (the number of leading PIN digits
+shared with the provider) and then by date.
+
+The index is built from SQLite on first use. It stays current through
+request_changes, a change log that triggers append to for every insert,
+delete or relevant update of a customer request. sync() replays the entries
+past the last seq it has seen, so writes from any code path or process
+reach the index. The scheduler's prune_request_changes job trims the log;
+an index that lagged past the trimmed point rebuilds on its next sync().
+"""
+import heapq
+import json
+import re
+import threading
+import time
+
+from lifecycle import batched
+
+REGION_DIGITS = 3
+PRUNE_KEEP = 10000
+
+_PINCODE = re.compile(r'\b(\d{6})\b')
+
+# Only direct customer requests (service_category set) are matched; visits
+# materialised from subscriptions go to /api/available-jobs
+_WATCHED = 'service_category IS NOT NULL'
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS request_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        request_id INTEGER NOT NULL
+    )''',
+    f'''CREATE TRIGGER IF NOT EXISTS request_changes_insert
+        AFTER INSERT ON service_requests WHEN NEW.{_WATCHED} BEGIN
+        INSERT INTO request_changes (request_id) VALUES (NEW.id);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS request_changes_update
+        AFTER UPDATE OF status, service_category, location, scheduled_date, customer_id
+        ON service_requests WHEN NEW.{_WATCHED} OR OLD.{_WATCHED} BEGIN
+        INSERT INTO request_changes (request_id) VALUES (NEW.id);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS request_changes_delete
+        AFTER DELETE ON service_requests WHEN OLD.{_WATCHED} BEGIN
+        INSERT INTO request_changes (request_id) VALUES (OLD.id);
+    END''',
+]
+
+_OPEN_SQL = f'''SELECT sr.id, sr.service_category, sr.scheduled_date, sr.location, u.pincode
+                FROM service_requests sr
+                JOIN users u ON sr.customer_id = u.id
+                WHERE sr.status = 'scheduled' AND sr.{_WATCHED}'''
+
+# Feed rows for a JSON array of [request_id, proximity] pairs, in array order.
+# The index may lag a claim that another process just committed, so the
+# status is checked again here.
+FEED_SQL = '''SELECT sr.*, u.name as customer_name, u.contact, u.address as customer_address,
+                     json_extract(ranked.value, '$[1]') AS proximity
+              FROM json_each(?) AS ranked
+              JOIN service_requests sr ON sr.id = json_extract(ranked.value, '$[0]')
+              JOIN users u ON sr.customer_id = u.id
+              WHERE sr.status = 'scheduled'
+              ORDER BY ranked.key'''
+
+_PRUNE_DUE = '''SELECT seq FROM request_changes
+                WHERE seq <= (SELECT MAX(seq) FROM request_changes) - :keep
+                ORDER BY seq LIMIT :batch_size'''
+_PRUNE = ['DELETE FROM request_changes WHERE seq IN (SELECT value FROM json_each(:ids))']
+
+
+def create_request_changes(c):
+    """Migration: create the request change log and its triggers"""
+    for statement in SCHEMA:
+        c.execute(statement)
+
+
+def pincode(location, fallback=None):
+    found = _PINCODE.search(location or '')
+    if found:
+        return found.group(1)
+    fallback = str(fallback or '').strip()
+    return fallback if fallback.isdigit() else None
+
+
+def region(pin):
+    return pin[:REGION_DIGITS] if pin else None
+
+
+def proximity(a, b):
+    """Leading PIN digits a and b share (0 when either is unknown)"""
+    if not a or not b:
+        return 0
+    shared = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        shared += 1
+    return shared
+
+
+def prune_request_changes(conn, today, batch_size, heartbeat=None, keep=PRUNE_KEEP):
+    """Trim request_changes to its newest keep entries"""
+    return batched(conn, _PRUNE_DUE, _PRUNE, today, batch_size, heartbeat, keep=keep)
+
+
+class MatchingIndex:
+    def __init__(self, database=None):
+        self.database = database
+        self._lock = threading.Lock()
+        self._buckets = {}  # category -> region -> {request_id: (scheduled_date, pincode)}
+        self._keys = {}  # request_id -> (category, region)
+        self.seq = 0
+        self.built = False
+        self.rebuilds = 0
+        self.applied = 0
+        self.build_time = 0.0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _add(self, request_id, category, scheduled_date, location, customer_pincode):
+        pin = pincode(location, customer_pincode)
+        area = region(pin)
+        self._buckets.setdefault(category, {}).setdefault(area, {})[request_id] = (scheduled_date or '', pin)
+        self._keys[request_id] = (category, area)
+
+    def _remove(self, request_id):
+        key = self._keys.pop(request_id, None)
+        if key is not None:
+            category, area = key
+            regions = self._buckets[category]
+            del regions[area][request_id]
+            if not regions[area]:
+                del regions[area]
+                if not regions:
+                    del self._buckets[category]
+
+    def rebuild(self, c):
+        start = time.perf_counter()
+        with self._lock:
+            # Read the log position first: changes racing the scan are replayed by the next sync
+            self.seq = c.execute('SELECT COALESCE(MAX(seq), 0) FROM request_changes').fetchone()[0]
+            self._buckets, self._keys = {}, {}
+            for row in c.execute(_OPEN_SQL):
+                self._add(*row)
+            self.built = True
+            self.rebuilds += 1
+            self.build_time = time.perf_counter() - start
+
+    def sync(self, c):
+        """Apply logged changes since the last sync; returns how many requests changed"""
+        if not self.built:
+            self.rebuild(c)
+            return len(self)
+        with self._lock:
+            changes = c.execute('SELECT seq, request_id FROM request_changes WHERE seq > ? ORDER BY seq',
+                                (self.seq,)).fetchall()
+            if not changes:
+                return 0
+            if changes[0][0] != self.seq + 1:
+                pruned = True  # entries we never saw were pruned
+            else:
+                pruned = False
+                ids = sorted({request_id for _, request_id in changes})
+                for request_id in ids:
+                    self._remove(request_id)
+                c.execute(f'{_OPEN_SQL} AND sr.id IN (SELECT value FROM json_each(?))', (json.dumps(ids),))
+                for row in c.fetchall():
+                    self._add(*row)
+                self.seq = changes[-1][0]
+                self.applied += len(ids)
+        if pruned:
+            self.rebuild(c)
+            return len(self)
+        return len(ids)
+
+    def feed(self, categories, provider_pincode=None, limit=None, nearby=False):
+        """
+        [(request_id, proximity)] open in categories, nearest first and then
+        by date. nearby=True keeps only the provider's own region.
+        """
+        provider_pincode = pincode(None, provider_pincode)
+        home = region(provider_pincode)
+        scores = {}  # far fewer distinct pincodes than requests
+        matches = []
+        with self._lock:
+            for category in set(categories):
+                regions = self._buckets.get(category, {})
+                buckets = [regions.get(home, {})] if nearby else regions.values()
+                for bucket in buckets:
+                    for request_id, (scheduled_date, pin) in bucket.items():
+                        score = scores.get(pin)
+                        if score is None:
+                            score = scores[pin] = -proximity(provider_pincode, pin)
+                        matches.append((score, scheduled_date, request_id))
+        if limit is not None and limit < len(matches):
+            matches = heapq.nsmallest(limit, matches)
+        else:
+            matches.sort()
+        return [(request_id, -score) for score, _, request_id in matches]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'open_requests': len(self._keys),
+                'buckets': sum(len(regions) for regions in self._buckets.values()),
+                'seq': self.seq,
+                'rebuilds': self.rebuilds,
+                'applied_changes': self.applied,
+                'build_time_ms': round(self.build_time * 1000, 2),
+            }
@@ -0,0 +1,141 @@
+"""
+Versioned schema migrations.
+
+The schema version is kept in PRAGMA user_version. Each migration runs once,
+in order, inside its own transaction and bumps the version when it commits.
+"""
+import sqlite3
+from urllib.parse import quote
+
+from archive import create_archive
+from inbox import create_notification_counts
+from matching import create_request_changes
+from outbox import create_outbox
+from recurrence import add_schedule_constraints
+from scheduler import create_job_leases
+from search import create_search_index
+from stats import create_user_stats
+from versions import create_catalogue_versions, create_data_versions
+
+
+# Secondary indexes matching the hot access paths in app.py
+INDEXES_V1 = [
+    # /api/available-jobs and /api/provider/customer-requests
+    '''CREATE INDEX IF NOT EXISTS idx_service_requests_status_date
+       ON service_requests (status, scheduled_date)''',
+    '''CREATE INDEX IF NOT EXISTS idx_service_requests_status_category
+       ON service_requests (status, service_category, scheduled_date)''',
+    # /api/service-requests and the provider dashboard counters
+    '''CREATE INDEX IF NOT EXISTS idx_service_requests_provider_status
+       ON service_requests (service_provider_id, status, scheduled_date)''',
+    # /api/upcoming-schedules and the customer "next service" date
+    '''CREATE INDEX IF NOT EXISTS idx_service_requests_subscription
+       ON service_requests (subscription_id, status, scheduled_date)''',
+    # /api/customer/service-requests
+    '''CREATE INDEX IF NOT EXISTS idx_service_requests_customer
+       ON service_requests (customer_id, created_at)''',
+    '''CREATE INDEX IF NOT EXISTS idx_subscriptions_customer_status
+       ON subscriptions (customer_id, status)''',
+    # /api/payment-history, total spent and verify-payment
+    '''CREATE INDEX IF NOT EXISTS idx_payments_subscription_status
+       ON payments (subscription_id, status, amount)''',
+    '''CREATE INDEX IF NOT EXISTS idx_payments_order
+       ON payments (razorpay_order_id)''',
+    # /api/notifications (covering for the unread badge as well)
+    '''CREATE INDEX IF NOT EXISTS idx_notifications_user_created
+       ON notifications (user_id, created_at, is_read)''',
+    # /api/services catalogue ordering, category filter and /api/categories
+    '''CREATE INDEX IF NOT EXISTS idx_services_active_rank
+       ON services (is_active, rating DESC, total_bookings DESC)''',
+    '''CREATE INDEX IF NOT EXISTS idx_services_active_category
+       ON services (is_active, category, rating DESC, total_bookings DESC)''',
+    '''CREATE INDEX IF NOT EXISTS idx_services_provider_category
+       ON services (provider_id, category)''',
+    '''CREATE INDEX IF NOT EXISTS idx_reviews_service_created
+       ON reviews (service_id, created_at)''',
+]
+
+
+def _add_secondary_indexes(c):
+    for statement in INDEXES_V1:
+        c.execute(statement)
+
+
+# (version, description, callable taking a cursor)
+MIGRATIONS = [
+    (1, 'secondary indexes for hot queries', _add_secondary_indexes),
+    (2, 'FTS5 search index over services', create_search_index),
+    (3, 'unique subscription schedules and materialisation horizon', add_schedule_constraints),
+    (4, 'trigger-maintained per-user dashboard counters', create_user_stats),
+    (5, 'change counters for conditional GETs', create_data_versions),
+    (6, 'change log for the provider matching index', create_request_changes),
+    (7, 'job leases and lifecycle sweep indexes', create_job_leases),
+    (8, 'notification outbox and dead letters', create_outbox),
+    (9, 'unread notification counters and pruning indexes', create_notification_counts),
+    (10, 'counters of rows moved to the monthly archive', create_archive),
+    (11, 'per-service and per-category change counters for the response cache', create_catalogue_versions),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def current_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def require_latest(database):
+    """Boot-time check that database exists and is fully migrated; returns its version"""
+    try:
+        conn = sqlite3.connect(f'file:{quote(database)}?mode=rw', uri=True)
+    except sqlite3.OperationalError:
+        raise SchemaOutOfDate(f'{database} does not exist')
+    try:
+        version = current_version(conn)
+    finally:
+        conn.close()
+    if version < LATEST_VERSION:
+        raise SchemaOutOfDate(f'{database} is at schema version {version}, expected {LATEST_VERSION}')
+    return version
+
+
+def migrate(conn, target=None):
+    """Apply every pending migration up to target; returns the applied versions"""
+    target = LATEST_VERSION if target is None else target
+    applied = []
+
+    for version, description, apply in MIGRATIONS:
+        if version > target or version <= current_version(conn):
+            continue
+        c = conn.cursor()
+        c.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the lock
+            if version <= current_version(conn):
+                c.execute('COMMIT')
+                continue
+            apply(c)
+            c.execute(f'PRAGMA user_version = {int(version)}')
+            c.execute('COMMIT')
+        except Exception:
+            c.execute('ROLLBACK')
+            raise
+        applied.append((version, description))
+
+    if applied:
+        conn.execute('ANALYZE')
+    return applied
+
+
+if __name__ == '__main__':
+    import sys
+    database = sys.argv[1] if len(sys.argv) > 1 else 'service_platform.db'
+    conn = sqlite3.connect(database, isolation_level=None)
+    print(f'Schema version: {current_version(conn)}')
+    for version, description in migrate(conn):
+        print(f'Applied migration {version}: {description}')
+    print(f'Schema version is now {current_version(conn)}')
+    conn.close()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Transactional outbox for notifications.
+
+    python outbox.py status
+    python outbox.py dead                    list dead letters
+    python outbox.py retry [ID ...]          requeue dead letters
+
+A request handler that has something to tell a user calls notify() inside
+its own write transaction. notify() adds one outbox row, so the
+notification is committed or rolled back together with the change it
+describes. The request then returns without doing any of the fan-out.
+
+A Dispatcher thread picks up whatever is due in batches, so a burst of
+acceptances turns into a few multi-row writes. 'notification' rows become
+rows in the notifications table. In the same transaction they are copied
+into the outbox once per delivery channel: the SSE event stream, and mail
+through an SMTP server if one is configured. Notification rows and channel
+deliveries are retried with exponential backoff. After MAX_ATTEMPTS failures a row moves
+to outbox_dead, where `python outbox.py retry` can requeue it.
+"""
+import argparse
+import json
+import smtplib
+import sqlite3
+import sys
+import threading
+import time
+from email.message import EmailMessage
+
+import events
+from db_pool import PRAGMAS
+
+NOTIFICATION = 'notification'
+
+BATCH_SIZE = 200
+LINGER_SECONDS = 0.02
+POLL_SECONDS = 1.0
+LEASE_SECONDS = 30
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 300.0
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        channel TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        available_at REAL NOT NULL DEFAULT 0,
+        leased_until REAL NOT NULL DEFAULT 0,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_outbox_available ON outbox (available_at)',
+    '''CREATE TABLE IF NOT EXISTS outbox_dead (
+        id INTEGER PRIMARY KEY,
+        channel TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        attempts INTEGER NOT NULL,
+        last_error TEXT,
+        created_at TIMESTAMP,
+        failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+]
+
+
+def create_outbox(c):
+    """Migration: outbox and dead-letter tables"""
+    for statement in SCHEMA:
+        c.execute(statement)
+
+
+def enqueue(c, channel, payload, delay=0.0):
+    """Add one delivery to the outbox; c should be inside the caller's transaction"""
+    c.execute('INSERT INTO outbox (channel, payload, available_at) VALUES (?, ?, ?)',
+              (channel, json.dumps(payload), time.time() + delay if delay else 0))
+
+
+def notify(c, user_id, title, message, kind, data=None):
+    """Queue a notification for user_id (a notifications row plus every channel)"""
+    enqueue(c, NOTIFICATION, {'user_id': user_id, 'title': title, 'message': message,
+                              'type': kind, 'data': data or {}})
+
+
+def backoff(attempts):
+    return min(MAX_DELAY, BASE_DELAY * 2 ** (attempts - 1))
+
+
+class Channel:
+    """A delivery target; deliver(c, payloads) gets a whole batch and raises on failure"""
+
+    name = None
+
+    def deliver(self, c, payloads):
+        raise NotImplementedError
+
+
+class EventChannel(Channel):
+    """'notification' events on the recipients' SSE topics"""
+
+    name = 'events'
+
+    def __init__(self, broker=None):
+        self.broker = broker or events.broker
+
+    def deliver(self, c, payloads):
+        for payload in payloads:
+            self.broker.publish(events.user_topic(payload['user_id']), 'notification',
+                                dict(payload['data'], type=payload['type']))
+
+
+class MailChannel(Channel):
+    """Mail through one SMTP session per batch (e.g. a local `python -m aiosmtpd -n`)"""
+
+    name = 'email'
+
+    def __init__(self, host='localhost', port=1025, sender='no-reply@service-platform.local', timeout=10.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.timeout = timeout
+
+    def deliver(self, c, payloads):
+        user_ids = json.dumps(sorted({payload['user_id'] for payload in payloads}))
+        addresses = dict(c.execute('SELECT id, email FROM users WHERE id IN (SELECT value FROM json_each(?))',
+                                   (user_ids,)).fetchall())
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            for payload in payloads:
+                address = addresses.get(payload['user_id'])
+                if not address:
+                    continue
+                mail = EmailMessage()
+                mail['From'] = self.sender
+                mail['To'] = address
+                mail['Subject'] = payload['title']
+                mail.set_content(payload['message'])
+                smtp.send_message(mail)
+
+
+class DispatchMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.delivered = {}
+        self.retried = {}
+        self.dead = {}
+        self.batches = 0
+        self.largest_batch = 0
+        self.dispatch_seconds = 0.0
+
+    def count(self, counter, channel, n=1):
+        with self._lock:
+            counter[channel] = counter.get(channel, 0) + n
+
+    def batch(self, size, seconds):
+        with self._lock:
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, size)
+            self.dispatch_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'delivered': dict(self.delivered),
+                'retried': dict(self.retried),
+                'dead_lettered': dict(self.dead),
+                'batches': self.batches,
+                'largest_batch': self.largest_batch,
+                'dispatch_seconds': round(self.dispatch_seconds, 6),
+            }
+
+
+_CLAIM_SQL = '''UPDATE outbox SET leased_until = :until
+                WHERE id IN (SELECT id FROM outbox
+                             WHERE available_at <= :now AND leased_until <= :now
+                             ORDER BY id LIMIT :batch_size)
+                RETURNING id, channel, payload, attempts'''
+
+
+class Dispatcher:
+    def __init__(self, database, channels=None, batch_size=BATCH_SIZE, linger=LINGER_SECONDS,
+                 poll_seconds=POLL_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.database = database
+        channels = [EventChannel()] if channels is None else channels
+        self.channels = {channel.name: channel for channel in channels}
+        self.batch_size = batch_size
+        self.linger = linger
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.metrics = DispatchMetrics()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+
+    def connect(self):
+        conn = sqlite3.connect(self.database, timeout=10.0, isolation_level=None, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _claim(self, c):
+        now = time.time()
+        c.execute('BEGIN IMMEDIATE')
+        try:
+            rows = c.execute(_CLAIM_SQL, {'now': now, 'until': now + LEASE_SECONDS,
+                                          'batch_size': self.batch_size}).fetchall()
+            c.execute('COMMIT')
+        except Exception:
+            c.execute('ROLLBACK')
+            raise
+        return rows
+
+    def _write_notifications(self, c, rows):
+        """notifications rows, per-channel copies and outbox cleanup in one transaction"""
+        try:
+            payloads = [json.loads(payload) for _, _, payload, _ in rows]
+            self._insert_notifications(c, rows, payloads)
+        except Exception as e:
+            if len(rows) > 1:
+                # As in _deliver: one bad row must not hold back the rest of the batch
+                for row in rows:
+                    self._write_notifications(c, [row])
+                return
+            self._failed(c, rows[0], f'{type(e).__name__}: {e}')
+            return
+        self.metrics.count(self.metrics.delivered, NOTIFICATION, len(rows))
+
+    def _insert_notifications(self, c, rows, payloads):
+        c.execute('BEGIN IMMEDIATE')
+        try:
+            c.executemany('INSERT INTO notifications (user_id, title, message, type) VALUES (?, ?, ?, ?)',
+                          [(p['user_id'], p['title'], p['message'], p['type']) for p in payloads])
+            c.executemany('INSERT INTO outbox (channel, payload) VALUES (?, ?)',
+                          [(name, payload) for _, _, payload, _ in rows for name in self.channels])
+            c.execute('DELETE FROM outbox WHERE id IN (SELECT value FROM json_each(?))',
+                      (json.dumps([row[0] for row in rows]),))
+            c.execute('COMMIT')
+        except Exception:
+            c.execute('ROLLBACK')
+            raise
+
+    def _deliver(self, c, name, rows):
+        channel = self.channels.get(name)
+        try:
+            if channel is None:
+                raise LookupError(f"No channel named '{name}'")
+            channel.deliver(c, [json.loads(payload) for _, _, payload, _ in rows])
+        except Exception as e:
+            if len(rows) > 1:
+                # Find the row that failed instead of retrying the whole batch
+                for row in rows:
+                    self._deliver(c, name, [row])
+                return
+            self._failed(c, rows[0], f'{type(e).__name__}: {e}')
+            return
+        c.execute('DELETE FROM outbox WHERE id IN (SELECT value FROM json_each(?))',
+                  (json.dumps([row[0] for row in rows]),))
+        self.metrics.count(self.metrics.delivered, name, len(rows))
+
+    def _failed(self, c, row, error):
+        outbox_id, channel, _, attempts = row
+        attempts += 1
+        if attempts >= self.max_attempts:
+            c.execute('BEGIN IMMEDIATE')
+            try:
+                c.execute('''INSERT INTO outbox_dead (id, channel, payload, attempts, last_error, created_at)
+                             SELECT id, channel, payload, ?, ?, created_at FROM outbox WHERE id = ?''',
+                          (attempts, error, outbox_id))
+                c.execute('DELETE FROM outbox WHERE id = ?', (outbox_id,))
+                c.execute('COMMIT')
+            except Exception:
+                c.execute('ROLLBACK')
+                raise
+            self.metrics.count(self.metrics.dead, channel)
+        else:
+            c.execute('''UPDATE outbox SET attempts = ?, last_error = ?, available_at = ?, leased_until = 0
+                         WHERE id = ?''', (attempts, error, time.time() + backoff(attempts), outbox_id))
+            self.metrics.count(self.metrics.retried, channel)
+
+    def dispatch_once(self, conn=None):
+        """Claim and handle one batch of due rows; returns how many were claimed"""
+        conn = conn or self._connection()
+        c = conn.cursor()
+        start = time.perf_counter()
+        rows = self._claim(c)
+        by_channel = {}
+        for row in rows:
+            by_channel.setdefault(row[1], []).append(row)
+        notifications = by_channel.pop(NOTIFICATION, None)
+        if notifications:
+            self._write_notifications(c, notifications)
+        for name, channel_rows in by_channel.items():
+            self._deliver(c, name, channel_rows)
+        if rows:
+            self.metrics.batch(len(rows), time.perf_counter() - start)
+        return len(rows)
+
+    def drain(self):
+        """Dispatch until nothing is due, including the channel copies made along the way"""
+        total = 0
+        while True:
+            claimed = self.dispatch_once()
+            total += claimed
+            if not claimed:
+                return total
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = self.connect()
+        return self._conn
+
+    def wake(self):
+        """Tell the dispatcher thread that new rows were committed"""
+        self._wake.set()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            if self._wake.wait(self.poll_seconds):
+                # Let a burst of commits pile up so it goes out as one batch
+                self._stop.wait(self.linger)
+            self._wake.clear()
+            try:
+                self.drain()
+            except Exception as e:
+                # Keep the thread alive; the claimed rows come back when their lease runs out
+                print(f'Outbox dispatch failed: {type(e).__name__}: {e}', file=sys.stderr)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run_forever, name='outbox', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self, conn=None):
+        conn = conn or self._connection()
+        pending, dead = conn.execute('''SELECT (SELECT COUNT(*) FROM outbox),
+                                               (SELECT COUNT(*) FROM outbox_dead)''').fetchone()
+        return dict(self.metrics.snapshot(), pending=pending, dead=dead)
+
+
+def requeue(conn, ids=None):
+    """Move dead letters (all, or just ids) back into the outbox with a fresh attempt count"""
+    where = 'WHERE id IN (SELECT value FROM json_each(?))' if ids else ''
+    params = (json.dumps(ids),) if ids else ()
+    c = conn.cursor()
+    c.execute('BEGIN IMMEDIATE')
+    try:
+        c.execute(f'''INSERT INTO outbox (channel, payload, last_error, created_at)
+                      SELECT channel, payload, last_error, created_at FROM outbox_dead {where}''', params)
+        moved = c.rowcount
+        c.execute(f'DELETE FROM outbox_dead {where}', params)
+        c.execute('COMMIT')
+    except Exception:
+        c.execute('ROLLBACK')
+        raise
+    return moved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('command', choices=['status', 'dead', 'retry'])
+    parser.add_argument('ids', nargs='*', type=int)
+    parser.add_argument('--database', default='service_platform.db')
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.database, isolation_level=None)
+    if args.command == 'status':
+        for channel, pending, failing in conn.execute('''SELECT channel, COUNT(*), SUM(attempts > 0)
+                                                         FROM outbox GROUP BY channel'''):
+            print(f'{channel:14} {pending:6} pending  {failing:6} retrying')
+        print(f"Dead letters: {conn.execute('SELECT COUNT(*) FROM outbox_dead').fetchone()[0]}")
+    elif args.command == 'dead':
+        for outbox_id, channel, attempts, error, failed_at in conn.execute(
+                'SELECT id, channel, attempts, last_error, failed_at FROM outbox_dead ORDER BY id'):
+            print(f'{outbox_id:8} {channel:14} {attempts} attempts, {failed_at}: {error}')
+    else:
+        print(f'Requeued {requeue(conn, args.ids)} dead letters')
+    conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+Manifest and dispatcher for the server-rendered HTML pages.
+
+Every page is a slug mapped to a template, served by the single /<slug> route
+in app.py: resolving a slug is one dict lookup instead of a walk through one
+URL rule per page, and compiled templates are kept per slug. Slugs that are
+not in the manifest (or whose template is missing) are 404s.
+
+    python pages.py [iterations]    # benchmark: one rule per page vs table
+"""
+import sys
+import time
+
+from jinja2 import TemplateNotFound
+
+PAGES = {
+    'login': 'login.html',
+    'register': 'register.html',
+    'services': 'services.html',
+    'service-details': 'service-details.html',
+    'add-service': 'add-service.html',
+    'customer-dashboard': 'customer-dashboard.html',
+    'provider-dashboard': 'provider-dashboard.html',
+    'search-jobs': 'search-jobs.html',
+    'subscribe': 'subscribe.html',
+    'auth': 'auth.html',
+}
+
+# VeilGlass OSINT pages render veilglass/<slug>.html unless listed in
+# VEILGLASS_TEMPLATES
+VEILGLASS_PAGES = (
+    'veilglass',
+    'attack-surface',
+    'credential-exposure',
+    'domain-analysis',
+    'email-osint',
+    'social-media-osint',
+    'ip-geolocation',
+    'phone-osint',
+    'username-osint',
+    'breach-check',
+    'dark-web-search',
+    'metadata-analysis',
+    'dns-enumeration',
+    'subdomain-enumeration',
+    'port-scanning',
+    'web-vulnerability-scan',
+    'ssl-certificate-check',
+    'technology-stack-detection',
+    'api-fingerprinting',
+    'source-code-leakage',
+    'exposed-git-repos',
+    'exposed-config-files',
+    'exposed-database-files',
+    'exposed-log-files',
+    'exposed-backup-files',
+    'exposed-installation-files',
+    'directory-listing-vulnerability',
+    'exposed-env-files',
+    'exposed-htaccess-files',
+    'exposed-nginx-config',
+    'exposed-apache-config',
+    'exposed-iis-config',
+    'exposed-docker-files',
+    'exposed-kubernetes-config',
+    'exposed-aws-credentials',
+    'exposed-gcp-credentials',
+    'exposed-azure-credentials',
+    'exposed-api-keys',
+    'exposed-database-credentials',
+    'exposed-ftp-credentials',
+    'exposed-ssh-keys',
+    'exposed-private-keys',
+    'exposed-session-tokens',
+    'exposed-jwt-tokens',
+    'exposed-oauth-tokens',
+    'exposed-cookies',
+    'exposed-passwords',
+    'exposed-credit-cards',
+    'exposed-personal-info',
+    'exposed-medical-records',
+    'exposed-financial-data',
+    'exposed-intellectual-property',
+    'exposed-trade-secrets',
+    'exposed-source-code',
+    'exposed-api-documentation',
+    'exposed-test-files',
+    'exposed-debug-files',
+    'exposed-temp-files',
+    'exposed-cache-files',
+    'exposed-swap-files',
+    'exposed-core-files',
+    'exposed-crash-dumps',
+    'exposed-error-logs',
+    'exposed-access-logs',
+    'exposed-security-logs',
+    'exposed-audit-logs',
+    'exposed-system-logs',
+    'exposed-application-logs',
+    'exposed-database-logs',
+    'exposed-network-logs',
+    'exposed-firewall-logs',
+    'exposed-ids-logs',
+    'exposed-ips-logs',
+    'exposed-antivirus-logs',
+    'exposed-endpoint-logs',
+    'exposed-cloud-logs',
+    'exposed-container-logs',
+    'exposed-orchestration-logs',
+    'exposed-monitoring-logs',
+    'exposed-metrics',
+    'exposed-health-checks',
+    'exposed-status-pages',
+    'exposed-dashboard',
+    'exposed-admin-panel',
+    'exposed-login-page',
+    'exposed-registration-page',
+    'exposed-password-reset',
+    'exposed-2fa-setup',
+    'exposed-api-endpoints',
+    'exposed-webhooks',
+    'exposed-websockets',
+    'exposed-graphql-endpoints',
+    'exposed-rest-api',
+    'exposed-soap-api',
+    'exposed-json-api',
+    'exposed-xml-api',
+    'exposed-csv-api',
+    'exposed-binary-api',
+    'exposed-file-upload',
+    'exposed-file-download',
+    'exposed-file-sharing',
+    'exposed-cloud-storage',
+    'exposed-s3-buckets',
+    'exposed-gcs-buckets',
+    'exposed-azure-blobs',
+    'exposed-digitalocean-spaces',
+    'exposed-backblaze-b2',
+    'exposed-wasabi',
+    'exposed-linode-object-storage',
+    'exposed-vultr-object-storage',
+    'exposed-upcloud-object-storage',
+    'exposed-scaleway-object-storage',
+    'exposed-ovh-object-storage',
+    'exposed-hetzner-object-storage',
+    'exposed-ionos-object-storage',
+    'exposed-exoscale-object-storage',
+    'exposed-citycloud-object-storage',
+    'exposed-greenqloud-object-storage',
+    'exposed-dreamhost-object-storage',
+    'exposed-rackspace-object-storage',
+    'exposed-hp-object-storage',
+    'exposed-ibm-object-storage',
+    'exposed-oracle-object-storage',
+    'exposed-alibaba-object-storage',
+    'exposed-tencent-object-storage',
+    'exposed-huawei-object-storage',
+    'exposed-baidu-object-storage',
+    'exposed-kingsoft-object-storage',
+    'exposed-upyun-object-storage',
+    'exposed-qiniu-object-storage',
+    'exposed-ksyun-object-storage',
+    'exposed-netease-object-storage',
+    'exposed-jdcloud-object-storage',
+    'exposed-ctyun-object-storage',
+    'exposed-zhejiang-object-storage',
+    'exposed-sangfor-object-storage',
+    'exposed-360-object-storage',
+    'exposed-tianyi-object-storage',
+    'exposed-chinacache-object-storage',
+    'exposed-chinaunicom-object-storage',
+    'exposed-chinanet-object-storage',
+    'exposed-cernet-object-storage',
+    'exposed-cstnet-object-storage',
+    'exposed-drpeng-object-storage',
+    'exposed-github-gist',
+    'exposed-pastebin',
+    'exposed-0bin',
+    'exposed-hastebin',
+    'exposed-termbin',
+    'exposed-sprunge',
+    'exposed-ix-io',
+    'exposed-clbin',
+    'exposed-ptpb',
+    'exposed-dpaste',
+    'exposed-codepad',
+    'exposed-paste-de',
+    'exposed-paste-ee',
+    'exposed-paste-fr',
+    'exposed-paste-org',
+    'exposed-paste-pk',
+    'exposed-paste-rs',
+    'exposed-paste-ubuntu',
+    'exposed-paste-fedora',
+    'exposed-paste-centos',
+    'exposed-paste-arch',
+    'exposed-paste-gentoo',
+    'exposed-paste-slackware',
+    'exposed-paste-mageia',
+    'exposed-paste-opensuse',
+    'exposed-paste-mandriva',
+    'exposed-paste-pclinuxos',
+    'exposed-paste-sabayon',
+    'exposed-paste-chakra',
+    'exposed-paste-kaos',
+    'exposed-paste-nix',
+    'exposed-paste-guix',
+    'exposed-paste-void',
+    'exposed-paste-alpine',
+    'exposed-paste-adelaide',
+    'exposed-paste-brisbane',
+    'exposed-paste-canberra',
+    'exposed-paste-darwin',
+    'exposed-paste-hobart',
+    'exposed-paste-melbourne',
+    'exposed-paste-perth',
+    'exposed-paste-sydney',
+    'exposed-paste-auckland',
+    'exposed-paste-wellington',
+    'exposed-paste-christchurch',
+    'exposed-paste-dunedin',
+    'exposed-paste-hamilton',
+    'exposed-paste-tauranga',
+    'exposed-paste-palmerston-north',
+    'exposed-paste-napier',
+    'exposed-paste-new-plymouth',
+    'exposed-paste-nelson',
+    'exposed-paste-rotorua',
+    'exposed-paste-taupo',
+    'exposed-paste-whangarei',
+    'exposed-paste-invercargill',
+    'exposed-paste-bluff',
+    'exposed-paste-greymouth',
+    'exposed-paste-hokitika',
+    'exposed-paste-te-anau',
+    'exposed-paste-teku-teku',
+    'exposed-paste-wanaka',
+    'exposed-paste-arrowtown',
+    'exposed-paste-franz-josef',
+    'exposed-paste-glenorchy',
+    'exposed-paste-milford-sound',
+    'exposed-paste-queenstown',
+    'exposed-paste-te-anau-milford',
+    'exposed-paste-wakatipu',
+    'exposed-paste-fiordland',
+    'exposed-paste-southland',
+    'exposed-paste-otago',
+    'exposed-paste-canterbury',
+    'exposed-paste-west-coast',
+    'exposed-paste-marlbrough',
+    'exposed-paste-nelson-tasman',
+    'exposed-paste-wellington-region',
+    'exposed-paste-manawatu-wanganui',
+    'exposed-paste-hawkes-bay',
+    'exposed-paste-taranaki',
+    'exposed-paste-waikato',
+    'exposed-paste-bay-of-plenty',
+    'exposed-paste-auckland-region',
+    'exposed-paste-northland',
+    'exposed-paste-gisborne',
+    'exposed-paste-east-cape',
+    'exposed-paste-chatham-islands',
+    'exposed-paste-kermadec-islands',
+    'exposed-paste-three-kings-islands',
+    'exposed-paste-curtis-island',
+    'exposed-paste-great-barrier-island',
+    'exposed-paste-little-barrier-island',
+    'exposed-paste-rangitoto-island',
+    'exposed-paste-hen-island',
+    'exposed-paste-rakino-island',
+    'exposed-paste-tiritiri-matangi-island',
+    'exposed-paste-motutapu-island',
+    'exposed-paste-motuihe-island',
+    'exposed-paste-browns-island',
+    'exposed-paste-kawau-island',
+    'exposed-paste-waiheke-island',
+)
+
+VEILGLASS_TEMPLATES = {
+    'veilglass': 'veilglass/index.html',
+    'exposed-wasabi': 'veilglass/exposed-wasabi-buckets.html',
+    'exposed-paste-little-barrier-island': 'veilglass/exposed-paste-little_barrier_island.html',
+}
+
+
+def build_manifest():
+    manifest = dict(PAGES)
+    for slug in VEILGLASS_PAGES:
+        manifest[slug] = VEILGLASS_TEMPLATES.get(slug, f'veilglass/{slug}.html')
+    return manifest
+
+
+MANIFEST = build_manifest()
+
+
+class PageTemplates:
+    """slug -> compiled Template, loaded on first use"""
+
+    def __init__(self, env, manifest=MANIFEST):
+        self.env = env
+        self.manifest = manifest
+        self._templates = {}
+
+    def get(self, slug):
+        """The Template for slug, or None if the page does not exist"""
+        if self.env.auto_reload:
+            # Development: let Jinja check the file for changes every time
+            return self._load(slug)
+        try:
+            return self._templates[slug]
+        except KeyError:
+            template = self._templates[slug] = self._load(slug)
+            return template
+
+    def _load(self, slug):
+        name = self.manifest.get(slug)
+        if name is None:
+            return None
+        try:
+            return self.env.get_template(name)
+        except TemplateNotFound:
+            return None
+
+
+def _legacy_app(manifest):
+    from flask import Flask
+    app = Flask('legacy_pages')
+    for slug in manifest:
+        def view(_slug=slug):
+            return ''
+        app.add_url_rule(f'/{slug}', endpoint=f'page_{slug}', view_func=view)
+    return app
+
+
+def _table_app(manifest):
+    from flask import Flask, abort
+    app = Flask('table_pages')
+
+    def page(slug):
+        if slug not in manifest:
+            abort(404)
+        return ''
+    app.add_url_rule('/<slug>', view_func=page)
+    return app
+
+
+def benchmark(iterations=20000):
+    paths = [f'/{slug}' for slug in MANIFEST] + ['/no-such-page']
+    results = {}
+    for name, factory in (('one rule per page', _legacy_app), ('table router', _table_app)):
+        start = time.perf_counter()
+        app = factory(MANIFEST)
+        adapter = app.url_map.bind('localhost')
+        adapter.match('/login')  # forces the matcher to be compiled
+        startup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(iterations):
+            try:
+                adapter.match(paths[i % len(paths)])
+            except Exception:
+                pass
+        match = (time.perf_counter() - start) / iterations
+
+        client = app.test_client()
+        requests = max(1, iterations // 10)
+        start = time.perf_counter()
+        for i in range(requests):
+            client.get(paths[i % len(paths)])
+        dispatch = (time.perf_counter() - start) / requests
+
+        results[name] = (len(app.url_map._rules), startup, match, dispatch)
+        print(f'{name:18} rules={len(app.url_map._rules):4}  startup={startup * 1000:7.2f} ms  '
+              f'match={match * 1e6:6.2f} us  request={dispatch * 1e6:7.1f} us')
+    return results
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,189 @@
+"""
+Keyset (cursor-based) pagination for the list endpoints.
+
+Each endpoint describes its ORDER BY as a Keyset ending in a unique,
+non-NULL column.
+A page is fetched by appending "rows after the last key we returned" to the
+endpoint's query, so every page costs an index seek instead of an OFFSET
+walk. The continuation token is the last row's key, base64-encoded, and is
+opaque to clients. It also carries a fingerprint of the ordering, the query
+text and its parameters (the endpoint's filters), so a cursor only continues
+the listing that issued it.
+"""
+import base64
+import hashlib
+import json
+from urllib.parse import urlencode
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Keyset:
+    """An ORDER BY such as Keyset('rating DESC', 'total_bookings DESC', 'id')"""
+
+    def __init__(self, *columns):
+        self.columns = []
+        for column in columns:
+            parts = column.split()
+            expression = parts[0]
+            descending = len(parts) > 1 and parts[1].upper() == 'DESC'
+            # Key in the row dict: 'sr.scheduled_date' -> 'scheduled_date'
+            key = expression.rsplit('.', 1)[-1]
+            self.columns.append((expression, key, descending))
+        self.signature = ','.join(columns)
+
+    def order_by(self):
+        return ', '.join(f"{expression} {'DESC' if descending else 'ASC'}"
+                         for expression, _, descending in self.columns)
+
+    def after(self, values):
+        """
+        WHERE fragment and params selecting rows strictly after values.
+
+        SQLite sorts NULL before every value, so a NULL in a descending
+        column comes after any value, and a NULL cursor value is matched
+        with IS NULL. The last column is the unique id and never NULL.
+        """
+        directions = {descending for _, _, descending in self.columns}
+        expressions = [expression for expression, _, _ in self.columns]
+
+        if len(directions) == 1 and None not in values:
+            # Uniform direction: a row-value comparison can seek the index
+            descending = directions.pop()
+            placeholders = ', '.join('?' * len(values))
+            clause = f"({', '.join(expressions)}) {'<' if descending else '>'} ({placeholders})"
+            if not descending:
+                return clause, list(values)
+            # ...which is NULL, not true, for rows with a NULL key that sort last
+            clauses, params = [clause], list(values)
+            for i, expression in enumerate(expressions[:-1]):
+                clauses.append(' AND '.join([f'{e} = ?' for e in expressions[:i]] + [f'{expression} IS NULL']))
+                params.extend(values[:i])
+            return '(' + ' OR '.join(f'({c})' for c in clauses) + ')', params
+
+        clauses = []
+        params = []
+        for i, ((expression, _, descending), value) in enumerate(zip(self.columns, values)):
+            equal = [f'{e} IS NULL' if v is None else f'{e} = ?' for e, v in zip(expressions[:i], values)]
+            equal_params = [v for v in values[:i] if v is not None]
+            if value is None:
+                if descending:
+                    continue  # nothing sorts after NULL in a descending column
+                step, step_params = f'{expression} IS NOT NULL', []
+            elif descending and i < len(expressions) - 1:
+                step, step_params = f'({expression} < ? OR {expression} IS NULL)', [value]
+            else:
+                step, step_params = f"{expression} {'<' if descending else '>'} ?", [value]
+            clauses.append(f"({' AND '.join(equal + [step])})")
+            params.extend(equal_params + step_params)
+        if not clauses:
+            return '0', []
+        return '(' + ' OR '.join(clauses) + ')', params
+
+    def sql(self, query, after=False):
+        """The paged form of query; query must already have a WHERE clause"""
+        if after:
+            query += ' AND ' + self.after([0] * len(self.columns))[0]
+        return f'{query} ORDER BY {self.order_by()} LIMIT ?'
+
+    def fingerprint(self, query, params):
+        """Ties a cursor to this ordering of query with these params"""
+        listing = json.dumps([self.signature, ' '.join(query.split()), list(params)], default=str)
+        return hashlib.sha1(listing.encode()).hexdigest()[:12]
+
+    def encode(self, row, fingerprint):
+        values = [row[key] for _, key, _ in self.columns]
+        payload = json.dumps([fingerprint, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, token, fingerprint):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded))
+        except ValueError:
+            raise InvalidCursor('Malformed cursor')
+        if not isinstance(payload, list) or len(payload) != 2 or not isinstance(payload[1], list) or \
+                not all(value is None or isinstance(value, (str, int, float)) for value in payload[1]):
+            raise InvalidCursor('Malformed cursor')
+        if payload[0] != fingerprint or len(payload[1]) != len(self.columns):
+            raise InvalidCursor('Cursor does not belong to this listing')
+        return payload[1]
+
+
+class Page:
+    def __init__(self, rows, next_cursor=None, total=None):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.total = total
+
+
+def page_size(value):
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise InvalidCursor('limit must be an integer')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def ordered(query, params, keyset, args, fingerprint=None):
+    """
+    query sorted by keyset, starting after args['cursor'] if one was given.
+    fingerprint defaults to keyset.fingerprint(query, params).
+    """
+    params = list(params)
+    token = args.get('cursor')
+    if token:
+        fingerprint = fingerprint or keyset.fingerprint(query, params)
+        where, key_params = keyset.after(keyset.decode(token, fingerprint))
+        query += ' AND ' + where
+        params.extend(key_params)
+    return f'{query} ORDER BY {keyset.order_by()}', params
+
+
+def paginate(c, query, params, keyset, args, fingerprint=None):
+    """
+    Run one page of query ordered by keyset.
+
+    args is the request's query string: 'cursor' continues a listing,
+    'limit' sets the page size (capped at MAX_PAGE_SIZE) and 'count=1'
+    also returns the total number of matching rows.
+    """
+    limit = page_size(args.get('limit'))
+    params = list(params)
+    fingerprint = fingerprint or keyset.fingerprint(query, params)
+
+    total = None
+    if args.get('count') in ('1', 'true'):
+        c.execute(f'SELECT COUNT(*) FROM ({query})', params)
+        total = c.fetchone()[0]
+
+    query, params = ordered(query, params, keyset, args, fingerprint)
+    c.execute(f'{query} LIMIT ?', params + [limit + 1])
+    rows = [dict(row) for row in c.fetchmany(limit + 1)]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = keyset.encode(rows[-1], fingerprint)
+    return Page(rows, next_cursor, total)
+
+
+def page_headers(page, base_url, args):
+    """Response headers carrying the continuation token and optional total"""
+    headers = {}
+    if page.next_cursor:
+        headers['X-Next-Cursor'] = page.next_cursor
+        next_args = dict(args.items())
+        next_args['cursor'] = page.next_cursor
+        next_args.pop('count', None)
+        headers['Link'] = f'<{base_url}?{urlencode(next_args)}>; rel="next"'
+    if page.total is not None:
+        headers['X-Total-Count'] = str(page.total)
+    return headers
@@ -0,0 +1,343 @@
+"""
+Per-request timing for the Flask app.
+
+Every request's wall time is split into SQL (a timing cursor around the
+pooled connection, so fetches count as well as execute), JSON serialization,
+template rendering and whatever is left in the handler itself. Each response
+carries a Server-Timing header, totals are exported in the Prometheus text
+format by /metrics, and any statement slower than PROFILE_SLOW_QUERY_MS is
+logged with its EXPLAIN QUERY PLAN. With PROFILE_SAMPLE_EVERY = N, one
+request in N also runs under cProfile and its stats are dumped to
+PROFILE_DIR for `python -m pstats`.
+"""
+import cProfile
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from flask import before_render_template, g, has_app_context, has_request_context, request, template_rendered
+from flask.json.provider import DefaultJSONProvider
+
+log = logging.getLogger('profiling')
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PHASES = ('handler', 'sql', 'serialize', 'template')
+
+
+class Recorder:
+    """Timings for one request, kept on flask.g"""
+
+    __slots__ = ('start', 'sql', 'queries', 'serialize', 'template', 'template_start', 'slow_ms',
+                 'slow_queries', 'profile')
+
+    def __init__(self, slow_ms):
+        self.start = time.perf_counter()
+        self.sql = 0.0
+        self.queries = 0
+        self.serialize = 0.0
+        self.template = 0.0
+        self.template_start = None
+        self.slow_ms = slow_ms
+        self.slow_queries = 0
+        self.profile = None
+
+
+def current():
+    return g.get('profiling') if has_app_context() else None
+
+
+class TimedCursor:
+    """Cursor proxy that charges execute and fetch time to the request"""
+
+    def __init__(self, cursor, recorder):
+        self._cursor = cursor
+        self._recorder = recorder
+        self._sql = None
+        self._params = None
+        self._elapsed = 0.0
+        self._reported = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._elapsed += elapsed
+            self._recorder.sql += elapsed
+            if not self._reported and self._elapsed * 1000 >= self._recorder.slow_ms:
+                self._reported = True
+                self._recorder.slow_queries += 1
+                slow_query(self._cursor.connection, self._sql, self._params, self._elapsed)
+
+    def _statement(self, sql, params):
+        self._sql, self._params = sql, params
+        self._elapsed = 0.0
+        self._reported = False
+        self._recorder.queries += 1
+
+    def execute(self, sql, params=()):
+        self._statement(sql, params)
+        self._timed(self._cursor.execute, sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._statement(sql, None)
+        self._timed(self._cursor.executemany, sql, seq_of_params)
+        return self
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+
+class TimedConnection:
+    """Connection proxy handing out TimedCursors; close() still reaches the pool"""
+
+    def __init__(self, conn, recorder):
+        self._conn = conn
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def cursor(self):
+        return TimedCursor(self._conn.cursor(), self._recorder)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+def connection(conn):
+    """Wrap a connection for timing when the current request is being profiled"""
+    recorder = current()
+    return TimedConnection(conn, recorder) if recorder is not None else conn
+
+
+def explain(conn, sql, params):
+    try:
+        return [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params or ())]
+    except (sqlite3.Error, ValueError):
+        return []
+
+
+def slow_query(conn, sql, params, elapsed):
+    metrics.slow_query()
+    plan = explain(conn, sql, params) if params is not None else []
+    where = f'{request.method} {request.path}' if has_request_context() else 'background'
+    log.warning('Slow query (%.1f ms) in %s: %s\n    params: %r\n    plan: %s',
+                elapsed * 1000, where, ' '.join(sql.split()), params, '; '.join(plan) or 'n/a')
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify() with its encoding time charged to the request"""
+
+    def dumps(self, obj, **kwargs):
+        recorder = current()
+        if recorder is None:
+            return super().dumps(obj, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            recorder.serialize += time.perf_counter() - start
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class Metrics:
+    """Process-wide counters and latency histograms, rendered for Prometheus"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.histograms = {}
+            self.phases = defaultdict(float)
+            self.queries = defaultdict(int)
+            self.slow_queries = 0
+            self.profiled = 0
+
+    def observe(self, method, endpoint, status, duration, recorder):
+        handler = max(0.0, duration - recorder.sql - recorder.serialize - recorder.template)
+        with self._lock:
+            self.requests[method, endpoint, status] += 1
+            histogram = self.histograms.get((method, endpoint))
+            if histogram is None:
+                # one count per bucket, then sum and count
+                histogram = self.histograms[method, endpoint] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    histogram[i] += 1
+            histogram[-2] += duration
+            histogram[-1] += 1
+            for phase, seconds in zip(PHASES, (handler, recorder.sql, recorder.serialize, recorder.template)):
+                self.phases[endpoint, phase] += seconds
+            self.queries[endpoint] += recorder.queries
+
+    def slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def sampled(self):
+        with self._lock:
+            self.profiled += 1
+
+    def render(self, gauges=None):
+        """
+        Prometheus text format. gauges is {name: value} for extra point-in-time
+        values; a value may also be a list of (labels, value) pairs.
+        """
+        out = []
+
+        def header(name, kind, text):
+            out.append(f'# HELP {name} {text}')
+            out.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            header('http_requests_total', 'counter', 'Requests served.')
+            for (method, endpoint, status), count in sorted(self.requests.items()):
+                out.append(f'http_requests_total{_labels(method=method, endpoint=endpoint, status=status)} {count}')
+
+            header('http_request_duration_seconds', 'histogram', 'Request wall time.')
+            for (method, endpoint), histogram in sorted(self.histograms.items()):
+                for bound, count in zip(self.buckets, histogram):
+                    labels = _labels(method=method, endpoint=endpoint, le=bound)
+                    out.append(f'http_request_duration_seconds_bucket{labels} {count}')
+                labels = _labels(method=method, endpoint=endpoint, le='+Inf')
+                out.append(f'http_request_duration_seconds_bucket{labels} {histogram[-1]}')
+                labels = _labels(method=method, endpoint=endpoint)
+                out.append(f'http_request_duration_seconds_sum{labels} {histogram[-2]:.6f}')
+                out.append(f'http_request_duration_seconds_count{labels} {histogram[-1]}')
+
+            header('http_request_phase_seconds_total', 'counter',
+                   'Request time by phase: handler, sql, serialize, template.')
+            for (endpoint, phase), seconds in sorted(self.phases.items()):
+                out.append(f'http_request_phase_seconds_total{_labels(endpoint=endpoint, phase=phase)} {seconds:.6f}')
+
+            header('sql_queries_total', 'counter', 'Statements executed.')
+            for endpoint, count in sorted(self.queries.items()):
+                out.append(f'sql_queries_total{_labels(endpoint=endpoint)} {count}')
+
+            header('sql_slow_queries_total', 'counter', 'Statements slower than PROFILE_SLOW_QUERY_MS.')
+            out.append(f'sql_slow_queries_total {self.slow_queries}')
+            header('profiled_requests_total', 'counter', 'Requests captured with cProfile.')
+            out.append(f'profiled_requests_total {self.profiled}')
+
+        for name, value in (gauges or {}).items():
+            header(name, 'gauge', name.replace('_', ' ') + '.')
+            if isinstance(value, list):
+                out.extend(f'{name}{_labels(**labels)} {v}' for labels, v in value)
+            else:
+                out.append(f'{name} {value}')
+        return '\n'.join(out) + '\n'
+
+
+metrics = Metrics()
+
+
+def install(app):
+    """Register the profiling hooks on app; PROFILING = False leaves requests untouched"""
+    app.config.setdefault('PROFILING', True)
+    app.config.setdefault('PROFILE_SLOW_QUERY_MS', 100)
+    app.config.setdefault('PROFILE_SAMPLE_EVERY', 0)
+    app.config.setdefault('PROFILE_DIR', 'profiles')
+    app.json = TimedJSONProvider(app)
+    counter = itertools.count(1)
+
+    @app.before_request
+    def start_profiling():
+        if not app.config['PROFILING']:
+            return
+        recorder = g.profiling = Recorder(app.config['PROFILE_SLOW_QUERY_MS'])
+        every = app.config['PROFILE_SAMPLE_EVERY']
+        if every and next(counter) % every == 0:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                return  # another profiler is already active in this thread
+            recorder.profile = profile
+
+    @app.after_request
+    def finish_profiling(response):
+        recorder = current()
+        if recorder is None:
+            return response
+        g.profiling = None
+        duration = time.perf_counter() - recorder.start
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        if recorder.profile is not None:
+            recorder.profile.disable()
+            dump_profile(app.config['PROFILE_DIR'], recorder.profile, request.method, endpoint)
+
+        metrics.observe(request.method, endpoint, str(response.status_code), duration, recorder)
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={recorder.sql * 1000:.2f};desc="{recorder.queries} queries"',
+            f'serialize;dur={recorder.serialize * 1000:.2f}',
+            f'template;dur={recorder.template * 1000:.2f}',
+            f'total;dur={duration * 1000:.2f}',
+        ])
+        return response
+
+    def template_start(sender, **extra):
+        recorder = current()
+        if recorder is not None:
+            recorder.template_start = time.perf_counter()
+
+    def template_end(sender, **extra):
+        recorder = current()
+        if recorder is not None and recorder.template_start is not None:
+            recorder.template += time.perf_counter() - recorder.template_start
+            recorder.template_start = None
+
+    before_render_template.connect(template_start, app, weak=False)
+    template_rendered.connect(template_end, app, weak=False)
+
+
+def dump_profile(directory, profile, method, endpoint):
+    metrics.sampled()
+    os.makedirs(directory, exist_ok=True)
+    name = ''.join(ch if ch.isalnum() else '_' for ch in endpoint).strip('_') or 'root'
+    path = os.path.join(directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{method}-{name}-{time.time_ns() % 10**9}.prof')
+    profile.dump_stats(path)
+    log.info('Profiled %s %s -> %s', method, endpoint, path)
+    return path
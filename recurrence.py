@@ -0,0 +1,177 @@
+"""
+Recurring service schedules.
+
+A subscription row is the recurrence rule: start_date, end_date and a
+frequency. Service requests are only materialised for a rolling horizon
+(SCHEDULE_HORIZON_DAYS past today, or past the start date for subscriptions
+that have not begun) with one recursive-CTE INSERT; roll_forward() extends
+the horizon for every active subscription and is meant to run periodically.
+
+subscriptions.materialized_until records how far each rule has been expanded
+and the unique (subscription_id, scheduled_date) index makes re-running any
+of this a no-op.
+"""
+import json
+import sqlite3
+import sys
+from datetime import date
+
+SCHEDULE_HORIZON_DAYS = 14
+
+# Days between occurrences, matching the original generate_service_requests()
+FREQUENCY_DAYS = {
+    'daily': 1,
+    'weekly': 7,
+    'monthly': 30,
+    'quarterly': 90,
+    'half-yearly': 180,
+}
+DEFAULT_FREQUENCY_DAYS = 30
+
+_STEP_SQL = 'CASE s.frequency {} ELSE {} END'.format(
+    ' '.join(f"WHEN '{name}' THEN {days}" for name, days in FREQUENCY_DAYS.items()),
+    DEFAULT_FREQUENCY_DAYS)
+
+# Last day a subscription should be materialised to, given :today and :horizon
+_HORIZON_SQL = "MIN(date(s.end_date), date(MAX(:today, date(s.start_date)), :horizon))"
+
+_MATERIALIZE_SQL = f'''
+    WITH RECURSIVE
+    due AS (
+        SELECT s.id, s.start_date, s.preferred_time, s.materialized_until,
+               {_STEP_SQL} AS step, {_HORIZON_SQL} AS last_day
+        FROM subscriptions s
+        WHERE {{where}}
+          AND (s.materialized_until IS NULL OR s.materialized_until < {_HORIZON_SQL})
+    ),
+    occurrence (subscription_id, day, step, last_day, preferred_time, materialized_until) AS (
+        SELECT id, date(start_date), step, last_day, preferred_time, materialized_until FROM due
+        UNION ALL
+        SELECT subscription_id, date(day, '+' || step || ' days'), step, last_day,
+               preferred_time, materialized_until
+        FROM occurrence
+        WHERE date(day, '+' || step || ' days') <= last_day
+    )
+    INSERT OR IGNORE INTO service_requests
+        (subscription_id, service_provider_id, scheduled_date, scheduled_time, status)
+    SELECT subscription_id, NULL, day, preferred_time, 'scheduled'
+    FROM occurrence
+    WHERE day <= last_day AND day > COALESCE(materialized_until, '')
+'''
+
+_ADVANCE_SQL = f'''
+    UPDATE subscriptions AS s SET materialized_until = {_HORIZON_SQL}
+    WHERE {{where}}
+      AND (s.materialized_until IS NULL OR s.materialized_until < {_HORIZON_SQL})
+'''
+
+
+def _params(today, horizon_days, **extra):
+    today = today or date.today()
+    if not isinstance(today, str):
+        today = today.strftime('%Y-%m-%d')
+    return dict(extra, today=today, horizon=f'+{int(horizon_days)} days')
+
+
+def _changes(c):
+    # cursor.rowcount is -1 for statements that start with WITH
+    return c.execute('SELECT changes()').fetchone()[0]
+
+
+def materialize(c, subscription_id, today=None, horizon_days=SCHEDULE_HORIZON_DAYS):
+    """Insert the upcoming occurrences of one subscription; returns rows added"""
+    params = _params(today, horizon_days, subscription_id=subscription_id)
+    c.execute(_MATERIALIZE_SQL.format(where='s.id = :subscription_id'), params)
+    added = _changes(c)
+    c.execute(_ADVANCE_SQL.format(where='s.id = :subscription_id'), params)
+    return added
+
+
+def materialize_many(c, subscription_ids, today=None, horizon_days=SCHEDULE_HORIZON_DAYS):
+    """materialize() for several subscriptions in one statement; returns rows added"""
+    params = _params(today, horizon_days, ids=json.dumps(list(subscription_ids)))
+    where = 's.id IN (SELECT value FROM json_each(:ids))'
+    c.execute(_MATERIALIZE_SQL.format(where=where), params)
+    added = _changes(c)
+    c.execute(_ADVANCE_SQL.format(where=where), params)
+    return added
+
+
+_ROLL_WHERE = "s.status = 'active' AND date(s.end_date) >= :today"
+
+# The next batch_size subscriptions after :after that are behind their horizon
+_DUE_IDS_SQL = f'''
+    SELECT s.id FROM subscriptions s
+    WHERE {_ROLL_WHERE} AND s.id > :after
+      AND (s.materialized_until IS NULL OR s.materialized_until < {_HORIZON_SQL})
+    ORDER BY s.id LIMIT :batch_size
+'''
+
+
+def _roll(c, where, params):
+    c.execute('BEGIN IMMEDIATE')
+    try:
+        c.execute(_MATERIALIZE_SQL.format(where=where), params)
+        added = _changes(c)
+        c.execute(_ADVANCE_SQL.format(where=where), params)
+        c.execute('COMMIT')
+    except Exception:
+        c.execute('ROLLBACK')
+        raise
+    return added
+
+
+def roll_forward(conn, today=None, horizon_days=SCHEDULE_HORIZON_DAYS, batch_size=None, heartbeat=None):
+    """
+    Extend every active subscription's schedule up to the horizon. With
+    batch_size, each transaction covers at most that many subscriptions and
+    heartbeat() (if given) is called between them.
+    """
+    c = conn.cursor()
+    if batch_size is None:
+        return _roll(c, _ROLL_WHERE, _params(today, horizon_days))
+
+    added, after = 0, 0
+    while True:
+        params = _params(today, horizon_days, after=after, batch_size=batch_size)
+        ids = [row[0] for row in c.execute(_DUE_IDS_SQL, params).fetchall()]
+        if not ids:
+            return added
+        params['ids'] = json.dumps(ids)
+        added += _roll(c, f'{_ROLL_WHERE} AND s.id IN (SELECT value FROM json_each(:ids))', params)
+        after = ids[-1]
+        if heartbeat:
+            heartbeat()
+
+
+def add_schedule_constraints(c):
+    """Migration: dedupe schedules, make them unique and track the horizon"""
+    columns = [row[1] for row in c.execute('PRAGMA table_info(subscriptions)')]
+    if 'materialized_until' not in columns:
+        c.execute('ALTER TABLE subscriptions ADD COLUMN materialized_until DATE')
+
+    # Checkout used to generate every schedule twice; keep the row that has
+    # progressed furthest (or the oldest) for each (subscription, date)
+    c.execute('''DELETE FROM service_requests
+                 WHERE subscription_id IS NOT NULL AND id NOT IN (
+                     SELECT (SELECT sr2.id FROM service_requests sr2
+                             WHERE sr2.subscription_id = sr.subscription_id
+                               AND sr2.scheduled_date = sr.scheduled_date
+                             ORDER BY sr2.status = 'scheduled', sr2.id LIMIT 1)
+                     FROM service_requests sr
+                     WHERE sr.subscription_id IS NOT NULL
+                     GROUP BY sr.subscription_id, sr.scheduled_date)''')
+    c.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_service_requests_subscription_date
+                 ON service_requests (subscription_id, scheduled_date)''')
+    c.execute('''UPDATE subscriptions SET materialized_until = (
+                     SELECT MAX(scheduled_date) FROM service_requests
+                     WHERE subscription_id = subscriptions.id)
+                 WHERE materialized_until IS NULL''')
+
+
+if __name__ == '__main__':
+    database = sys.argv[1] if len(sys.argv) > 1 else 'service_platform.db'
+    conn = sqlite3.connect(database, timeout=10.0, isolation_level=None)
+    added = roll_forward(conn)
+    conn.close()
+    print(f'Materialised {added} service requests')
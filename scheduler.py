@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Background scheduler for the subscription lifecycle sweeps.
+
+    python scheduler.py [--database PATH]          run as a worker
+    python scheduler.py --once [--job NAME]        run due jobs once and exit
+    python scheduler.py status
+
+It can run in any number of places at once: a separate worker, or the
+thread that `python app.py` starts. Each job has a lease row in job_leases.
+A process runs a job only if it can take that job's lease, and only once the
+job's next_run_at has passed. The lease is extended between batches and
+expires by itself if its holder dies. The row also records the last run's
+time, duration, row count and error, so every process can report on jobs
+that other processes ran.
+"""
+import argparse
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date
+
+import archive
+import inbox
+import lifecycle
+import matching
+from db_pool import PRAGMAS
+
+LEASE_SECONDS = 60
+BATCH_SIZE = 500
+POLL_SECONDS = 5
+
+
+class Job:
+    def __init__(self, name, sweep, interval):
+        self.name = name
+        self.sweep = sweep
+        self.interval = interval
+
+
+# In run order: renewals before expiry and materialisation, next dates, then housekeeping
+JOBS = [
+    Job('renew_subscriptions', lifecycle.renew_subscriptions, 3600),
+    Job('expire_subscriptions', lifecycle.expire_subscriptions, 3600),
+    Job('mark_missed_visits', lifecycle.mark_missed_visits, 3600),
+    Job('extend_schedules', lifecycle.extend_schedules, 6 * 3600),
+    Job('advance_next_service_dates', lifecycle.advance_next_service_dates, 3600),
+    Job('prune_notifications', inbox.prune_read, 24 * 3600),
+    Job('archive_history', archive.archive_history, 24 * 3600),
+    Job('prune_request_changes', matching.prune_request_changes, 3600),
+]
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS job_leases (
+        name TEXT PRIMARY KEY,
+        owner TEXT,
+        leased_until REAL NOT NULL DEFAULT 0,
+        next_run_at REAL NOT NULL DEFAULT 0,
+        runs INTEGER NOT NULL DEFAULT 0,
+        failures INTEGER NOT NULL DEFAULT 0,
+        last_started_at REAL,
+        last_duration REAL,
+        last_rows INTEGER,
+        total_rows INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT
+    ) WITHOUT ROWID''',
+    *lifecycle.INDEXES,
+]
+
+
+def create_job_leases(c):
+    """Migration: job lease table and the indexes the sweeps rely on"""
+    for statement in SCHEMA:
+        c.execute(statement)
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def acquire(conn, name, owner, lease_seconds, now=None):
+    """Take name's lease if the job is due and nobody else holds it"""
+    now = time.time() if now is None else now
+    row = conn.execute('''INSERT INTO job_leases (name, owner, leased_until) VALUES (:name, :owner, :until)
+                          ON CONFLICT (name) DO UPDATE SET owner = :owner, leased_until = :until
+                          WHERE next_run_at <= :now AND (leased_until <= :now OR owner = :owner)
+                          RETURNING owner''',
+                       {'name': name, 'owner': owner, 'until': now + lease_seconds, 'now': now}).fetchone()
+    return row is not None
+
+
+def extend(conn, name, owner, lease_seconds):
+    updated = conn.execute('UPDATE job_leases SET leased_until = ? WHERE name = ? AND owner = ?',
+                           (time.time() + lease_seconds, name, owner)).rowcount
+    if not updated:
+        raise LeaseLost(f'Lease on {name} was taken over')
+
+
+def finish(conn, name, owner, started, duration, rows, error, next_run_at):
+    conn.execute('''UPDATE job_leases SET leased_until = 0, next_run_at = ?, runs = runs + 1,
+                        failures = failures + (? IS NOT NULL), last_started_at = ?, last_duration = ?,
+                        last_rows = ?, total_rows = total_rows + ?, last_error = ?
+                    WHERE name = ? AND owner = ?''',
+                 (next_run_at, error, started, duration, rows, rows, error, name, owner))
+
+
+def status(conn):
+    """Every job's lease row as a dict, whichever process last ran it"""
+    c = conn.execute('SELECT * FROM job_leases ORDER BY name')
+    columns = [column[0] for column in c.description]
+    return [dict(zip(columns, row)) for row in c.fetchall()]
+
+
+class Scheduler:
+    def __init__(self, database, jobs=JOBS, owner=None, lease_seconds=LEASE_SECONDS,
+                 batch_size=BATCH_SIZE, poll_seconds=POLL_SECONDS):
+        self.database = database
+        self.jobs = jobs
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}:{id(self):x}'
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread = None
+        # Runs made by this process, as opposed to job_leases which covers all
+        self.local_runs = {job.name: 0 for job in jobs}
+
+    def connect(self):
+        conn = sqlite3.connect(self.database, timeout=10.0, isolation_level=None, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def run_job(self, conn, job, today=None):
+        """Run job now if its lease can be taken; returns rows changed or None if skipped"""
+        if not acquire(conn, job.name, self.owner, self.lease_seconds):
+            return None
+        started = time.time()
+        rows, error = 0, None
+        try:
+            rows = job.sweep(conn, today or date.today(), self.batch_size,
+                             heartbeat=lambda: extend(conn, job.name, self.owner, self.lease_seconds))
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+        duration = time.time() - started
+        finish(conn, job.name, self.owner, started, duration, rows, error, started + job.interval)
+        self.local_runs[job.name] += 1
+        return rows
+
+    def run_pending(self, today=None, only=None):
+        """One pass over the jobs; {name: rows} for the ones this process ran"""
+        conn = self.connect()
+        try:
+            ran = {}
+            for job in self.jobs:
+                if only and job.name not in only:
+                    continue
+                rows = self.run_job(conn, job, today)
+                if rows is not None:
+                    ran[job.name] = rows
+            return ran
+        finally:
+            conn.close()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except sqlite3.Error as e:
+                print(f'Scheduler pass failed: {e}', file=sys.stderr)
+            self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run_forever, name='scheduler', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('command', nargs='?', choices=['run', 'status'], default='run')
+    parser.add_argument('--database', default='service_platform.db')
+    parser.add_argument('--once', action='store_true', help='run due jobs once and exit')
+    parser.add_argument('--job', action='append', help='only this job (repeatable)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--poll', type=float, default=POLL_SECONDS)
+    args = parser.parse_args(argv)
+
+    scheduler = Scheduler(args.database, batch_size=args.batch_size, poll_seconds=args.poll)
+    if args.command == 'status':
+        conn = scheduler.connect()
+        for job in status(conn):
+            last = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(job['last_started_at'] or 0))
+            print(f"{job['name']:28} runs {job['runs']:5}  last {last}  "
+                  f"{(job['last_duration'] or 0) * 1000:8.1f} ms  {job['last_rows'] or 0:7} rows"
+                  + (f"  ❌ {job['last_error']}" if job['last_error'] else ''))
+        conn.close()
+        return 0
+
+    if args.once:
+        for name, rows in scheduler.run_pending(only=args.job).items():
+            print(f'{name}: {rows} rows')
+        return 0
+
+    print(f'Scheduler {scheduler.owner} polling every {args.poll}s')
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Base tables of the platform.
+
+Later changes to the schema (indexes, search, counters, ...) are versioned
+migrations in migrations.py; create_schema() runs both.
+"""
+from migrations import migrate
+
+TABLES = [
+    # Users table with enhanced fields
+    '''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL,
+        contact TEXT,
+        address TEXT,
+        city TEXT,
+        state TEXT,
+        pincode TEXT,
+        profile_image TEXT,
+        is_verified BOOLEAN DEFAULT 0,
+        rating REAL DEFAULT 0,
+        total_reviews INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+
+    # Services table with enhanced fields
+    '''CREATE TABLE IF NOT EXISTS services (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT,
+        category TEXT,
+        subcategory TEXT,
+        price REAL,
+        discount_percentage REAL DEFAULT 0,
+        duration_minutes INTEGER,
+        frequency_options TEXT,
+        provider_id INTEGER,
+        image_url TEXT,
+        is_active BOOLEAN DEFAULT 1,
+        rating REAL DEFAULT 0,
+        total_bookings INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (provider_id) REFERENCES users(id)
+    )''',
+
+    # Subscriptions table with payment tracking
+    '''CREATE TABLE IF NOT EXISTS subscriptions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id INTEGER,
+        service_id INTEGER,
+        start_date DATE,
+        end_date DATE,
+        next_service_date DATE,
+        frequency TEXT,
+        preferred_time TEXT,
+        status TEXT DEFAULT 'pending',
+        total_amount REAL,
+        discount_applied REAL DEFAULT 0,
+        payment_status TEXT DEFAULT 'pending',
+        auto_renew BOOLEAN DEFAULT 1,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (customer_id) REFERENCES users(id),
+        FOREIGN KEY (service_id) REFERENCES services(id)
+    )''',
+
+    # Service Requests with detailed tracking
+    '''CREATE TABLE IF NOT EXISTS service_requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subscription_id INTEGER,
+        customer_id INTEGER,
+        service_provider_id INTEGER,
+        service_category TEXT,
+        service_description TEXT,
+        location TEXT,
+        scheduled_date DATE,
+        scheduled_time TEXT,
+        actual_start_time TIMESTAMP,
+        actual_end_time TIMESTAMP,
+        status TEXT DEFAULT 'scheduled',
+        customer_rating INTEGER,
+        customer_feedback TEXT,
+        provider_notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (subscription_id) REFERENCES subscriptions(id),
+        FOREIGN KEY (customer_id) REFERENCES users(id),
+        FOREIGN KEY (service_provider_id) REFERENCES users(id)
+    )''',
+
+    # Payments table with transaction details
+    '''CREATE TABLE IF NOT EXISTS payments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subscription_id INTEGER,
+        amount REAL,
+        payment_method TEXT,
+        transaction_id TEXT,
+        razorpay_order_id TEXT,
+        razorpay_payment_id TEXT,
+        razorpay_signature TEXT,
+        payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status TEXT DEFAULT 'pending',
+        FOREIGN KEY (subscription_id) REFERENCES subscriptions(id)
+    )''',
+
+    # Reviews table
+    '''CREATE TABLE IF NOT EXISTS reviews (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        service_id INTEGER,
+        customer_id INTEGER,
+        provider_id INTEGER,
+        rating INTEGER,
+        comment TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (service_id) REFERENCES services(id),
+        FOREIGN KEY (customer_id) REFERENCES users(id),
+        FOREIGN KEY (provider_id) REFERENCES users(id)
+    )''',
+
+    # Notifications table
+    '''CREATE TABLE IF NOT EXISTS notifications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        title TEXT,
+        message TEXT,
+        type TEXT,
+        is_read BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )''',
+]
+
+
+def create_schema(conn):
+    """Create any missing tables and apply pending migrations (conn in autocommit mode)"""
+    c = conn.cursor()
+    for statement in TABLES:
+        c.execute(statement)
+    return migrate(conn)
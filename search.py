@@ -0,0 +1,139 @@
+"""
+FTS5 full-text search over the services catalogue.
+
+services_fts is an external-content FTS5 table over services(name,
+description, category, subcategory), kept in sync by triggers. Results are
+ranked by bm25 with the service rating and booking count folded in, and the
+last search term is matched as a prefix so the search box works as type-ahead.
+"""
+import re
+
+# Column weights for bm25(): name, description, category, subcategory
+BM25_WEIGHTS = (10.0, 2.0, 5.0, 4.0)
+# How much a full star of rating / a popular service moves the bm25 score
+RATING_WEIGHT = 0.5
+BOOKINGS_WEIGHT = 1.0
+
+SCHEMA = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS services_fts USING fts5(
+        name, description, category, subcategory,
+        content='services', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')''',
+    '''CREATE TRIGGER IF NOT EXISTS services_fts_insert AFTER INSERT ON services BEGIN
+        INSERT INTO services_fts (rowid, name, description, category, subcategory)
+        VALUES (new.id, new.name, new.description, new.category, new.subcategory);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS services_fts_delete AFTER DELETE ON services BEGIN
+        INSERT INTO services_fts (services_fts, rowid, name, description, category, subcategory)
+        VALUES ('delete', old.id, old.name, old.description, old.category, old.subcategory);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS services_fts_update
+       AFTER UPDATE OF name, description, category, subcategory ON services BEGIN
+        INSERT INTO services_fts (services_fts, rowid, name, description, category, subcategory)
+        VALUES ('delete', old.id, old.name, old.description, old.category, old.subcategory);
+        INSERT INTO services_fts (rowid, name, description, category, subcategory)
+        VALUES (new.id, new.name, new.description, new.category, new.subcategory);
+    END''',
+]
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def create_search_index(c):
+    for statement in SCHEMA:
+        c.execute(statement)
+    c.execute("INSERT INTO services_fts (services_fts) VALUES ('rebuild')")
+
+
+def match_expression(text):
+    """Turn free text from the search box into an FTS5 MATCH expression"""
+    terms = TOKEN.findall(text or '')
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    # The last word is usually still being typed
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def score_sql():
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    # bm25() is negative and lower is better, so subtract the boosts
+    return (f'bm25(services_fts, {weights})'
+            f' - s.rating * {RATING_WEIGHT}'
+            f' - {BOOKINGS_WEIGHT} * s.total_bookings / (s.total_bookings + 100.0)')
+
+
+def search_sql(match, category=None):
+    """Return (sql, params) selecting matching active services, best first"""
+    query = f'''SELECT s.*, {score_sql()} AS search_score
+                FROM services_fts
+                JOIN services s ON s.id = services_fts.rowid
+                WHERE services_fts MATCH ? AND s.is_active = 1'''
+    params = [match]
+    if category:
+        query += ' AND s.category = ?'
+        params.append(category)
+    return query, params
+
+
+def search_services(c, text, category=None, limit=None):
+    match = match_expression(text)
+    if match is None:
+        return []
+    query, params = search_sql(match, category)
+    query += ' ORDER BY search_score, s.id'
+    if limit:
+        query += ' LIMIT ?'
+        params.append(limit)
+    c.execute(query, params)
+    return [dict(row) for row in c.fetchall()]
+
+
+if __name__ == '__main__':
+    # Benchmark: python search.py [services] [queries]
+    import os
+    import random
+    import sqlite3
+    import sys
+    import tempfile
+    import time
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    # Catalogue-like text: a few hundred service words plus a long tail of
+    # brand/location words, so a typical term matches a small slice of rows
+    rng = random.Random(1)
+    head = ['cleaning', 'deep', 'garden', 'plumbing', 'repair', 'install', 'painting',
+            'pest', 'wiring', 'yoga', 'grooming', 'moving', 'tutoring', 'detailing']
+    tail = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 9)))
+            for _ in range(20000)]
+    categories = ['Cleaning', 'Gardening', 'Plumbing', 'Electrical', 'Painting', 'Beauty']
+
+    def phrase(n):
+        return ' '.join([rng.choice(head)] + rng.sample(tail, n - 1))
+
+    path = os.path.join(tempfile.mkdtemp(), 'search.db')
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('''CREATE TABLE services (id INTEGER PRIMARY KEY, name TEXT, description TEXT,
+                    category TEXT, subcategory TEXT, is_active BOOLEAN DEFAULT 1,
+                    rating REAL DEFAULT 0, total_bookings INTEGER DEFAULT 0)''')
+    conn.execute('BEGIN')
+    create_search_index(conn.cursor())
+    conn.executemany(
+        'INSERT INTO services (name, description, category, subcategory, rating, total_bookings) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        ((phrase(3), phrase(12), rng.choice(categories), rng.choice(head),
+          rng.uniform(3.5, 5), rng.randint(0, 5000))
+         for _ in range(count)))
+    conn.execute('COMMIT')
+
+    c = conn.cursor()
+    queries = [f'{rng.choice(tail)} {rng.choice(tail)[:4]}' for _ in range(runs // 2)]
+    queries += [rng.choice(tail)[:3] for _ in range(runs - len(queries))]
+    start = time.perf_counter()
+    for i, text in enumerate(queries):
+        search_services(c, text, categories[i % len(categories)], limit=20)
+    elapsed = (time.perf_counter() - start) / runs
+    print(f'{count} services: {elapsed * 1000:.3f} ms per search (top 20)')
@@ -0,0 +1,331 @@
+"""
+Seed data for development and load testing.
+
+Rows come from generators and are written with executemany in fixed-size
+batches, each in its own transaction, so seeding any number of services,
+users or subscriptions runs in constant memory. Services 1-500 are the demo
+catalogue the app has always shipped with.
+"""
+import itertools
+import random
+from datetime import date, timedelta
+
+from werkzeug.security import generate_password_hash
+
+BATCH_SIZE = 1000
+CATALOGUE_SIZE = 500
+
+# (category, subcategories) of the demo catalogue
+CATEGORIES = [
+    ('Cleaning', ['Deep Cleaning', 'Regular Cleaning',
+     'Office Cleaning', 'Carpet Cleaning', 'Window Cleaning']),
+    ('Gardening', ['Lawn Care', 'Garden Maintenance',
+     'Tree Trimming', 'Landscaping', 'Pest Control']),
+    ('Plumbing', ['Repair', 'Installation',
+     'Maintenance', 'Emergency', 'Leak Detection']),
+    ('Electrical', ['Repair', 'Installation',
+     'Maintenance', 'Wiring', 'Fixtures']),
+    ('AC Service', ['Maintenance', 'Repair', 'Installation',
+     'Duct Cleaning', 'Filter Replacement']),
+    ('Painting', ['Interior', 'Exterior',
+     'Commercial', 'Residential', 'Touch-up']),
+    ('Pest Control', ['Prevention', 'Treatment',
+     'Inspection', 'Rodent Control', 'Termite Control']),
+    ('Car Care', ['Cleaning', 'Detailing',
+     'Maintenance', 'Repair', 'Towing']),
+    ('Home Repair', ['Carpentry', 'Roofing',
+     'Flooring', 'Drywall', 'Insulation']),
+    ('Appliance Repair', [
+     'Refrigerator', 'Washing Machine', 'Dishwasher', 'Oven', 'Microwave']),
+    ('Security', ['Installation', 'Monitoring',
+     'Cameras', 'Alarms', 'Access Control']),
+    ('IT Services', ['Computer Repair', 'Network Setup',
+     'Data Recovery', 'Software Installation', 'Tech Support']),
+    ('Moving', ['Local Moving', 'Long Distance',
+     'Packing', 'Storage', 'Furniture Assembly']),
+    ('Beauty', ['Hair Styling', 'Makeup', 'Nails', 'Spa', 'Massage']),
+    ('Fitness', ['Personal Training', 'Yoga',
+     'Pilates', 'Group Classes', 'Nutrition']),
+    ('Tutoring', ['Math', 'Science',
+     'Language', 'Test Prep', 'Music']),
+    ('Pet Care', ['Grooming', 'Walking',
+     'Sitting', 'Training', 'Veterinary']),
+    ('Event Planning', ['Weddings', 'Parties',
+     'Corporate', 'Catering', 'Decorations']),
+    ('Photography', ['Portrait', 'Event',
+     'Commercial', 'Real Estate', 'Product']),
+    ('Legal Services', ['Consultation', 'Document Prep',
+     'Notary', 'Mediation', 'Contract Review'])
+]
+
+# Image URLs for different categories - highly specific and appropriate
+CATEGORY_IMAGES = {
+    'Cleaning': [
+        # Professional cleaning service
+        'https://images.unsplash.com/photo-1558618666-fcd25c85cd64?w=400',
+        'https://images.unsplash.com/photo-1581578731548-c64695cc6952?w=400',  # House cleaning
+        'https://images.unsplash.com/photo-1497366216548-37526070297c?w=400',  # Office cleaning
+        'https://images.unsplash.com/photo-1586023492125-27b2c045efd7?w=400',  # Carpet cleaning
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400'   # Window cleaning
+    ],
+    'Gardening': [
+        'https://images.unsplash.com/photo-1416879595882-3373a0480b5b?w=400',  # Garden maintenance
+        'https://images.unsplash.com/photo-1585320806297-9794b3e4eeae?w=400',  # Lawn care
+        'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400',  # Tree trimming
+        'https://images.unsplash.com/photo-1585320806297-9794b3e4eeae?w=400',  # Landscaping
+        'https://images.unsplash.com/photo-1592150621744-aca64f48394a?w=400'   # Pest control
+    ],
+    'Plumbing': [
+        'https://images.unsplash.com/photo-1621905251189-08b45d6a269e?w=400',  # Plumbing repair
+        'https://images.unsplash.com/photo-1607472586893-edb57bdc0e39?w=400',  # Pipe installation
+        # Plumbing maintenance
+        'https://images.unsplash.com/photo-1584464491033-06628f3a6b7b?w=400',
+        'https://images.unsplash.com/photo-1584464491033-06628f3a6b7b?w=400',  # Emergency plumbing
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400'   # Leak detection
+    ],
+    'Electrical': [
+        'https://images.unsplash.com/photo-1621905252507-b35492cc74b4?w=400',  # Electrical repair
+        # Electrical installation
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',
+        # Electrical maintenance
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Wiring
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400'   # Electrical fixtures
+    ],
+    'AC Service': [
+        'https://images.unsplash.com/photo-1585771724684-38269d6639fd?w=400',  # AC maintenance
+        'https://images.unsplash.com/photo-1581094794329-c8112a89af12?w=400',  # AC repair
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # AC installation
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Duct cleaning
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400'   # Filter replacement
+    ],
+    'Painting': [
+        'https://images.unsplash.com/photo-1562259949-e8e7689d7828?w=400',  # Interior painting
+        'https://images.unsplash.com/photo-1503387837-b154d5074bd2?w=400',  # Exterior painting
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Commercial painting
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Residential painting
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400'   # Touch-up painting
+    ],
+    'Pest Control': [
+        'https://images.unsplash.com/photo-1581092160562-40aa08e78837?w=400',  # Pest prevention
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Pest treatment
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Pest inspection
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Rodent control
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400'   # Termite control
+    ],
+    'Car Care': [
+        'https://images.unsplash.com/photo-1601362840469-51e4d8d58785?w=400',  # Car cleaning
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Car detailing
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Car maintenance
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Car repair
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400'   # Car towing
+    ],
+    'Home Repair': [
+        'https://images.unsplash.com/photo-1581244277943-fe4a9c777189?w=400',  # Carpentry
+        'https://images.unsplash.com/photo-1504307651254-35680f356dfd?w=400',  # Roofing
+        'https://images.unsplash.com/photo-1586023492125-27b2c045efd7?w=400',  # Flooring
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Drywall
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400'   # Insulation
+    ],
+    'Appliance Repair': [
+        'https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=400',  # Refrigerator repair
+        # Washing machine repair
+        'https://images.unsplash.com/photo-1584568694244-14e3f4c0b4b5?w=400',
+        'https://images.unsplash.com/photo-1556909172-54557c7e4fb7?w=400',  # Dishwasher repair
+        'https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=400',  # Oven repair
+        'https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=400'   # Microwave repair
+    ],
+    'Security': [
+        # Security installation
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Security monitoring
+        'https://images.unsplash.com/photo-1557804506-669a67965ba0?w=400',  # Security cameras
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400',  # Security alarms
+        'https://images.unsplash.com/photo-1558618047-3c8c76ca7d13?w=400'   # Access control
+    ],
+    'IT Services': [
+        'https://images.unsplash.com/photo-1517077304055-6e89abbf09b0?w=400',  # Computer repair
+        'https://images.unsplash.com/photo-1558494949-ef010cbdcc31?w=400',  # Network setup
+        'https://images.unsplash.com/photo-1558494949-ef010cbdcc31?w=400',  # Data recovery
+        # Software installation
+        'https://images.unsplash.com/photo-1558494949-ef010cbdcc31?w=400',
+        'https://images.unsplash.com/photo-1558494949-ef010cbdcc31?w=400'   # Tech support
+    ],
+    'Moving': [
+        'https://images.unsplash.com/photo-1600518464441-9154a4dea21b?w=400',  # Local moving
+        # Long distance moving
+        'https://images.unsplash.com/photo-1600518464441-9154a4dea21b?w=400',
+        'https://images.unsplash.com/photo-1600518464441-9154a4dea21b?w=400',  # Packing services
+        'https://images.unsplash.com/photo-1600518464441-9154a4dea21b?w=400',  # Storage
+        'https://images.unsplash.com/photo-1600518464441-9154a4dea21b?w=400'   # Furniture assembly
+    ],
+    'Beauty': [
+        'https://images.unsplash.com/photo-1562322140-8baeececf3df?w=400',  # Hair styling
+        'https://images.unsplash.com/photo-1516975080664-ed2fc6a32937?w=400',  # Makeup
+        'https://images.unsplash.com/photo-1562322140-8baeececf3df?w=400',  # Nails
+        'https://images.unsplash.com/photo-1544161515-4ab6ce6db874?w=400',  # Spa
+        'https://images.unsplash.com/photo-1544161515-4ab6ce6db874?w=400'   # Massage
+    ],
+    'Fitness': [
+        'https://images.unsplash.com/photo-1571019613454-1cb2f99b2d8b?w=400',  # Personal training
+        'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400',  # Yoga
+        'https://images.unsplash.com/photo-1571019613454-1cb2f99b2d8b?w=400',  # Pilates
+        'https://images.unsplash.com/photo-1571019613454-1cb2f99b2d8b?w=400',  # Group classes
+        'https://images.unsplash.com/photo-1571019613454-1cb2f99b2d8b?w=400'   # Nutrition
+    ],
+    'Tutoring': [
+        'https://images.unsplash.com/photo-1503676260728-1c00da094a0b?w=400',  # Math tutoring
+        'https://images.unsplash.com/photo-1503676260728-1c00da094a0b?w=400',  # Science tutoring
+        'https://images.unsplash.com/photo-1503676260728-1c00da094a0b?w=400',  # Language tutoring
+        'https://images.unsplash.com/photo-1503676260728-1c00da094a0b?w=400',  # Test prep
+        'https://images.unsplash.com/photo-1503676260728-1c00da094a0b?w=400'   # Music tutoring
+    ],
+    'Pet Care': [
+        'https://images.unsplash.com/photo-1583337130417-3346a1be7dee?w=400',  # Pet grooming
+        'https://images.unsplash.com/photo-1583337130417-3346a1be7dee?w=400',  # Pet walking
+        'https://images.unsplash.com/photo-1583337130417-3346a1be7dee?w=400',  # Pet sitting
+        'https://images.unsplash.com/photo-1583337130417-3346a1be7dee?w=400',  # Pet training
+        'https://images.unsplash.com/photo-1583337130417-3346a1be7dee?w=400'   # Veterinary
+    ],
+    'Event Planning': [
+        'https://images.unsplash.com/photo-1519741497674-611481863552?w=400',  # Wedding planning
+        'https://images.unsplash.com/photo-1530103862676-de8c9debad1d?w=400',  # Party planning
+        'https://images.unsplash.com/photo-1519741497674-611481863552?w=400',  # Corporate events
+        'https://images.unsplash.com/photo-1530103862676-de8c9debad1d?w=400',  # Catering
+        'https://images.unsplash.com/photo-1530103862676-de8c9debad1d?w=400'   # Event decorations
+    ],
+    'Photography': [
+        # Portrait photography
+        'https://images.unsplash.com/photo-1606983340126-99ab4feaa64a?w=400',
+        'https://images.unsplash.com/photo-1606983340126-99ab4feaa64a?w=400',  # Event photography
+        # Commercial photography
+        'https://images.unsplash.com/photo-1606983340126-99ab4feaa64a?w=400',
+        # Real estate photography
+        'https://images.unsplash.com/photo-1606983340126-99ab4feaa64a?w=400',
+        # Product photography
+        'https://images.unsplash.com/photo-1606983340126-99ab4feaa64a?w=400'
+    ],
+    'Legal Services': [
+        'https://images.unsplash.com/photo-1589829545856-d10d557cf95f?w=400',  # Legal consultation
+        # Document preparation
+        'https://images.unsplash.com/photo-1589829545856-d10d557cf95f?w=400',
+        'https://images.unsplash.com/photo-1589829545856-d10d557cf95f?w=400',  # Notary services
+        'https://images.unsplash.com/photo-1589829545856-d10d557cf95f?w=400',  # Mediation
+        'https://images.unsplash.com/photo-1589829545856-d10d557cf95f?w=400'   # Contract review
+    ]
+}
+
+DEFAULT_IMAGE = 'https://images.unsplash.com/photo-1557804506-669a67965ba0?w=400'
+
+FREQUENCY_OPTIONS = ['daily,weekly,monthly', 'weekly,monthly',
+                     'monthly,quarterly', 'quarterly,half-yearly']
+
+
+def services(count, start_id=1):
+    """Service rows; ids 1-500 reproduce the demo catalogue, later ids cycle its categories"""
+    subcategories = [(category, idx, subcategory)
+                     for category, names in CATEGORIES
+                     for idx, subcategory in enumerate(names)]
+    for service_id in range(start_id, start_id + count):
+        # 5 services per subcategory
+        category, subcategory_idx, subcategory = subcategories[(service_id - 1) // 5 % len(subcategories)]
+        images = CATEGORY_IMAGES.get(category, [DEFAULT_IMAGE])
+        yield (
+            f"{subcategory} Service {service_id}",
+            f"Professional {subcategory.lower()} service for {category.lower()}",
+            category, subcategory,
+            200 + (service_id * 10),  # Varying prices
+            5 + (service_id % 15),  # Varying discounts
+            60 + (service_id % 180),  # Varying durations
+            FREQUENCY_OPTIONS[service_id % 4],
+            None, images[subcategory_idx % len(images)], 1,
+            3.5 + (service_id % 15) / 10,  # Ratings between 3.5-5.0
+            10 + (service_id * 3)  # Varying booking counts
+        )
+
+
+def users(count, start_id=1, provider_every=10, password='password123'):
+    """Customers, with every provider_every-th user a provider; all share one password"""
+    hashed = generate_password_hash(password)
+    for user_id in range(start_id, start_id + count):
+        role = 'provider' if user_id % provider_every == 0 else 'customer'
+        yield (f'{role.title()} {user_id}', f'{role}{user_id}@example.com', hashed, role,
+               f'9{user_id:09d}', f'{user_id} Main Street', 'Bengaluru', 'Karnataka', '560001')
+
+
+def subscriptions(count, customer_ids, service_ids, seed=0, today=None):
+    """Active subscriptions spread over the given customers and services"""
+    rng = random.Random(seed)
+    today = today or date.today()
+    frequencies = ['daily', 'weekly', 'monthly', 'quarterly', 'half-yearly']
+    for _ in range(count):
+        start = today + timedelta(days=rng.randint(-60, 30))
+        end = start + timedelta(days=rng.choice([30, 90, 180, 365]))
+        yield (rng.choice(customer_ids), rng.choice(service_ids), start.isoformat(),
+               end.isoformat(), rng.choice(frequencies),
+               rng.choice(['morning', 'afternoon', 'evening']), 'active',
+               round(rng.uniform(200, 5000), 2))
+
+
+INSERT_SERVICES = '''INSERT INTO services
+    (name, description, category, subcategory, price, discount_percentage, duration_minutes,
+     frequency_options, provider_id, image_url, is_active, rating, total_bookings)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+INSERT_USERS = '''INSERT INTO users
+    (name, email, password, role, contact, address, city, state, pincode)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+INSERT_SUBSCRIPTIONS = '''INSERT INTO subscriptions
+    (customer_id, service_id, start_date, end_date, frequency, preferred_time, status, total_amount)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+
+
+def write_batches(conn, sql, rows, batch_size=BATCH_SIZE):
+    """executemany rows in batches of batch_size, one transaction each; returns rows written"""
+    c = conn.cursor()
+    written = 0
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return written
+        c.execute('BEGIN IMMEDIATE')
+        try:
+            c.executemany(sql, batch)
+            c.execute('COMMIT')
+        except Exception:
+            c.execute('ROLLBACK')
+            raise
+        written += len(batch)
+
+
+def _next_id(conn, table):
+    return conn.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {table}').fetchone()[0]
+
+
+def seed(conn, services_count=0, users_count=0, subscriptions_count=0, batch_size=BATCH_SIZE):
+    """Append rows to each table (conn in autocommit mode); returns {table: rows written}"""
+    written = {}
+    if services_count:
+        rows = services(services_count, _next_id(conn, 'services'))
+        written['services'] = write_batches(conn, INSERT_SERVICES, rows, batch_size)
+    if users_count:
+        rows = users(users_count, _next_id(conn, 'users'))
+        written['users'] = write_batches(conn, INSERT_USERS, rows, batch_size)
+    if subscriptions_count:
+        customer_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE role = 'customer'")]
+        service_ids = [row[0] for row in conn.execute('SELECT id FROM services WHERE is_active = 1')]
+        if not customer_ids or not service_ids:
+            raise ValueError('Seed customers and services before subscriptions')
+        rows = subscriptions(subscriptions_count, customer_ids, service_ids)
+        written['subscriptions'] = write_batches(conn, INSERT_SUBSCRIPTIONS, rows, batch_size)
+    return written
+
+
+def seed_catalogue(conn, batch_size=BATCH_SIZE):
+    """Top the services table up to the demo catalogue; returns rows written"""
+    missing = CATALOGUE_SIZE - conn.execute('SELECT COUNT(*) FROM services').fetchone()[0]
+    if missing <= 0:
+        return 0
+    return seed(conn, services_count=missing, batch_size=batch_size)['services']
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Production launch: pre-forked WSGI workers around one SQLite writer.
+
+    python serve.py --workers 4 --port 8000
+    python serve.py --workers 8 --max-batch 128 --max-wait-ms 5
+
+The supervisor binds the listening socket, starts the writer process (see
+writer.py) and forks the workers. The kernel spreads incoming connections
+across the workers. Each worker serves its requests on threads, because
+every open dashboard holds an /api/events stream (--no-threads is only for
+debugging). Workers read on their own pooled WAL connections and send their
+writes to the writer, which commits them in group transactions. The
+lifecycle scheduler (which also trims the matching change log) and the
+outbox dispatcher run in the writer process too, so workers never write. A worker
+that exits is replaced, and if the writer exits the supervisor shuts
+everything down.
+
+Server-sent events go through the writer as well: it numbers every event
+and relays it to all workers, so an SSE client sees every event whichever
+worker it is connected to.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+from migrations import require_latest, SchemaOutOfDate
+
+
+def start_writer(database, address, max_batch, max_wait, scheduler):
+    import writer
+    process = multiprocessing.get_context('fork').Process(
+        target=writer.serve, args=(database, address, max_batch, max_wait, scheduler), name='writer')
+    process.start()
+    deadline = time.monotonic() + 10
+    while not os.path.exists(address):
+        if not process.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError('Writer process failed to start')
+        time.sleep(0.01)
+    return process
+
+
+def run_worker(listener, database, address, threaded):
+    """Child process body: serve app on the inherited socket until killed"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    from werkzeug.serving import make_server
+    import app as app_module
+    app_module.DATABASE = database
+    app_module.app.config['WRITER_ADDRESS'] = address
+    # Connect now so the worker relays events to its SSE clients before its first write
+    app_module.get_writer()
+    host, port = listener.getsockname()[:2]
+    server = make_server(host, port, app_module.app, threaded=threaded, fd=listener.fileno())
+    server.serve_forever()
+
+
+def fork_worker(listener, database, address, threaded):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(listener, database, address, threaded)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database', default='service_platform.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--no-threads', dest='threads', action='store_false',
+                        help='serve one request at a time per worker; an open SSE stream blocks the worker')
+    parser.add_argument('--max-batch', type=int, default=64, help='most intents per group transaction')
+    parser.add_argument('--max-wait-ms', type=float, default=2.0, help='how long a group waits to fill')
+    parser.add_argument('--no-scheduler', dest='scheduler', action='store_false')
+    args = parser.parse_args(argv)
+
+    try:
+        require_latest(args.database)
+    except SchemaOutOfDate as e:
+        print(f'{e}; run "python manage.py init" first')
+        return 1
+
+    runtime = tempfile.mkdtemp(prefix='service-platform-')
+    address = os.path.join(runtime, 'writer.sock')
+    writer_process = start_writer(args.database, address, args.max_batch, args.max_wait_ms / 1000,
+                                  args.scheduler)
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((args.host, args.port))
+    listener.listen(1024)
+    listener.set_inheritable(True)
+
+    workers = set()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        # Wakes the os.waitpid() below, which would otherwise wait for a child to exit
+        raise InterruptedError
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        workers.add(fork_worker(listener, args.database, address, args.threads))
+    print(f'Serving on http://{args.host}:{args.port} with {args.workers} workers '
+          f'(writer pid {writer_process.pid})')
+
+    try:
+        while not stopping:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except InterruptedError:
+                continue
+            except ChildProcessError:
+                break
+            if pid == writer_process.pid:
+                print('Writer exited; shutting down', file=sys.stderr)
+                break
+            if pid in workers:
+                workers.discard(pid)
+                if not stopping:
+                    print(f'Worker {pid} exited ({status}); replacing it', file=sys.stderr)
+                    workers.add(fork_worker(listener, args.database, address, args.threads))
+    finally:
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in workers:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        writer_process.terminate()
+        writer_process.join(5)
+        listener.close()
+        shutil.rmtree(runtime, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
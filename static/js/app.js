@@ -4,6 +4,9 @@ const API_BASE_URL = 'http://127.0.0.1:5000/api';
 
 // Utility Functions
 const API = {
+    // Last ETag and body per GET endpoint, for conditional requests
+    validators: {},
+
     // Generic fetch wrapper
     async fetch(endpoint, options = {}) {
         const defaultOptions = {
@@ -12,6 +15,8 @@ const API = {
                 'Content-Type': 'application/json',
             },
         };
+        const isGet = !options.method || options.method.toUpperCase() === 'GET';
+        const cached = isGet ? this.validators[endpoint] : null;
         
         try {
             const response = await fetch(`${API_BASE_URL}${endpoint}`, {
@@ -19,16 +24,27 @@ const API = {
                 ...options,
                 headers: {
                     ...defaultOptions.headers,
+                    ...(cached ? { 'If-None-Match': cached.etag } : {}),
                     ...options.headers,
                 }
             });
             
+            // Nothing changed since the last poll: reuse what we already have
+            if (response.status === 304 && cached) {
+                return cached.data;
+            }
+            
             const data = await response.json();
             
             if (!response.ok) {
                 throw new Error(data.error || 'Request failed');
             }
             
+            const etag = response.headers.get('ETag');
+            if (isGet && etag) {
+                this.validators[endpoint] = { etag, data };
+            }
+            
             return data;
         } catch (error) {
             console.error('API Error:', error);
@@ -36,6 +52,24 @@ const API = {
         }
     },
     
+    // Every page of a keyset listing: follows X-Next-Cursor until the last page
+    async fetchAll(endpoint) {
+        const rows = [];
+        let cursor = null;
+        do {
+            const separator = endpoint.includes('?') ? '&' : '?';
+            const url = cursor ? `${endpoint}${separator}cursor=${encodeURIComponent(cursor)}` : endpoint;
+            const response = await fetch(`${API_BASE_URL}${url}`, { credentials: 'include' });
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.error || 'Request failed');
+            }
+            rows.push(...data);
+            cursor = response.headers.get('X-Next-Cursor');
+        } while (cursor);
+        return rows;
+    },
+    
     // Auth methods
     async login(email, password) {
         return await this.fetch('/login', {
@@ -62,7 +96,7 @@ const API = {
         let url = '/services?';
         if (search) url += `search=${search}&`;
         if (category) url += `category=${category}`;
-        return await this.fetch(url);
+        return await this.fetchAll(url);
     },
     
     async getService(id) {
@@ -124,7 +158,7 @@ const API = {
 
     // Customer service requests
     async getCustomerServiceRequests() {
-        return await this.fetch('/customer/service-requests');
+        return await this.fetchAll('/customer/service-requests');
     },
 
     async createServiceRequest(requestData) {
@@ -166,17 +200,31 @@ const API = {
 
     // Upcoming schedules
     async getUpcomingSchedules() {
-        return await this.fetch('/upcoming-schedules');
+        return await this.fetchAll('/upcoming-schedules');
     },
 
     // Payment history
     async getPaymentHistory() {
-        return await this.fetch('/payment-history');
+        return await this.fetchAll('/payment-history');
     },
 
     // Categories
     async getCategories() {
         return await this.fetch('/categories');
+    },
+
+    // Live updates over Server-Sent Events: handlers maps event type -> callback.
+    // EventSource reconnects on its own and resumes from the last event id.
+    // Providers also get the open-jobs feed.
+    subscribeEvents(handlers) {
+        if (typeof EventSource === 'undefined') {
+            return null;
+        }
+        const source = new EventSource(`${API_BASE_URL}/events`, { withCredentials: true });
+        Object.entries(handlers).forEach(([type, handler]) => {
+            source.addEventListener(type, (event) => handler(JSON.parse(event.data || '{}')));
+        });
+        return source;
     }
 };
 
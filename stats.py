@@ -0,0 +1,299 @@
+"""
+Per-user dashboard counters.
+
+user_stats holds one row per user with everything /api/dashboard/stats
+returns. Triggers on subscriptions, service_requests, payments and services
+keep it current on every write path, so the endpoint is a primary-key
+lookup. rebuild() recomputes every counter from the base tables and verify()
+reports any row that has drifted from them.
+
+    python stats.py verify [database]
+    python stats.py rebuild [database]
+"""
+import sqlite3
+import sys
+
+COUNTERS = ('active_subscriptions', 'next_upcoming_date', 'total_spent',
+            'scheduled_requests', 'in_progress_requests', 'completed_requests',
+            'total_services')
+
+# Recomputes one customer's next scheduled visit (uses the subscription indexes)
+_NEXT_DATE = '''(SELECT MIN(sr.scheduled_date) FROM service_requests sr
+                 JOIN subscriptions s ON sr.subscription_id = s.id
+                 WHERE s.customer_id = user_stats.user_id
+                   AND sr.status IN ('scheduled', 'in_progress'))'''
+
+_TOTAL_SPENT = '''(SELECT COALESCE(SUM(p.amount), 0) FROM payments p
+                   JOIN subscriptions s ON p.subscription_id = s.id
+                   WHERE s.customer_id = user_stats.user_id AND p.status = 'completed')'''
+
+
+def _ensure(user_expr):
+    return f'INSERT OR IGNORE INTO user_stats (user_id) SELECT {user_expr} WHERE {user_expr} IS NOT NULL;'
+
+
+def _subscription_customer(row):
+    return f'(SELECT customer_id FROM subscriptions WHERE id = {row}.subscription_id)'
+
+
+def _provider_delta(row, sign):
+    return f'''UPDATE user_stats SET
+            scheduled_requests = scheduled_requests {sign} ({row}.status = 'scheduled'),
+            in_progress_requests = in_progress_requests {sign} ({row}.status = 'in_progress'),
+            completed_requests = completed_requests {sign} ({row}.status = 'completed')
+        WHERE user_id = {row}.service_provider_id;'''
+
+
+def _payment_delta(row, sign):
+    return f'''UPDATE user_stats SET total_spent = total_spent {sign} {row}.amount
+        WHERE {row}.status = 'completed' AND {row}.amount IS NOT NULL
+          AND user_id = {_subscription_customer(row)};'''
+
+
+# Completed jobs and spend of rows moved to the monthly archive (archive.py)
+ARCHIVED_TOTALS = '''CREATE TABLE IF NOT EXISTS archived_totals (
+        user_id INTEGER PRIMARY KEY,
+        completed_requests INTEGER NOT NULL DEFAULT 0,
+        total_spent REAL NOT NULL DEFAULT 0
+    )'''
+
+SCHEMA = [
+    ARCHIVED_TOTALS,
+    '''CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INTEGER PRIMARY KEY,
+        active_subscriptions INTEGER NOT NULL DEFAULT 0,
+        next_upcoming_date DATE,
+        total_spent REAL NOT NULL DEFAULT 0,
+        scheduled_requests INTEGER NOT NULL DEFAULT 0,
+        in_progress_requests INTEGER NOT NULL DEFAULT 0,
+        completed_requests INTEGER NOT NULL DEFAULT 0,
+        total_services INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )''',
+
+    # Subscriptions: active count, plus next date / spend if the owner changes
+    f'''CREATE TRIGGER IF NOT EXISTS user_stats_subscription_insert
+        AFTER INSERT ON subscriptions BEGIN
+        {_ensure('new.customer_id')}
+        UPDATE user_stats SET active_subscriptions = active_subscriptions + (new.status = 'active')
+        WHERE user_id = new.customer_id;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS user_stats_subscription_status
+        AFTER UPDATE OF status ON subscriptions
+        WHEN old.status IS NOT new.status AND old.customer_id IS new.customer_id BEGIN
+        UPDATE user_stats SET active_subscriptions = active_subscriptions
+            - (old.status = 'active') + (new.status = 'active')
+        WHERE user_id = new.customer_id;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS user_stats_subscription_owner
+        AFTER UPDATE OF customer_id ON subscriptions
+        WHEN old.customer_id IS NOT new.customer_id BEGIN
+        {_ensure('new.customer_id')}
+        UPDATE user_stats SET active_subscriptions = active_subscriptions - (old.status = 'active')
+        WHERE user_id = old.customer_id;
+        UPDATE user_stats SET active_subscriptions = active_subscriptions + (new.status = 'active')
+        WHERE user_id = new.customer_id;
+        UPDATE user_stats SET next_upcoming_date = {_NEXT_DATE}, total_spent = {_TOTAL_SPENT}
+        WHERE user_id IN (old.customer_id, new.customer_id);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS user_stats_subscription_delete
+        AFTER DELETE ON subscriptions BEGIN
+        UPDATE user_stats SET active_subscriptions = active_subscriptions - (old.status = 'active'),
+            next_upcoming_date = {_NEXT_DATE}, total_spent = {_TOTAL_SPENT}
+        WHERE user_id = old.customer_id;
+    END''',
+
+    # Service requests: provider counters and the customer's next visit
+    f'''CREATE TRIGGER IF NOT EXISTS user_stats_request_insert
+        AFTER INSERT ON service_requests BEGIN
+        {_ensure('new.service_provider_id')}
+        {_provider_delta('new', '+')}
+        {_ensure(_subscription_customer('new'))}
+        UPDATE user_stats SET next_upcoming_date = new.scheduled_date
+        WHERE new.status IN ('scheduled', 'in_progress')
+          AND (next_upcoming_date IS NULL OR new.scheduled_date < next_upcoming_date)
+          AND user_id = {_subscription_customer('new')};
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS user_stats_request_update
+        AFTER UPDATE OF status, service_provider_id, scheduled_date, subscription_id ON service_requests
+        WHEN old.status IS NOT new.status
+          OR old.service_provider_id IS NOT new.service_provider_id
+          OR old.scheduled_date IS NOT new.scheduled_date
+          OR old.subscription_id IS NOT new.subscription_id BEGIN
+        {_provider_delta('old', '-')}
+        {_ensure('new.service_provider_id')}
+        {_provider_delta('new', '+')}
+        UPDATE user_stats SET next_upcoming_date = {_NEXT_DATE}
+        WHERE user_id IN ({_subscription_customer('old')}, {_subscription_customer('new')});
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS user_stats_request_delete
+        AFTER DELETE ON service_requests BEGIN
+        {_provider_delta('old', '-')}
+        UPDATE user_stats SET next_upcoming_date = {_NEXT_DATE}
+        WHERE user_id = {_subscription_customer('old')};
+    END''',
+
+    # Payments: completed spend per customer
+    f'''CREATE TRIGGER IF NOT EXISTS user_stats_payment_insert
+        AFTER INSERT ON payments BEGIN
+        {_ensure(_subscription_customer('new'))}
+        {_payment_delta('new', '+')}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS user_stats_payment_update
+        AFTER UPDATE OF status, amount, subscription_id ON payments
+        WHEN old.status IS NOT new.status OR old.amount IS NOT new.amount
+          OR old.subscription_id IS NOT new.subscription_id BEGIN
+        {_payment_delta('old', '-')}
+        {_ensure(_subscription_customer('new'))}
+        {_payment_delta('new', '+')}
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS user_stats_payment_delete
+        AFTER DELETE ON payments BEGIN
+        {_payment_delta('old', '-')}
+    END''',
+
+    # Services: catalogue size per provider
+    f'''CREATE TRIGGER IF NOT EXISTS user_stats_service_insert
+        AFTER INSERT ON services BEGIN
+        {_ensure('new.provider_id')}
+        UPDATE user_stats SET total_services = total_services + 1 WHERE user_id = new.provider_id;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS user_stats_service_owner
+        AFTER UPDATE OF provider_id ON services
+        WHEN old.provider_id IS NOT new.provider_id BEGIN
+        UPDATE user_stats SET total_services = total_services - 1 WHERE user_id = old.provider_id;
+        {_ensure('new.provider_id')}
+        UPDATE user_stats SET total_services = total_services + 1 WHERE user_id = new.provider_id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS user_stats_service_delete
+        AFTER DELETE ON services BEGIN
+        UPDATE user_stats SET total_services = total_services - 1 WHERE user_id = old.provider_id;
+    END''',
+]
+
+# Every counter recomputed from scratch, one row per user that has any
+_RECOMPUTE_SQL = '''
+    WITH
+    subs AS (
+        SELECT customer_id AS user_id, SUM(status = 'active') AS active_subscriptions
+        FROM subscriptions WHERE customer_id IS NOT NULL GROUP BY customer_id),
+    upcoming AS (
+        SELECT s.customer_id AS user_id, MIN(sr.scheduled_date) AS next_upcoming_date
+        FROM service_requests sr JOIN subscriptions s ON sr.subscription_id = s.id
+        WHERE sr.status IN ('scheduled', 'in_progress') GROUP BY s.customer_id),
+    spent AS (
+        SELECT user_id, SUM(amount) AS total_spent FROM (
+            SELECT s.customer_id AS user_id, p.amount
+            FROM payments p JOIN subscriptions s ON p.subscription_id = s.id
+            WHERE p.status = 'completed'
+            UNION ALL
+            SELECT user_id, total_spent FROM archived_totals WHERE total_spent != 0)
+        GROUP BY user_id),
+    work AS (
+        SELECT user_id,
+               SUM(scheduled) AS scheduled_requests,
+               SUM(in_progress) AS in_progress_requests,
+               SUM(completed) AS completed_requests
+        FROM (
+            SELECT service_provider_id AS user_id, status = 'scheduled' AS scheduled,
+                   status = 'in_progress' AS in_progress, status = 'completed' AS completed
+            FROM service_requests WHERE service_provider_id IS NOT NULL
+            UNION ALL
+            SELECT user_id, 0, 0, completed_requests FROM archived_totals WHERE completed_requests != 0)
+        GROUP BY user_id),
+    catalogue AS (
+        SELECT provider_id AS user_id, COUNT(*) AS total_services
+        FROM services WHERE provider_id IS NOT NULL GROUP BY provider_id),
+    everyone AS (
+        SELECT user_id FROM subs UNION SELECT user_id FROM upcoming
+        UNION SELECT user_id FROM spent UNION SELECT user_id FROM work
+        UNION SELECT user_id FROM catalogue)
+    SELECT e.user_id,
+           COALESCE(subs.active_subscriptions, 0),
+           upcoming.next_upcoming_date,
+           COALESCE(spent.total_spent, 0),
+           COALESCE(work.scheduled_requests, 0),
+           COALESCE(work.in_progress_requests, 0),
+           COALESCE(work.completed_requests, 0),
+           COALESCE(catalogue.total_services, 0)
+    FROM everyone e
+    LEFT JOIN subs ON subs.user_id = e.user_id
+    LEFT JOIN upcoming ON upcoming.user_id = e.user_id
+    LEFT JOIN spent ON spent.user_id = e.user_id
+    LEFT JOIN work ON work.user_id = e.user_id
+    LEFT JOIN catalogue ON catalogue.user_id = e.user_id
+'''
+
+
+def create_user_stats(c):
+    """Migration: create user_stats with its triggers and fill it"""
+    for statement in SCHEMA:
+        c.execute(statement)
+    _rebuild(c)
+
+
+def _rebuild(c):
+    c.execute('DELETE FROM user_stats')
+    c.execute(f'INSERT INTO user_stats (user_id, {", ".join(COUNTERS)}) {_RECOMPUTE_SQL}')
+
+
+def rebuild(conn):
+    c = conn.cursor()
+    c.execute('BEGIN IMMEDIATE')
+    try:
+        _rebuild(c)
+        c.execute('COMMIT')
+    except Exception:
+        c.execute('ROLLBACK')
+        raise
+
+
+def _normalize(values):
+    values = list(values)
+    # total_spent is maintained with += / -= so allow for float rounding
+    values[2] = round(values[2] or 0, 2)
+    return tuple(values)
+
+
+def verify(conn):
+    """Return [(user_id, counter, stored, expected)] for every drifted counter"""
+    empty = (0, None, 0, 0, 0, 0, 0)
+    c = conn.cursor()
+    c.execute('BEGIN')
+    try:
+        expected = {row[0]: _normalize(row[1:]) for row in c.execute(_RECOMPUTE_SQL)}
+        stored = {row[0]: _normalize(row[1:]) for row in c.execute(
+            f'SELECT user_id, {", ".join(COUNTERS)} FROM user_stats')}
+    finally:
+        c.execute('COMMIT')
+
+    drift = []
+    for user_id in sorted(set(expected) | set(stored)):
+        have = stored.get(user_id, empty)
+        want = expected.get(user_id, empty)
+        for name, a, b in zip(COUNTERS, have, want):
+            if a != b:
+                drift.append((user_id, name, a, b))
+    return drift
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    database = sys.argv[2] if len(sys.argv) > 2 else 'service_platform.db'
+    conn = sqlite3.connect(database, timeout=10.0, isolation_level=None)
+
+    if command == 'rebuild':
+        rebuild(conn)
+        print('Rebuilt user_stats')
+    elif command == 'verify':
+        drift = verify(conn)
+        for user_id, name, stored, expected in drift:
+            print(f'✗ user {user_id}: {name} is {stored}, expected {expected}')
+        if drift:
+            print(f'\n❌ {len(drift)} drifted counters (run "python stats.py rebuild")')
+            sys.exit(1)
+        print('✅ user_stats matches the base tables')
+    else:
+        print('Usage: python stats.py [verify|rebuild] [database]')
+        sys.exit(2)
+    conn.close()
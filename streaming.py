@@ -0,0 +1,111 @@
+"""
+Streamed list responses.
+
+A listing requested with ?stream=json or ?stream=ndjson (or with
+'Accept: application/x-ndjson') is not paged. Its cursor is read with
+fetchmany and each batch is encoded and sent as soon as it arrives. The
+process therefore holds one batch of rows at a time, instead of the Row
+objects, the dicts and the encoded body of the whole result at once.
+
+The rows are read on a connection of their own, because the request's
+shared connection goes back to the pool before the body is sent. Since a
+single SELECT in WAL mode reads one snapshot, a long export stays
+consistent while writers carry on.
+"""
+import itertools
+import json
+
+from flask import Response
+
+FORMATS = {'json': 'application/json', 'ndjson': 'application/x-ndjson'}
+BATCH_SIZE = 500
+
+_encode = json.JSONEncoder(separators=(',', ':')).encode
+
+
+def requested_format(request):
+    """'json', 'ndjson' or None when the client wants an ordinary response"""
+    fmt = request.args.get('stream')
+    if fmt in FORMATS:
+        return fmt
+    if fmt in ('1', 'true'):
+        return 'json'
+    if request.accept_mimetypes.best == FORMATS['ndjson']:
+        return 'ndjson'
+    return None
+
+
+def encode_rows(c, fmt='json', batch_size=BATCH_SIZE):
+    """Yield c's remaining rows as a JSON array or NDJSON, one chunk per batch"""
+    columns = [column[0] for column in c.description]
+
+    def batches():
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [dict(zip(columns, row)) for row in rows]
+
+    yield from _encode_batches(batches(), fmt)
+
+
+def _encode_batches(batches, fmt):
+    separator = '\n' if fmt == 'ndjson' else ','
+    first = True
+    if fmt == 'json':
+        yield '['
+    for batch in batches:
+        chunk = separator.join(_encode(row) for row in batch)
+        if fmt == 'ndjson':
+            yield chunk + '\n'
+        else:
+            yield chunk if first else ',' + chunk
+        first = False
+    if fmt == 'json':
+        yield ']'
+
+
+def rows_response(rows, fmt='json', batch_size=BATCH_SIZE, close=None):
+    """
+    Response streaming an iterable of row dicts (e.g. from archive.Archive.rows).
+    close, if given, runs when the response is closed.
+    """
+    rows = iter(rows)
+
+    def batches():
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            yield batch
+
+    response = Response(_encode_batches(batches(), fmt), mimetype=FORMATS[fmt])
+    response.headers['X-Accel-Buffering'] = 'no'
+    if close is not None:
+        response.call_on_close(close)
+    return response
+
+
+def stream(pool, query, params, fmt='json', batch_size=BATCH_SIZE):
+    """
+    Response streaming query's rows. The statement runs before this returns,
+    so SQL errors still become ordinary error responses.
+    """
+    conn = pool.acquire()
+    try:
+        c = conn.cursor()
+        c.execute(query, params)
+    except Exception:
+        conn.close()
+        raise
+
+    def release():
+        c.close()
+        conn.close()
+
+    response = Response(encode_rows(c, fmt, batch_size), mimetype=FORMATS[fmt])
+    response.headers['X-Accel-Buffering'] = 'no'
+    # The server closes the response after the body, on a disconnect and
+    # for HEAD requests, where the body generator never starts
+    response.call_on_close(release)
+    return response
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the monthly archive of finished service requests and payments
+"""
+import sqlite3
+
+import archive
+import stats
+from pagination import Keyset
+
+
+def seed(database):
+    """Customer 1 with one subscription to provider 2's service; 6 months of finished history"""
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.execute('''INSERT INTO users (id, name, email, password, role)
+                    VALUES (1, 'Customer', 'c@example.com', 'x', 'customer'),
+                           (2, 'Provider', 'p@example.com', 'x', 'provider')''')
+    conn.execute('''INSERT INTO services (id, provider_id, name, category, price)
+                    VALUES (1, 2, 'Clean', 'Cleaning', 100)''')
+    conn.execute('''INSERT INTO subscriptions (id, customer_id, service_id, status, start_date, end_date)
+                    VALUES (1, 1, 1, 'active', '2030-01-01', '2031-01-01')''')
+    for month in range(1, 7):
+        day = f'2030-{month:02d}-15'
+        conn.execute('''INSERT INTO service_requests (subscription_id, customer_id, service_provider_id,
+                                                      scheduled_date, status, created_at)
+                        VALUES (1, 1, 2, ?, 'completed', ?)''', (day, f'{day} 08:00:00'))
+        conn.execute('''INSERT INTO payments (subscription_id, amount, payment_date, status)
+                        VALUES (1, 100, ?, 'completed')''', (f'{day} 09:00:00',))
+    conn.execute('''INSERT INTO service_requests (subscription_id, customer_id, service_provider_id,
+                                                  scheduled_date, status)
+                    VALUES (1, 1, 2, '2030-01-20', 'scheduled')''')
+    return conn
+
+
+def client_for(user_id, role):
+    import app as app_module
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['user_role'] = role
+    return client
+
+
+def test_sweep_moves_finished_rows_and_keeps_counters(database):
+    """Old finished rows land in their month's file; open work and the dashboard stay put"""
+    conn = seed(database)
+    before = conn.execute('SELECT * FROM user_stats ORDER BY user_id').fetchall()
+
+    # Everything scheduled before 2030-04-01 is past the threshold
+    assert archive.archive_history(conn, '2030-06-29', batch_size=2, after_days=89) == 3 + 3
+    assert archive.months(database) == ['2030-03', '2030-02', '2030-01']
+    assert [row[:3] for row in archive.status(database)] == [('2030-03', 1, 1), ('2030-02', 1, 1), ('2030-01', 1, 1)]
+    assert conn.execute('SELECT scheduled_date, status FROM service_requests ORDER BY scheduled_date').fetchall() == \
+        [('2030-01-20', 'scheduled'), ('2030-04-15', 'completed'), ('2030-05-15', 'completed'),
+         ('2030-06-15', 'completed')]
+    assert conn.execute('SELECT COUNT(*) FROM payments').fetchone()[0] == 3
+
+    assert conn.execute('SELECT * FROM user_stats ORDER BY user_id').fetchall() == before
+    assert conn.execute('SELECT user_id, completed_requests, total_spent FROM archived_totals ORDER BY user_id'
+                        ).fetchall() == [(1, 0, 300.0), (2, 3, 0.0)]
+    assert stats.verify(conn) == []
+    assert archive.archive_history(conn, '2030-06-29', batch_size=2, after_days=89) == 0
+
+
+def test_history_endpoints_read_through_the_archive(database):
+    """Pages and streams cover hot rows and month files in one order, several attach groups deep"""
+    conn = seed(database)
+    archive.archive_history(conn, '2030-06-29', batch_size=100, after_days=60)
+    assert len(archive.months(database)) == 4
+    limit = archive.ATTACH_LIMIT
+    archive.ATTACH_LIMIT = 3
+    try:
+        customer = client_for(1, 'customer')
+        first = customer.get('/api/payment-history?limit=4&count=1')
+        assert first.headers['X-Total-Count'] == '6'
+        rest = customer.get(f"/api/payment-history?limit=4&cursor={first.headers['X-Next-Cursor']}")
+        dates = [p['payment_date'][:7] for p in first.get_json() + rest.get_json()]
+        assert dates == ['2030-06', '2030-05', '2030-04', '2030-03', '2030-02', '2030-01']
+
+        response = customer.get('/api/customer/service-requests?stream=json')
+        streamed = response.get_json()
+        response.close()
+        assert len(streamed) == 7 and [r['scheduled_date'] for r in streamed][-2:] == ['2030-01-15', '2030-01-20']
+
+        # Streams merge one cursor per attach group as they are read
+        rows, close = archive.Archive(database).rows('SELECT * FROM {payments} p WHERE 1 = 1', [],
+                                                     Keyset('p.payment_date', 'p.id'), {})
+        assert next(rows)['payment_date'].startswith('2030-01')
+        assert [p['payment_date'][:7] for p in rows] == ['2030-02', '2030-03', '2030-04', '2030-05', '2030-06']
+        close()
+
+        provider = client_for(2, 'provider')
+        done = provider.get('/api/service-requests?status=completed').get_json()
+        assert [r['scheduled_date'][5:7] for r in done] == ['01', '02', '03', '04', '05', '06']
+        assert len(provider.get('/api/service-requests?status=scheduled').get_json()) == 1
+    finally:
+        archive.ATTACH_LIMIT = limit
+
+
+def test_interrupted_move_reads_the_hot_copy(database):
+    """A row copied to its month file but not yet deleted is listed once, from the hot table"""
+    conn = seed(database)
+    archive.archive_history(conn, '2030-06-29', batch_size=100, after_days=150)
+    assert archive.months(database) == ['2030-01']
+    conn.execute("ATTACH DATABASE ? AS copy", (archive.month_path(database, '2030-01'),))
+    conn.execute('INSERT INTO main.payments SELECT * FROM copy.payments')
+    conn.execute('UPDATE main.payments SET amount = 120 WHERE payment_date LIKE ?', ('2030-01%',))
+    conn.execute('DETACH DATABASE copy')
+
+    payments = client_for(1, 'customer').get('/api/payment-history').get_json()
+    assert len(payments) == 6 and payments[-1]['amount'] == 120
+    # The changed row is copied again and only then leaves the hot table
+    assert archive.archive_history(conn, '2030-06-29', batch_size=100, after_days=150) == 1
+    assert conn.execute("SELECT COUNT(*) FROM payments WHERE payment_date LIKE '2030-01%'").fetchone()[0] == 0
+
+
+def test_sweep_passes_rows_it_could_not_move(database):
+    """Rows that keep changing mid-move are tried once per pass instead of looping forever"""
+    conn = seed(database)
+    seen = []
+
+    def move_nothing(conn, database, table, rows):
+        seen.extend((table, row_id) for row_id, _ in rows)
+        return 0
+    move_batch, archive._move_batch = archive._move_batch, move_nothing
+    try:
+        assert archive.archive_history(conn, '2030-06-29', batch_size=2, after_days=0) == 0
+    finally:
+        archive._move_batch = move_batch
+    assert len(seen) == len(set(seen)) == 6 + 6
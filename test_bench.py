@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Tests for the endpoint benchmark suite
+"""
+import app as app_module
+import bench
+
+
+def test_every_api_route_has_a_scenario():
+    """New /api routes must be added to the benchmark"""
+    routes = {(rule.rule, method) for rule in app_module.app.url_map.iter_rules()
+              if rule.rule.startswith('/api/') for method in rule.methods - {'HEAD', 'OPTIONS'}}
+    covered = {(scenario.route, scenario.method) for scenario in bench.scenarios()}
+    assert routes - covered == set()
+
+
+def test_run_and_compare(database, tmp_path):
+    """A tiny dataset runs every scenario without errors; compare flags slowdowns only"""
+    # bench.run() repoints app.DATABASE; the fixture puts it back
+    results = bench.run(['0.005'], iterations=5, data_dir=str(tmp_path), log=lambda line: None)
+
+    stats = results['results']['0.005']
+    assert len(stats) == len(bench.scenarios())
+    assert {name for name, s in stats.items() if s['errors']} == set()
+    assert all(s['p50_ms'] <= s['p95_ms'] <= s['p99_ms'] for s in stats.values())
+
+    slower = {'results': {'0.005': {name: dict(s, p95_ms=s['p95_ms'] * 2 + 1) for name, s in stats.items()}}}
+    assert bench.compare(results, results) == []
+    assert len(bench.compare(results, slower)) == len(stats)
+    assert bench.compare(slower, results) == []
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the catalogue response cache
+"""
+import time
+
+from cache import Cache, MemoryBackend, SQLiteBackend, make_key
+from manage import init_database
+
+
+def test_keys_are_normalised():
+    """Argument order and empty values do not split the cache"""
+    assert make_key('/api/services', [('limit', '10'), ('category', 'Cleaning')]) == \
+        make_key('/api/services', [('category', 'Cleaning'), ('search', ''), ('limit', '10')])
+    assert make_key('/api/categories', []) == '/api/categories'
+
+
+def test_memory_backend_lru_ttl_and_tags():
+    """Least recently used entries go first, expired ones miss, tags drop only their entries"""
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', 1, 60, ['category:Cleaning'])
+    backend.set('b', 2, 60, ['category:Plumbing'])
+    backend.get('a')
+    backend.set('c', 3, 60, ['category:Cleaning'])
+    assert backend.get('b') is None and backend.evictions == 1
+
+    assert backend.invalidate(['category:Cleaning']) == 2
+    assert backend.size() == 0
+
+    backend.set('d', 4, 0.01)
+    time.sleep(0.02)
+    assert backend.get('d') is None
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    """Two workers pointing at one file see each other's entries and invalidations"""
+    path = str(tmp_path / 'cache.db')
+    first = Cache(SQLiteBackend(path))
+    second = Cache(SQLiteBackend(path))
+
+    value, hit = first.get_or_set('k', lambda: {'rows': [1, 2]}, tags=['service:1'])
+    assert not hit
+    value, hit = second.get_or_set('k', lambda: {'rows': []})
+    assert hit and value == {'rows': [1, 2]}
+
+    assert second.invalidate('service:1') == 1
+    assert first.get_or_set('k', lambda: None) == (None, False)
+
+
+def test_create_service_invalidates_its_listings(database):
+    """Category listings are served from cache until a service is added to them"""
+    import app as app_module
+    init_database(database)
+
+    client = app_module.app.test_client()
+    first = client.get('/api/services?category=Cleaning')
+    again = client.get('/api/services?category=Cleaning')
+    other = client.get('/api/categories')
+    assert first.headers['X-Cache'] == 'MISS'
+    assert again.headers['X-Cache'] == 'HIT' and again.get_json() == first.get_json()
+    assert other.headers['X-Cache'] == 'MISS'
+    client.get('/api/services?category=Plumbing')
+
+    with client.session_transaction() as sess:
+        sess['user_id'] = 2
+        sess['user_role'] = 'provider'
+    response = client.post('/api/services', json={
+        'name': 'Sofa Shampooing', 'description': 'Deep clean', 'category': 'Cleaning',
+        'price': 900, 'frequency_options': 'monthly'})
+    assert response.status_code == 201
+
+    fresh = client.get('/api/services?category=Cleaning')
+    assert fresh.headers['X-Cache'] == 'MISS'
+    assert len(fresh.get_json()) == len(first.get_json()) + 1
+    assert client.get('/api/services?category=Plumbing').headers['X-Cache'] == 'HIT'
+    assert client.get('/api/categories').headers['X-Cache'] == 'MISS'
+
+
+def test_write_from_another_worker_is_never_served_stale(database):
+    """A service added without this process's invalidation still misses its category's entry"""
+    import sqlite3
+    import app as app_module
+    init_database(database)
+
+    client = app_module.app.test_client()
+    first = client.get('/api/services?category=Cleaning')
+    client.get('/api/services?category=Plumbing')
+
+    with sqlite3.connect(database) as conn:
+        conn.execute("""INSERT INTO services (provider_id, name, description, category, price, frequency_options)
+                        VALUES (2, 'Window Washing', 'Inside and out', 'Cleaning', 700, 'monthly')""")
+
+    fresh = client.get('/api/services?category=Cleaning')
+    assert fresh.headers['X-Cache'] == 'MISS'
+    assert len(fresh.get_json()) == len(first.get_json()) + 1
+    assert client.get('/api/services?category=Plumbing').headers['X-Cache'] == 'HIT'
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for cart checkout and the single-service order it generalises
+"""
+import sqlite3
+
+import stats
+
+
+def make_client(database):
+    import app as app_module
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.executemany('''INSERT INTO services (id, provider_id, name, category, price, discount_percentage)
+                        VALUES (?, 9, ?, 'Cleaning', ?, ?)''',
+                     [(1, 'Clean', 1000, 10), (2, 'Garden', 499.99, 0), (3, 'Pest', 750, 15)])
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['user_role'] = 'customer'
+    return client, conn
+
+
+def test_cart_is_one_order_with_every_row_written(database):
+    """Three lines price in one query and commit together under one order id"""
+    client, conn = make_client(database)
+    order = client.post('/api/cart/checkout', json={'items': [
+        {'service_id': 1, 'frequency': 'weekly', 'start_date': '2030-01-01'},
+        {'service_id': 2, 'frequency': 'monthly', 'duration': 'quarterly', 'start_date': '2030-01-05'},
+        {'service_id': 1, 'frequency': 'daily', 'start_date': '2030-02-01', 'preferred_time': 'evening'},
+    ]}).get_json()
+
+    assert order['type'] == 'cart' and order['currency'] == 'INR'
+    assert [(line['service_id'], line['amount']) for line in order['items']] == \
+        [(1, 90000), (2, 49999), (1, 90000)]
+    assert order['amount'] == 90000 + 49999 + 90000
+    ids = [line['subscription_id'] for line in order['items']]
+    assert conn.execute('SELECT id, service_id, end_date, preferred_time FROM subscriptions ORDER BY id').fetchall() \
+        == [(ids[0], 1, '2030-01-31', None), (ids[1], 2, '2030-04-05', None), (ids[2], 1, '2030-03-03', 'evening')]
+    assert conn.execute('SELECT DISTINCT razorpay_order_id FROM payments').fetchall() == [(order['order_id'],)]
+    assert conn.execute('''SELECT subscription_id, COUNT(*) FROM service_requests
+                           GROUP BY subscription_id ORDER BY subscription_id''').fetchall() == \
+        [(ids[0], 3), (ids[1], 1), (ids[2], 15)]
+    assert conn.execute('SELECT active_subscriptions, total_spent FROM user_stats WHERE user_id = 1').fetchone() \
+        == (3, 900 + 499.99 + 900)
+    assert stats.verify(conn) == []
+
+
+def test_bad_carts_write_nothing(database):
+    """An unknown service fails the whole cart; malformed items and anonymous carts are rejected"""
+    client, conn = make_client(database)
+    response = client.post('/api/cart/checkout', json={'items': [
+        {'service_id': 1, 'start_date': '2030-01-01'}, {'service_id': 42, 'start_date': '2030-01-01'}]})
+    assert response.status_code == 404 and response.get_json()['service_ids'] == [42]
+    for items in ([], [{'service_id': 1}], [{'service_id': '1', 'start_date': '2030-01-01'}],
+                  [{'service_id': 1, 'start_date': '2030-01-01', 'type': 'instant'}]):
+        assert client.post('/api/cart/checkout', json={'items': items}).status_code == 400
+    with client.session_transaction() as sess:
+        sess.clear()
+    assert client.post('/api/cart/checkout', json={'items': [
+        {'service_id': 1, 'start_date': '2030-01-01'}]}).status_code == 401
+    assert conn.execute('SELECT (SELECT COUNT(*) FROM subscriptions) + (SELECT COUNT(*) FROM payments)'
+                        ).fetchone()[0] == 0
+
+
+def test_create_order_is_a_cart_of_one(database):
+    """The single-service endpoint keeps its response; instant bookings are unchanged"""
+    client, conn = make_client(database)
+    order = client.post('/api/create-order', json={'service_id': 3, 'frequency': 'weekly',
+                                                   'start_date': '2030-01-01'}).get_json()
+    assert order['type'] == 'subscription' and order['amount'] == 63750
+    assert order['order_id'].startswith(f"subscription_order_{order['subscription_id']}_")
+    assert client.post('/api/create-order', json={'service_id': 7, 'start_date': '2030-01-01'}).status_code == 404
+
+    instant = client.post('/api/create-order', json={'service_id': 2, 'type': 'instant',
+                                                     'start_date': '2030-01-02'}).get_json()
+    assert instant['type'] == 'instant' and instant['amount'] == 49999
+    assert conn.execute('SELECT COUNT(*) FROM payments').fetchone()[0] == 2
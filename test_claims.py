@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Load test for atomic job claiming: 100 provider threads race for the same jobs
+"""
+import random
+import sqlite3
+import threading
+
+import pytest
+
+import claims
+import outbox
+import writer
+from manage import init_database
+
+PROVIDERS = 100
+JOBS = 200
+
+
+def add_jobs(database):
+    init_database(database)
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.executemany(
+        '''INSERT INTO service_requests (customer_id, service_category, scheduled_date, status)
+           VALUES (?, ?, ?, 'scheduled')''',
+        [(i % 7 + 1, 'Cleaning', '2025-01-01') for i in range(JOBS)])
+    conn.close()
+
+
+def test_concurrent_providers_claim_each_job_once(database):
+    """Every job ends up with exactly one provider and one notification"""
+    add_jobs(database)
+    claims.metrics = claims.ClaimMetrics()
+    won = {}
+    lock = threading.Lock()
+    barrier = threading.Barrier(PROVIDERS)
+
+    def provider(provider_id):
+        conn = sqlite3.connect(database, timeout=0.05, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        rng = random.Random(provider_id)
+        jobs = list(range(1, JOBS + 1))
+        rng.shuffle(jobs)
+        barrier.wait()
+        for job_id in jobs[:JOBS // 4]:
+            outcome, _ = claims.claim_job(conn, job_id, provider_id, max_retries=50)
+            if outcome == claims.CLAIMED:
+                with lock:
+                    assert job_id not in won, f'job {job_id} claimed twice'
+                    won[job_id] = provider_id
+        conn.close()
+
+    threads = [threading.Thread(target=provider, args=(i + 1,)) for i in range(PROVIDERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert outbox.Dispatcher(database, channels=[]).drain() == len(won)
+    conn = sqlite3.connect(database)
+    rows = dict(conn.execute(
+        "SELECT id, service_provider_id FROM service_requests WHERE status = 'accepted'"))
+    notifications = conn.execute(
+        "SELECT COUNT(*) FROM notifications WHERE type = 'service_accepted'").fetchone()[0]
+    conn.close()
+
+    stats = claims.metrics.snapshot()
+    assert rows == won
+    assert notifications == len(won)
+    assert stats['claimed'] == len(won)
+    assert stats['claimed'] + stats['lost_races'] + stats['busy_failures'] == PROVIDERS * (JOBS // 4)
+    assert stats['lost_races'] > 0
+
+
+def test_claim_outcomes(database):
+    """A second claim loses the race and an unknown id is not found"""
+    add_jobs(database)
+    conn = sqlite3.connect(database, isolation_level=None)
+    assert claims.claim_job(conn, 1, 10)[0] == claims.CLAIMED
+    assert claims.claim_job(conn, 1, 11)[0] == claims.LOST
+    assert claims.claim_job(conn, JOBS + 1, 11)[0] == claims.NOT_FOUND
+    conn.close()
+
+
+class Stuck:
+    """A writer client whose every call fails with error"""
+
+    def __init__(self, error):
+        self.error = error
+
+    def call(self, name, **params):
+        raise self.error
+
+
+def test_busy_writes_are_busy_not_errors(database):
+    """A locked database, a writer timeout or a lost writer all come back as BUSY"""
+    add_jobs(database)
+    claims.metrics = claims.ClaimMetrics()
+    locker = sqlite3.connect(database, isolation_level=None)
+    locker.execute('BEGIN IMMEDIATE')
+    conn = sqlite3.connect(database, timeout=0.01, isolation_level=None)
+    assert claims.claim_job(conn, 1, 10, max_retries=1) == (claims.BUSY, None)
+    locker.execute('ROLLBACK')
+
+    for error in (writer.WriteFailed('OperationalError: database is locked', sqlite3.SQLITE_BUSY), TimeoutError(),
+                  writer.WriterUnavailable('Writer connection lost')):
+        assert claims.claim_job(conn, 1, 10, client=Stuck(error)) == (claims.BUSY, None)
+    assert claims.metrics.snapshot()['busy_failures'] == 4
+    with pytest.raises(writer.WriteFailed):
+        claims.claim_job(conn, 1, 10, client=Stuck(writer.WriteFailed('ValueError: database is busy')))
+    assert claims.claim_job(conn, 1, 10)[0] == claims.CLAIMED
+
+
+if __name__ == '__main__':
+    test_concurrent_providers_claim_each_job_once()
+    test_claim_outcomes()
+    test_busy_writes_are_busy_not_errors()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for the synthetic dataset generator
+"""
+import itertools
+import sqlite3
+from datetime import date
+
+import pytest
+
+import inbox
+import stats
+from dataset import generate
+from manage import init_database
+
+TODAY = date(2025, 6, 1)
+
+
+@pytest.fixture
+def make_dataset(tmp_path):
+    """make_dataset(seed, **overrides) -> (conn, counts), each in a database of its own"""
+    numbers = itertools.count()
+
+    def make(seed=0, **overrides):
+        path = str(tmp_path / f'dataset-{next(numbers)}.db')
+        init_database(path, catalogue=False)
+        conn = sqlite3.connect(path, isolation_level=None)
+        counts = generate(conn, scale=0.02, seed=seed, today=TODAY, batch_size=500, **overrides)
+        return conn, counts
+    return make
+
+
+def fingerprint(conn):
+    return conn.execute('''SELECT COUNT(*), TOTAL(subscription_id * 31 + service_provider_id),
+                                  GROUP_CONCAT(scheduled_date, '') IS NOT NULL
+                           FROM service_requests''').fetchone(), \
+        conn.execute('SELECT TOTAL(customer_id * service_id) FROM subscriptions').fetchone()
+
+
+def test_same_seed_same_database(make_dataset):
+    """The generator is deterministic for a given profile and seed"""
+    first, counts = make_dataset(seed=7)
+    second, _ = make_dataset(seed=7)
+    other, _ = make_dataset(seed=8)
+    assert fingerprint(first) == fingerprint(second)
+    assert fingerprint(first) != fingerprint(other)
+    assert set(counts) == {'users', 'services', 'subscriptions', 'payments', 'service_requests',
+                           'reviews', 'notifications'}
+
+
+def test_schedules_follow_frequency_and_horizon(make_dataset):
+    """Weekly subscriptions get visits 7 days apart and nothing past the horizon"""
+    conn, _ = make_dataset()
+    gaps = conn.execute('''SELECT DISTINCT julianday(b.scheduled_date) - julianday(a.scheduled_date)
+                           FROM service_requests a
+                           JOIN service_requests b ON b.subscription_id = a.subscription_id
+                             AND b.scheduled_date = (SELECT MIN(scheduled_date) FROM service_requests
+                                                     WHERE subscription_id = a.subscription_id
+                                                       AND scheduled_date > a.scheduled_date)
+                           JOIN subscriptions s ON s.id = a.subscription_id
+                           WHERE s.frequency = 'weekly' ''').fetchall()
+    assert gaps == [(7.0,)]
+    beyond = conn.execute('''SELECT COUNT(*) FROM service_requests sr
+                             JOIN subscriptions s ON s.id = sr.subscription_id
+                             WHERE sr.scheduled_date > date(MAX(?, s.start_date), '+14 days')
+                                OR sr.scheduled_date > s.end_date''', (TODAY.isoformat(),))
+    assert beyond.fetchone()[0] == 0
+    assert conn.execute('''SELECT COUNT(*) FROM service_requests
+                           WHERE scheduled_date < ? AND status = 'scheduled'
+                             AND subscription_id IS NOT NULL''', (TODAY.isoformat(),)).fetchone()[0] == 0
+
+
+def test_popularity_is_skewed_and_derived_state_rebuilt(make_dataset):
+    """A few services dominate, and triggers, indexes and counters are back after the load"""
+    conn, _ = make_dataset(service_skew=1.2)
+    top, average = conn.execute('''SELECT MAX(n), AVG(n) FROM
+                                   (SELECT COUNT(*) AS n FROM subscriptions GROUP BY service_id)''').fetchone()
+    assert top > 10 * average
+
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger')")}
+    assert {'idx_service_requests_subscription_date', 'user_stats_request_insert',
+            'services_fts_insert'} <= names
+    assert stats.verify(conn) == []
+    assert inbox.verify(conn) == []
+    assert conn.execute("SELECT COUNT(*) FROM services_fts WHERE services_fts MATCH 'cleaning'").fetchone()[0] > 0
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled SQLite connection manager
+"""
+import threading
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+@pytest.fixture
+def make_pool(tmp_path):
+    return lambda **kwargs: ConnectionPool(str(tmp_path / 'pool.db'), **kwargs)
+
+
+def test_connections_are_reused(make_pool):
+    """A released connection is handed out again without reconnecting"""
+    pool = make_pool(max_size=2)
+    conn = pool.acquire()
+    raw = conn.raw
+    conn.close()
+
+    again = pool.acquire()
+    assert again.raw is raw
+    assert pool.stats()['hits'] == 1
+    assert pool.stats()['misses'] == 1
+    again.close()
+
+
+def test_pragmas_applied_once(make_pool):
+    """Each pooled connection is set up with WAL and in-memory temp store"""
+    pool = make_pool()
+    conn = pool.acquire()
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA temp_store').fetchone()[0] == 2
+    conn.close()
+
+
+def test_thread_shares_one_connection(make_pool):
+    """connection() returns the same connection until release_thread()"""
+    pool = make_pool()
+    first = pool.connection()
+    first.close()  # no-op while shared
+    assert pool.connection() is first
+    pool.release_thread()
+    assert pool.stats()['idle'] == 1
+
+
+def test_max_size_and_timeout(make_pool):
+    """Waiting on an exhausted pool times out and is counted"""
+    pool = make_pool(max_size=1, timeout=0.05)
+    held = pool.acquire()
+    try:
+        pool.acquire()
+        assert False, 'expected PoolTimeout'
+    except PoolTimeout:
+        pass
+    stats = pool.stats()
+    assert stats['waits'] == 1
+    assert stats['wait_time_total_ms'] > 0
+    held.close()
+
+
+def test_waiter_gets_released_connection(make_pool):
+    """A thread blocked on a full pool gets the next released connection"""
+    pool = make_pool(max_size=1, timeout=2.0)
+    held = pool.acquire()
+    got = []
+
+    worker = threading.Thread(target=lambda: got.append(pool.acquire()))
+    worker.start()
+    held.close()
+    worker.join()
+
+    assert got and got[0].raw is held.raw
+    got[0].close()
+
+
+def test_unhealthy_connection_is_replaced(make_pool):
+    """A connection that fails its health check is discarded"""
+    pool = make_pool(health_check_interval=0)
+    conn = pool.acquire()
+    conn.close()
+    conn.raw.close()
+
+    fresh = pool.acquire()
+    assert fresh.execute('SELECT 1').fetchone()[0] == 1
+    assert pool.stats()['discarded'] == 1
+    fresh.close()
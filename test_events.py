@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the pub/sub broker and the /api/events stream
+"""
+import events
+from events import Broker, JOBS_TOPIC, user_topic
+
+
+def test_publish_reaches_only_topic_subscribers():
+    """Subscribers receive events for their own topics only"""
+    broker = Broker()
+    mine, _, _ = broker.subscribe([user_topic(1)])
+    other, _, _ = broker.subscribe([user_topic(2)])
+    broker.publish(user_topic(1), 'notification', {'id': 7})
+
+    assert mine.queue.get_nowait().data == {'id': 7}
+    assert other.queue.empty()
+
+
+def test_resume_replays_missed_events():
+    """Reconnecting with Last-Event-ID replays the buffered events after it"""
+    broker = Broker()
+    first = broker.publish(JOBS_TOPIC, 'job_created', {'id': 1})
+    broker.publish(user_topic(9), 'notification', {})
+    broker.publish(JOBS_TOPIC, 'job_claimed', {'id': 1})
+
+    _, backlog, complete = broker.subscribe([JOBS_TOPIC], last_event_id=first.id)
+    assert complete
+    assert [event.type for event in backlog] == ['job_claimed']
+
+
+def test_resume_past_the_buffer_asks_for_resync():
+    """A client that missed more than the buffer holds is told to resync"""
+    broker = Broker(history_size=2)
+    for i in range(5):
+        broker.publish(JOBS_TOPIC, 'job_created', {'id': i})
+    assert broker.subscribe([JOBS_TOPIC], last_event_id=1)[2] is False
+    assert broker.subscribe([JOBS_TOPIC], last_event_id=99)[2] is False
+
+
+def test_event_stream_endpoint():
+    """The endpoint speaks text/event-stream and resumes from Last-Event-ID"""
+    import app as app_module
+    events.broker = Broker()
+    seen = events.broker.publish(JOBS_TOPIC, 'job_created', {'id': 1})
+    events.broker.publish(JOBS_TOPIC, 'job_claimed', {'id': 1})
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 2
+        sess['user_role'] = 'provider'
+    response = client.get('/api/events', headers={'Last-Event-ID': str(seen.id)},
+                          buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+    assert next(chunks) == b'id: 2\nevent: job_claimed\ndata: {"id": 1}\n\n'
+    response.close()
+
+
+def test_event_stream_needs_a_login_and_jobs_need_a_provider():
+    """Anonymous streams are refused, and customers never get the jobs topic, whatever they ask for"""
+    import app as app_module
+    events.broker = Broker()
+    events.broker.publish(JOBS_TOPIC, 'job_created', {'id': 1})
+    events.broker.publish(user_topic(1), 'notification', {'id': 7})
+
+    client = app_module.app.test_client()
+    assert client.get('/api/events?jobs=1').status_code == 401
+
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['user_role'] = 'customer'
+    response = client.get('/api/events?jobs=1', headers={'Last-Event-ID': '0'}, buffered=False)
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+    assert next(chunks) == b'id: 2\nevent: notification\ndata: {"id": 7}\n\n'
+    response.close()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk exports
+"""
+import csv
+import gzip
+import io
+import json
+import sqlite3
+
+import pytest
+
+import export
+from export import snapshot
+from manage import init_database
+
+
+def seed(database):
+    """The demo catalogue, customer 1's ten subscriptions and 240 payments over a year"""
+    init_database(database)
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute("INSERT INTO users (id, name, email, password, role) VALUES (1, 'C', 'c@x', 'p', 'customer')")
+    conn.executemany('INSERT INTO subscriptions (id, customer_id, service_id, start_date, status) '
+                     "VALUES (?, 1, ?, '2025-01-01', 'active')", [(i, i % 5 + 1) for i in range(1, 11)])
+    conn.executemany("INSERT INTO payments (subscription_id, amount, payment_date, status) "
+                     "VALUES (?, ?, ?, 'completed')",
+                     [(i % 10 + 1, i, f'2025-{i % 12 + 1:02d}-15 10:00:00') for i in range(240)])
+    conn.execute('UPDATE services SET provider_id = 7 WHERE id IN (1, 2)')
+    return conn
+
+
+def read_csv(chunks):
+    return list(csv.DictReader(io.StringIO(gzip.decompress(b''.join(chunks)).decode())))
+
+
+def test_date_range_and_owner_filters(database):
+    """until is inclusive, and customer/provider filters narrow the rows"""
+    seed(database)
+    conn = export.snapshot(database)
+    rows = read_csv(export.stream(conn, 'payments', since='2025-03-01', until='2025-03-15', batch_size=7))
+    assert len(rows) == 20 and {row['payment_date'][:7] for row in rows} == {'2025-03'}
+    rows = read_csv(export.stream(conn, 'payments', provider_id=7))
+    assert len(rows) == 96 and {row['service_id'] for row in rows} == {'1', '2'}
+    ndjson = b''.join(export.stream(conn, 'subscriptions', 'ndjson', compress=False, customer_id=1))
+    assert [json.loads(line)['id'] for line in ndjson.splitlines()] == list(range(1, 11))
+
+
+def test_export_is_a_snapshot_and_does_not_block_writers(database):
+    """A write committed mid-export succeeds at once and is not in the export"""
+    writer = seed(database)
+    conn = export.snapshot(database)
+    chunks = export.encode_csv(conn.execute(export.build('payments')[0]), batch_size=10)
+    first = next(chunks)
+    writer.execute('PRAGMA busy_timeout = 0')
+    writer.execute("INSERT INTO payments (subscription_id, amount, status) VALUES (1, 999, 'completed')")
+    rows = list(csv.DictReader(io.StringIO(first + ''.join(chunks))))
+    assert len(rows) == 240
+
+
+def test_endpoint_only_exports_the_callers_rows(database):
+    """Customers are pinned to their own rows whatever filters they pass"""
+    import app as app_module
+    seed(database)
+    client = app_module.app.test_client()
+    assert client.get('/api/exports/payments').status_code == 401
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['user_role'] = 'customer'
+    response = client.get('/api/exports/payments?customer_id=2&until=2025-01-31')
+    assert response.status_code == 200 and response.mimetype == 'application/gzip'
+    assert 'payments-2025-01-31.csv.gz' in response.headers['Content-Disposition']
+    rows = read_csv([response.get_data()])
+    assert len(rows) == 20 and {row['customer_id'] for row in rows} == {'1'}
+    assert client.get('/api/exports/users').status_code == 400
+    assert client.get('/api/exports/payments?since=yesterday').status_code == 400
+
+
+def test_endpoint_closes_its_snapshot(database, monkeypatch):
+    """The snapshot's read transaction ends with the response, even for HEAD"""
+    import app as app_module
+    seed(database)
+    opened = []
+    monkeypatch.setattr(export, 'snapshot', lambda database: opened.append(snapshot(database)) or opened[-1])
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['user_role'] = 'customer'
+
+    for method in (client.get, client.head):
+        response = method('/api/exports/payments')
+        assert opened[-1].in_transaction
+        response.close()
+        with pytest.raises(sqlite3.ProgrammingError):
+            opened[-1].execute('SELECT 1')
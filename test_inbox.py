@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for the notification counters, bulk mark-read and pruning
+"""
+import sqlite3
+
+import inbox
+
+
+def add(conn, user_id, count, created_at='2030-01-01 12:00:00', is_read=0):
+    conn.executemany('''INSERT INTO notifications (user_id, title, message, type, is_read, created_at)
+                        VALUES (?, 'Hello', 'Message', 'test', ?, ?)''', [(user_id, is_read, created_at)] * count)
+
+
+def test_counters_follow_every_write(database):
+    """Inserts, reads, reassignment and deletes keep notification_counts exact"""
+    conn = sqlite3.connect(database, isolation_level=None)
+    add(conn, 1, 5)
+    add(conn, 2, 3, is_read=1)
+    conn.execute('UPDATE notifications SET is_read = 1 WHERE id IN (1, 2)')
+    conn.execute('UPDATE notifications SET user_id = 2 WHERE id = 3')
+    conn.execute('DELETE FROM notifications WHERE id = 4')
+    assert inbox.counts(conn, 1) == (1, 3)
+    assert inbox.counts(conn, 2) == (1, 4)
+    assert inbox.counts(conn, 99) == (0, 0)
+    assert inbox.verify(conn) == []
+
+    conn.execute('UPDATE notification_counts SET unread = 7 WHERE user_id = 1')
+    assert inbox.verify(conn) == [(1, (7, 3), (1, 3))]
+    inbox.rebuild(conn)
+    assert inbox.verify(conn) == []
+
+
+def test_bulk_mark_read_unread_count_and_since_fetch(database):
+    """PUT /api/notifications/read by ids or timestamp; the badge and incremental feed agree"""
+    import app as app_module
+    conn = sqlite3.connect(database, isolation_level=None)
+    add(conn, 1, 3, created_at='2030-01-01 09:00:00')
+    add(conn, 1, 3, created_at='2030-01-02 09:00:00')
+    add(conn, 2, 2)
+    client = app_module.app.test_client()
+
+    assert client.get('/api/notifications/unread-count').get_json() == {'unread': 6, 'total': 6}
+    response = client.put('/api/notifications/read', json={'ids': [1, 2, 7]})
+    assert response.get_json() == {'updated': 2, 'unread': 4}
+    response = client.put('/api/notifications/read', json={'before': '2030-01-01T10:00:00+01:00'})
+    assert response.get_json() == {'updated': 1, 'unread': 3}
+    assert client.put('/api/notifications/read', json={'before': 'yesterday'}).status_code == 400
+    assert client.put('/api/notifications/read', json={'ids': 'all'}).status_code == 400
+    assert client.put('/api/notifications/read', json={}).status_code == 400
+
+    page = client.get('/api/notifications?since_id=2&limit=2').get_json()
+    assert len(client.get('/api/notifications?since_id=0&limit=-5').get_json()) == 1
+    assert [(n['id'], n['is_read']) for n in page] == [(3, 1), (4, 0)]
+    assert client.get('/api/notifications?since_id=6').get_json() == []
+    assert client.get('/api/notifications/unread-count').get_json() == {'unread': 3, 'total': 6}
+
+
+def test_prune_drops_old_and_overflowing_read_rows(database):
+    """Old read rows go, then each user keeps only the newest read rows; unread mail stays"""
+    conn = sqlite3.connect(database, isolation_level=None)
+    add(conn, 1, 4, created_at='2030-01-01 00:00:00', is_read=1)
+    add(conn, 1, 2, created_at='2030-01-01 00:00:00')
+    add(conn, 2, 7, created_at='2030-06-01 00:00:00', is_read=1)
+    add(conn, 3, 2, created_at='2030-06-01 00:00:00', is_read=1)
+
+    deleted = inbox.prune_read(conn, '2030-06-10', batch_size=2, retention_days=30, keep=3)
+    assert deleted == 4 + 4
+    assert conn.execute('SELECT user_id, id, is_read FROM notifications ORDER BY id').fetchall() == \
+        [(1, 5, 0), (1, 6, 0), (2, 11, 1), (2, 12, 1), (2, 13, 1), (3, 14, 1), (3, 15, 1)]
+    assert inbox.verify(conn) == []
+    assert inbox.prune_read(conn, '2030-06-10', batch_size=2, retention_days=30, keep=3) == 0
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for the management entry point and batched seeding
+"""
+import os
+import sqlite3
+
+import pytest
+
+from manage import init_database, main
+from migrations import LATEST_VERSION, SchemaOutOfDate, require_latest
+from seed import CATALOGUE_SIZE, seed
+
+
+def test_init_is_idempotent_and_passes_the_boot_check(tmp_path):
+    """init creates, migrates and seeds once; running it again changes nothing"""
+    path = str(tmp_path / 'manage.db')
+    with pytest.raises(SchemaOutOfDate):
+        require_latest(path)
+    assert not os.path.exists(path)
+
+    init_database(path)
+    assert init_database(path) == []
+    assert require_latest(path) == LATEST_VERSION
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT COUNT(*) FROM services').fetchone()[0] == CATALOGUE_SIZE
+
+
+def test_seed_streams_in_batches(tmp_path):
+    """Any row count is written in batch_size transactions and appended after existing ids"""
+    path = str(tmp_path / 'seed.db')
+    init_database(path, catalogue=False)
+    conn = sqlite3.connect(path, isolation_level=None)
+
+    written = seed(conn, services_count=1234, users_count=250, subscriptions_count=300, batch_size=100)
+    assert written == {'services': 1234, 'users': 250, 'subscriptions': 300}
+    seed(conn, services_count=10, batch_size=3)
+    assert conn.execute('SELECT COUNT(*), MAX(id) FROM services').fetchone() == (1244, 1244)
+    assert conn.execute("SELECT COUNT(*) FROM users WHERE role = 'provider'").fetchone()[0] == 25
+
+
+def test_check_command_reports_stale_schema(tmp_path):
+    """'manage.py check' exits non-zero until the database is migrated"""
+    path = str(tmp_path / 'check.db')
+    sqlite3.connect(path).execute('CREATE TABLE t (x)')
+    assert main(['--database', path, 'check']) == 1
+    assert main(['--database', path, 'init']) == 0
+    assert main(['--database', path, 'check']) == 0
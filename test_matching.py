@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the provider matching index
+"""
+import json
+import sqlite3
+
+from matching import FEED_SQL, MatchingIndex, prune_request_changes
+
+
+def seed(database):
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.executemany('INSERT INTO users (id, name, email, password, role, city, pincode) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     [(1, 'Near', 'near@x', 'p', 'customer', 'Pune', '411001'),
+                      (2, 'Far', 'far@x', 'p', 'customer', 'Delhi', '110001'),
+                      (3, 'Provider', 'provider@x', 'p', 'provider', 'Pune', '411038')])
+    conn.execute("INSERT INTO services (name, category, provider_id) VALUES ('Clean', 'Cleaning', 3)")
+    return conn
+
+
+def add_request(conn, customer_id, day, category='Cleaning', location='Home'):
+    return conn.execute('''INSERT INTO service_requests (customer_id, service_category, location,
+                                                         scheduled_date, status)
+                           VALUES (?, ?, ?, ?, 'scheduled')''',
+                        (customer_id, category, location, day)).lastrowid
+
+
+def test_feed_ranks_by_proximity_then_date(database):
+    """Requests in the provider's PIN area come first, each group by date"""
+    conn = seed(database)
+    far_early = add_request(conn, 2, '2030-01-01')
+    near_late = add_request(conn, 1, '2030-01-09')
+    near_early = add_request(conn, 1, '2030-01-02')
+    pinned = add_request(conn, 2, '2030-01-05', location='Flat 4, Kothrud, Pune 411038')
+    add_request(conn, 1, '2030-01-01', category='Plumbing')
+
+    index = MatchingIndex()
+    index.sync(conn.cursor())
+    assert index.feed(['Cleaning'], '411038') == [(pinned, 6), (near_early, 4), (near_late, 4), (far_early, 0)]
+    assert [request_id for request_id, _ in index.feed(['Cleaning'], '411038', nearby=True)] == \
+        [pinned, near_early, near_late]
+    assert index.feed(['Cleaning'], None, limit=1) == [(far_early, 0)]
+
+
+def test_sync_follows_writes_and_rebuilds_after_pruning(database):
+    """Creates, claims and completions reach the index through the change log"""
+    conn = seed(database)
+    index = MatchingIndex()
+    c = conn.cursor()
+    first = add_request(conn, 1, '2030-01-01')
+    index.sync(c)
+    assert [r for r, _ in index.feed(['Cleaning'])] == [first]
+
+    second = add_request(conn, 1, '2030-01-02')
+    conn.execute("UPDATE service_requests SET status = 'accepted', service_provider_id = 3 WHERE id = ?", (first,))
+    conn.execute("UPDATE service_requests SET provider_notes = 'n' WHERE id = ?", (second,))
+    assert index.sync(c) == 2
+    assert [r for r, _ in index.feed(['Cleaning'])] == [second]
+
+    other = MatchingIndex()
+    other.sync(c)
+    for day in range(1, 6):
+        add_request(conn, 2, f'2030-02-0{day}')
+    index.sync(c)
+    prune_request_changes(conn, '2030-01-01', batch_size=2, keep=2)
+    conn.execute('DELETE FROM service_requests WHERE id = ?', (second,))
+    rebuilds = other.rebuilds
+    other.sync(c)
+    assert other.rebuilds == rebuilds + 1
+    index.sync(c)
+    assert sorted(index.feed(['Cleaning'])) == sorted(other.feed(['Cleaning'])) and len(index) == 5
+
+
+
+def test_feed_rows_skip_requests_claimed_since_the_index_saw_them(database):
+    """A stale index entry for a request another process claimed is dropped by FEED_SQL"""
+    conn = seed(database)
+    claimed = add_request(conn, 1, '2030-01-01')
+    still_open = add_request(conn, 2, '2030-01-02')
+    index = MatchingIndex()
+    index.sync(conn.cursor())
+    conn.execute("UPDATE service_requests SET status = 'accepted', service_provider_id = 3 WHERE id = ?", (claimed,))
+
+    ranked = index.feed(['Cleaning'], '411038')
+    assert [request_id for request_id, _ in ranked] == [claimed, still_open]
+    rows = conn.execute(FEED_SQL, (json.dumps(ranked),)).fetchall()
+    assert [(row[0], row[-1]) for row in rows] == [(still_open, 0)]
+
+def test_endpoint_serves_the_index_feed(database):
+    """The scheduled feed matches what the old category scan returned, plus a proximity"""
+    import app as app_module
+    conn = seed(database)
+    ids = [add_request(conn, 1 + day % 2, f'2030-03-{day:02d}') for day in range(1, 21)]
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 3
+        sess['user_role'] = 'provider'
+
+    feed = client.get('/api/provider/customer-requests').get_json()
+    assert sorted(row['id'] for row in feed) == ids
+    assert [row['proximity'] for row in feed] == [4] * 10 + [0] * 10
+    assert feed[0]['customer_name'] == 'Near'
+
+    created = client.post('/api/customer/service-requests', json={
+        'service_category': 'Cleaning', 'location': 'Pune 411038', 'scheduled_date': '2030-04-01',
+        'scheduled_time': '10:00'}).get_json()['request_id']
+    assert client.get('/api/provider/customer-requests?limit=1').get_json()[0]['id'] == created
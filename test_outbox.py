@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the notification outbox and its dispatcher
+"""
+import sqlite3
+import time
+
+import outbox
+from events import Broker, user_topic
+
+
+class Flaky(outbox.Channel):
+    """Fails every payload whose user_id is in bad"""
+
+    name = 'flaky'
+
+    def __init__(self, bad):
+        self.bad = bad
+        self.sent = []
+        self.batches = 0
+
+    def deliver(self, c, payloads):
+        self.batches += 1
+        if any(payload['user_id'] in self.bad for payload in payloads):
+            raise ConnectionError('refused')
+        self.sent.extend(payload['user_id'] for payload in payloads)
+
+
+def test_burst_becomes_one_batch_per_channel(database):
+    """Notifications are written together, then fanned out to every channel"""
+    conn = sqlite3.connect(database, isolation_level=None)
+    broker = Broker()
+    subscription, _, _ = broker.subscribe([user_topic(3)])
+    conn.execute('BEGIN')
+    for user_id in range(1, 51):
+        outbox.notify(conn.cursor(), user_id, 'Accepted', 'Your request was accepted', 'service_accepted',
+                      {'request_id': user_id * 10})
+    conn.execute('COMMIT')
+    assert conn.execute('SELECT COUNT(*) FROM notifications').fetchone()[0] == 0
+
+    flaky = Flaky(bad=set())
+    dispatcher = outbox.Dispatcher(database, [outbox.EventChannel(broker), flaky])
+    assert dispatcher.drain() == 150
+    assert conn.execute('SELECT COUNT(*) FROM notifications').fetchone()[0] == 50
+    assert conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0] == 0
+    assert flaky.batches == 1 and sorted(flaky.sent) == list(range(1, 51))
+    event = subscription.queue.get_nowait()
+    assert (event.type, event.data) == ('notification', {'request_id': 30, 'type': 'service_accepted'})
+    assert dispatcher.stats()['delivered'] == {'notification': 50, 'events': 50, 'flaky': 50}
+
+
+def test_failures_retry_with_backoff_then_dead_letter(database):
+    """A failing payload is isolated from its batch, retried and finally parked"""
+    conn = sqlite3.connect(database, isolation_level=None)
+    for user_id in (1, 2, 3):
+        outbox.enqueue(conn, 'flaky', {'user_id': user_id})
+    outbox.enqueue(conn, 'nowhere', {'user_id': 4})
+    flaky = Flaky(bad={2})
+    dispatcher = outbox.Dispatcher(database, [flaky], max_attempts=2)
+
+    dispatcher.drain()
+    assert sorted(flaky.sent) == [1, 3]
+    attempts, available_at, error = conn.execute(
+        "SELECT attempts, available_at, last_error FROM outbox WHERE channel = 'flaky'").fetchone()
+    assert attempts == 1 and available_at > 0 and error == 'ConnectionError: refused'
+    assert conn.execute('SELECT channel FROM outbox_dead').fetchall() == []
+
+    conn.execute('UPDATE outbox SET available_at = 0')
+    dispatcher.drain()
+    assert conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0] == 0
+    assert sorted(conn.execute('SELECT channel, attempts FROM outbox_dead').fetchall()) == \
+        [('flaky', 2), ('nowhere', 2)]
+
+    flaky.bad.clear()
+    assert outbox.requeue(conn, [conn.execute("SELECT id FROM outbox_dead WHERE channel = 'flaky'").fetchone()[0]]) == 1
+    dispatcher.drain()
+    assert sorted(flaky.sent) == [1, 2, 3]
+    assert dispatcher.stats()['dead'] == 1
+
+
+def test_bad_notification_is_retried_alone_and_the_thread_keeps_going(database):
+    """A notification row that cannot be written backs off like any delivery; errors never end the thread"""
+    conn = sqlite3.connect(database, isolation_level=None)
+    for user_id in (1, 2):
+        outbox.notify(conn, user_id, 'Accepted', 'Your request was accepted', 'service_accepted')
+    outbox.enqueue(conn, outbox.NOTIFICATION, {'user_id': 3})
+    dispatcher = outbox.Dispatcher(database, [], max_attempts=2)
+
+    dispatcher.drain()
+    assert conn.execute('SELECT user_id FROM notifications ORDER BY user_id').fetchall() == [(1,), (2,)]
+    assert conn.execute('SELECT attempts, last_error FROM outbox').fetchall() == [(1, "KeyError: 'title'")]
+    conn.execute('UPDATE outbox SET available_at = 0')
+    dispatcher.drain()
+    assert conn.execute('SELECT channel, attempts FROM outbox_dead').fetchall() == [(outbox.NOTIFICATION, 2)]
+
+    calls = []
+
+    def dispatch_once(conn=None):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError('boom')
+        return 0
+    dispatcher.dispatch_once = dispatch_once
+    dispatcher.poll_seconds = 0.01
+    dispatcher.start()
+    try:
+        deadline = time.monotonic() + 5
+        while len(calls) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        dispatcher.stop(5)
+    assert len(calls) >= 3
+
+
+def test_accept_job_leaves_the_notification_to_the_dispatcher(database):
+    """The claim commits an outbox row; the dispatcher thread writes the notification"""
+    import app as app_module
+    conn = sqlite3.connect(database, isolation_level=None)
+    job_id = conn.execute('''INSERT INTO service_requests (customer_id, service_category, scheduled_date, status)
+                             VALUES (1, 'Cleaning', '2030-01-01', 'scheduled')''').lastrowid
+    client = app_module.app.test_client()
+    assert client.post(f'/api/accept-job/{job_id}').status_code == 200
+
+    dispatcher = app_module.get_outbox()
+    dispatcher.stop(timeout=5)
+    dispatcher.drain()
+    assert conn.execute("SELECT user_id, type FROM notifications").fetchall() == [(1, 'service_accepted')]
+    assert conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0] == 0
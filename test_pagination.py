@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for keyset pagination
+"""
+import base64
+import json
+import sqlite3
+
+import pagination
+from pagination import InvalidCursor, Keyset, paginate
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE services (id INTEGER PRIMARY KEY, rating REAL, total_bookings INTEGER)')
+    conn.executemany('INSERT INTO services (rating, total_bookings) VALUES (?, ?)',
+                     [(i % 3, i % 5) for i in range(40)])
+    return conn
+
+
+def walk(c, keyset, limit):
+    rows, cursor = [], None
+    while True:
+        args = {'limit': str(limit)}
+        if cursor:
+            args['cursor'] = cursor
+        page = paginate(c, 'SELECT * FROM services WHERE 1 = 1', [], keyset, args)
+        rows.extend(row['id'] for row in page.rows)
+        cursor = page.next_cursor
+        if not cursor:
+            return rows
+
+
+def test_pages_follow_mixed_order_without_gaps():
+    """Walking every page returns exactly the rows of the full ORDER BY"""
+    c = make_db().cursor()
+    keyset = Keyset('rating DESC', 'total_bookings DESC', 'id')
+    expected = [row['id'] for row in c.execute(
+        'SELECT id FROM services ORDER BY rating DESC, total_bookings DESC, id')]
+    assert walk(c, keyset, 7) == expected
+
+
+def test_uniform_order_uses_row_values():
+    """A single-direction keyset pages with a row-value comparison"""
+    c = make_db().cursor()
+    keyset = Keyset('rating', 'id')
+    assert keyset.after([1, 5])[0] == '(rating, id) > (?, ?)'
+    assert walk(c, keyset, 9) == [row['id'] for row in c.execute(
+        'SELECT id FROM services ORDER BY rating, id')]
+
+
+def test_null_keys_are_neither_lost_nor_repeated():
+    """NULLs sort first, so they open ascending listings and close descending ones"""
+    c = make_db().cursor()
+    c.executemany('INSERT INTO services (rating, total_bookings) VALUES (?, ?)',
+                  [(None, i % 2 or None) for i in range(6)] + [(1, None), (2, None)])
+    for columns in (('rating', 'id'), ('rating DESC', 'id DESC'), ('rating DESC', 'total_bookings DESC', 'id'),
+                    ('rating', 'total_bookings DESC', 'id DESC')):
+        expected = [row['id'] for row in c.execute(f"SELECT id FROM services ORDER BY {', '.join(columns)}")]
+        for limit in (1, 3, 7):
+            assert walk(c, Keyset(*columns), limit) == expected, (columns, limit)
+
+
+def test_page_size_cap_and_total():
+    """limit is capped and count=1 reports the total"""
+    c = make_db().cursor()
+    original = pagination.MAX_PAGE_SIZE
+    pagination.MAX_PAGE_SIZE = 10
+    try:
+        page = paginate(c, 'SELECT * FROM services WHERE 1 = 1', [], Keyset('id'),
+                        {'limit': '1000', 'count': '1'})
+    finally:
+        pagination.MAX_PAGE_SIZE = original
+    assert len(page.rows) == 10
+    assert page.total == 40
+    assert page.next_cursor
+
+
+def test_cursor_is_bound_to_its_listing():
+    """A token is rejected by another ordering, query or filter, and junk is a 400 not a 500"""
+    c = make_db().cursor()
+    query = 'SELECT * FROM services WHERE rating = ?'
+    page = paginate(c, query, [1], Keyset('id'), {'limit': '5'})
+    assert paginate(c, query, [1], Keyset('id'), {'cursor': page.next_cursor}).rows
+    junk = [base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+            for payload in (5, ['x', 5], {'a': 1}, ['x', [{}]])]
+    for keyset, other_query, params, token in [(Keyset('rating', 'id'), query, [1], page.next_cursor),
+                                               (Keyset('id'), 'SELECT * FROM services WHERE 1 = 1', [], page.next_cursor),
+                                               (Keyset('id'), query, [2], page.next_cursor),
+                                               (Keyset('id'), query, [1], 'not-a-cursor'),
+                                               *[(Keyset('id'), query, [1], token) for token in junk]]:
+        try:
+            paginate(c, other_query, params, keyset, {'cursor': token})
+            assert False, 'expected InvalidCursor'
+        except InvalidCursor:
+            pass
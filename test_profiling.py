@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for request profiling and the /metrics endpoint
+"""
+import logging
+import os
+
+import profiling
+from manage import init_database
+
+
+def make_client(database, **config):
+    import app as app_module
+    init_database(database)
+    app_module.app.config.update(config)
+    return app_module.app.test_client()
+
+
+def test_phases_are_timed_and_exported(database):
+    """SQL and serialization time show up in Server-Timing and in /metrics"""
+    client = make_client(database, PROFILING=True, PROFILE_SLOW_QUERY_MS=100, PROFILE_SAMPLE_EVERY=0)
+    response = client.get('/api/services?category=Home%20Cleaning')
+    assert response.status_code == 200
+    timing = dict(part.split(';', 1) for part in response.headers['Server-Timing'].split(', '))
+    assert set(timing) == {'db', 'serialize', 'template', 'total'}
+    assert 'queries' in timing['db'] and not timing['db'].endswith('"0 queries"')
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'http_requests_total{method="GET",endpoint="/api/services",status="200"}' in body
+    assert 'http_request_phase_seconds_total{endpoint="/api/services",phase="sql"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",endpoint="/api/services",le="+Inf"}' in body
+    assert 'db_pool_size' in body
+
+
+def test_metrics_do_not_start_a_writer(database):
+    """Scraping reports zeros for a write batcher that has not started, and starts none"""
+    client = make_client(database)
+    batcher = client.application.extensions.pop('write_batcher', None)
+    if batcher is not None:
+        batcher.stop()
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'writer_intents 0' in body.splitlines()
+    assert 'write_batcher' not in client.application.extensions
+
+
+def test_slow_queries_are_logged_with_their_plan(database, caplog):
+    """A zero threshold logs every statement together with EXPLAIN QUERY PLAN"""
+    client = make_client(database, PROFILING=True, PROFILE_SLOW_QUERY_MS=0, PROFILE_SAMPLE_EVERY=0)
+    before = profiling.metrics.slow_queries
+    with caplog.at_level(logging.WARNING, logger='profiling'):
+        client.get('/api/services/1')
+    client.application.config['PROFILE_SLOW_QUERY_MS'] = 100
+    assert profiling.metrics.slow_queries > before
+    plans = [record.getMessage() for record in caplog.records if 'FROM services' in record.getMessage()]
+    assert plans and 'SEARCH' in plans[0]
+
+
+def test_sampling_dumps_cprofile_stats(database, tmp_path):
+    """With PROFILE_SAMPLE_EVERY = 2, every second request is profiled"""
+    directory = str(tmp_path / 'profiles')
+    client = make_client(database, PROFILING=True, PROFILE_SAMPLE_EVERY=2, PROFILE_DIR=directory)
+    for _ in range(4):
+        client.get('/api/categories')
+    client.application.config['PROFILE_SAMPLE_EVERY'] = 0
+    assert len([name for name in os.listdir(directory) if name.endswith('.prof')]) == 2
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Check that every SQL query in app.py is served by an index.
+
+The queries are pulled out of app.py's source, run through EXPLAIN QUERY PLAN
+against a freshly migrated database filled with enough rows for the planner
+to prefer indexes, and any plan step that still does a full-table SCAN fails.
+"""
+import ast
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+
+APP_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+SQL_START = re.compile(r'^\s*(SELECT|UPDATE|DELETE)\b', re.IGNORECASE)
+# "SCAN t" reads the whole table; "SCAN t USING [COVERING] INDEX" walks an
+# index in order and stops at the LIMIT/page size, which is acceptable, and
+# an FTS5 "VIRTUAL TABLE INDEX" scan is a lookup in the full-text index
+FULL_SCAN = re.compile(r'^SCAN (\S+)(?! USING| VIRTUAL TABLE)( |$)')
+
+# Queries that read every row on purpose
+ALLOWED_SCANS = {
+    "SELECT name FROM sqlite_master WHERE type='table'",
+    # One row per AUTOINCREMENT table
+    "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'subscriptions'), 0)",
+}
+
+# Calls taking (c, query, params, KEYSET, ...) that run query in keyset order
+KEYSET_FUNCTIONS = ('paginate', 'listing_response', 'history_response')
+# Archive methods doing the same, with the index of their query argument
+ARCHIVE_METHODS = {'page': 1, 'rows': 0}
+
+
+def _const(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        # History queries name their tables as {payments} (see archive.py)
+        return re.sub(r'\{(payments|service_requests)\}', r'\1', node.value)
+    # 'SELECT ... IN ({})'.format(placeholders)
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+            and node.func.attr == 'format' and isinstance(node.func.value, ast.Constant)):
+        return node.func.value.value.replace('{}', '?, ?')
+    return None
+
+
+def _keyset_args(node):
+    """(query, KEYSET) argument nodes of a paginate()-like call, else None"""
+    func = node.func
+    if isinstance(func, ast.Name) and func.id in KEYSET_FUNCTIONS:
+        offset = 1  # (c, query, params, KEYSET, ...)
+    elif isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 'archive' \
+            and func.attr in ARCHIVE_METHODS:
+        offset = ARCHIVE_METHODS[func.attr]
+    else:
+        return None
+    if len(node.args) < offset + 3 or not isinstance(node.args[offset + 2], ast.Name):
+        return None
+    return node.args[offset], node.args[offset + 2]
+
+
+def extract_queries(path=APP_SOURCE):
+    """
+    Collect literal SQL from app.py, including queries built up with +=.
+
+    Queries handed to paginate() or one of the helpers built on it are
+    expanded with their Keyset into both the first-page and the continuation
+    form.
+    """
+    import app as app_module
+    tree = ast.parse(open(path).read())
+    queries = []
+
+    for func in ast.walk(tree):
+        if not isinstance(func, ast.FunctionDef):
+            continue
+        built = {}
+        # ast.walk() is breadth-first; += fragments must be applied in source order
+        nodes = sorted((n for n in ast.walk(func) if hasattr(n, 'lineno')),
+                       key=lambda n: (n.lineno, n.col_offset))
+        for node in nodes:
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 \
+                    and isinstance(node.targets[0], ast.Name):
+                sql = _const(node.value)
+                if sql and SQL_START.match(sql):
+                    built[node.targets[0].id] = sql
+                elif node.targets[0].id in built and isinstance(node.value, ast.Call):
+                    # query = query.format(placeholders)
+                    built[node.targets[0].id] = built[node.targets[0].id].replace('{}', '?, ?')
+            elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name) \
+                    and node.target.id in built:
+                fragment = _const(node.value)
+                if fragment:
+                    built[node.target.id] += fragment
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+                    and node.func.attr in ('execute', 'executemany') and node.args:
+                sql = _const(node.args[0])
+                if sql and SQL_START.match(sql):
+                    queries.append((func.name, sql))
+            elif isinstance(node, ast.Call) and _keyset_args(node):
+                # paginate(c, query, params, KEYSET, request.args) and its wrappers
+                arg, keyset_arg = _keyset_args(node)
+                sql = built.pop(arg.id, None) if isinstance(arg, ast.Name) else _const(arg)
+                keyset = getattr(app_module, keyset_arg.id, None)
+                if sql and keyset is not None:
+                    queries.append((func.name, keyset.sql(sql)))
+                    queries.append((func.name, keyset.sql(sql, after=True)))
+
+        # The fully-built variant with every optional filter appended
+        for sql in built.values():
+            queries.append((func.name, sql.replace('{}', '?, ?')))
+
+    return queries
+
+
+def build_database(path, scale=20000):
+    """Create the schema through init_db() and fill it with synthetic rows"""
+    import app as app_module
+    app_module.DATABASE = path
+    app_module.init_db()
+
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    categories = [row[0] for row in conn.execute('SELECT DISTINCT category FROM services')]
+    statuses = ['scheduled', 'accepted', 'in_progress', 'completed', 'cancelled']
+    users = scale // 10
+    services = scale // 4
+
+    conn.executemany(
+        'INSERT INTO users (name, email, password, role, city, pincode) VALUES (?, ?, ?, ?, ?, ?)',
+        [(f'User {i}', f'user{i}@example.com', 'x', 'provider' if i % 10 == 0 else 'customer',
+          'City', str(500000 + i % 100)) for i in range(users)])
+    conn.executemany(
+        '''INSERT INTO services (name, description, category, price, provider_id, is_active,
+           rating, total_bookings) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+        [(f'Service {i}', 'Synthetic service', rng.choice(categories), 250.0,
+          rng.randint(1, users), 1, rng.randint(30, 50) / 10, rng.randint(0, 1000))
+         for i in range(services)])
+    conn.executemany(
+        '''INSERT INTO subscriptions (customer_id, service_id, start_date, end_date,
+           next_service_date, frequency, status) VALUES (?, ?, ?, ?, ?, ?, ?)''',
+        [(rng.randint(1, users), rng.randint(1, services), '2025-01-01', '2025-03-01',
+          '2025-01-01', 'weekly', rng.choice(['active', 'pending', 'cancelled']))
+         for _ in range(scale // 4)])
+    conn.executemany(
+        '''INSERT OR IGNORE INTO service_requests (subscription_id, customer_id, service_provider_id,
+           service_category, scheduled_date, status) VALUES (?, ?, ?, ?, ?, ?)''',
+        [(rng.randint(1, scale // 4), rng.randint(1, users), rng.randint(1, users),
+          rng.choice(categories), f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+          rng.choice(statuses)) for _ in range(scale)])
+    conn.executemany(
+        'INSERT INTO payments (subscription_id, amount, razorpay_order_id, status) VALUES (?, ?, ?, ?)',
+        [(rng.randint(1, scale // 4), 100.0, f'order_{i}', rng.choice(['completed', 'pending']))
+         for i in range(scale // 4)])
+    conn.executemany(
+        'INSERT INTO notifications (user_id, title, message, type) VALUES (?, ?, ?, ?)',
+        [(rng.randint(1, users), 'Title', 'Message', 'info') for _ in range(scale // 2)])
+    conn.executemany(
+        'INSERT INTO reviews (service_id, customer_id, rating) VALUES (?, ?, ?)',
+        [(rng.randint(1, services), rng.randint(1, users), rng.randint(1, 5))
+         for _ in range(scale // 4)])
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+def explain(conn, sql):
+    params = [None] * sql.count('?')
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def find_full_scans(conn, queries):
+    failures = []
+    for func_name, sql in queries:
+        normalized = ' '.join(sql.split())
+        if normalized in ALLOWED_SCANS:
+            continue
+        try:
+            plan = explain(conn, sql)
+        except sqlite3.Error as e:
+            failures.append((func_name, normalized, [f'ERROR: {e}']))
+            continue
+        scans = [step for step in plan if FULL_SCAN.match(step)]
+        if scans:
+            failures.append((func_name, normalized, plan))
+    return failures
+
+
+def test_no_query_falls_back_to_full_scan(database):
+    """Every query in app.py uses an index once the tables are large"""
+    build_database(database)
+    conn = sqlite3.connect(database)
+    queries = extract_queries()
+    assert len(queries) > 20
+
+    failures = find_full_scans(conn, queries)
+    conn.close()
+
+    assert not failures, '\n\n'.join(
+        f'{name}: {sql}\n  ' + '\n  '.join(plan) for name, sql, plan in failures)
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), 'plans.db')
+    print(f'Building test database at {path}...')
+    build_database(path)
+    conn = sqlite3.connect(path)
+
+    failures = find_full_scans(conn, extract_queries())
+    for name, sql, plan in failures:
+        print(f'✗ {name}: {sql}')
+        for step in plan:
+            print(f'    {step}')
+    conn.close()
+
+    if failures:
+        print(f'\n❌ {len(failures)} queries fall back to a full table scan')
+        sys.exit(1)
+    print('✅ Every query is served by an index')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for subscription schedule materialisation
+"""
+import sqlite3
+
+from recurrence import materialize, roll_forward
+from manage import init_database
+
+
+def make_db(database):
+    init_database(database)
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def add_subscription(conn, start, end, frequency, status='active'):
+    c = conn.cursor()
+    c.execute('''INSERT INTO subscriptions (customer_id, service_id, start_date, end_date,
+                 frequency, preferred_time, status) VALUES (1, 1, ?, ?, ?, 'morning', ?)''',
+              (start, end, frequency, status))
+    return c.lastrowid
+
+
+def schedule(conn, subscription_id):
+    return [row[0] for row in conn.execute(
+        'SELECT scheduled_date FROM service_requests WHERE subscription_id = ? ORDER BY 1',
+        (subscription_id,))]
+
+
+def test_only_the_horizon_is_materialised(database):
+    """Checkout inserts the next two weeks, not the whole subscription"""
+    conn = make_db(database)
+    sub = add_subscription(conn, '2025-03-01', '2025-05-30', 'weekly')
+    added = materialize(conn.cursor(), sub, today='2025-03-01', horizon_days=14)
+    assert added == 3
+    assert schedule(conn, sub) == ['2025-03-01', '2025-03-08', '2025-03-15']
+
+
+def test_materialise_is_idempotent(database):
+    """Running checkout and payment verification twice adds nothing"""
+    conn = make_db(database)
+    sub = add_subscription(conn, '2025-03-01', '2025-03-31', 'daily')
+    materialize(conn.cursor(), sub, today='2025-03-01')
+    assert materialize(conn.cursor(), sub, today='2025-03-01') == 0
+    assert len(schedule(conn, sub)) == 15
+
+
+def test_roll_forward_extends_active_subscriptions(database):
+    """The periodic job adds the next window and respects end_date and status"""
+    conn = make_db(database)
+    active = add_subscription(conn, '2025-03-01', '2025-03-20', 'weekly')
+    cancelled = add_subscription(conn, '2025-03-01', '2025-03-20', 'weekly', status='cancelled')
+    materialize(conn.cursor(), active, today='2025-03-01', horizon_days=7)
+
+    roll_forward(conn, today='2025-03-10', horizon_days=14)
+    assert schedule(conn, active) == ['2025-03-01', '2025-03-08', '2025-03-15']
+    assert schedule(conn, cancelled) == []
+    assert roll_forward(conn, today='2025-03-10', horizon_days=14) == 0
+
+
+def test_future_start_materialises_its_first_occurrences(database):
+    """A subscription starting next month still gets its first schedules"""
+    conn = make_db(database)
+    sub = add_subscription(conn, '2025-06-01', '2025-08-30', 'monthly')
+    materialize(conn.cursor(), sub, today='2025-03-01', horizon_days=14)
+    assert schedule(conn, sub) == ['2025-06-01']
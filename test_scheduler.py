@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the lifecycle sweeps and the leased job scheduler
+"""
+import sqlite3
+
+import lifecycle
+import scheduler
+
+
+def seed(database):
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.execute("INSERT INTO users (id, name, email, password, role) VALUES (1, 'C', 'c@x', 'p', 'customer')")
+    conn.execute("INSERT INTO services (id, name, category) VALUES (1, 'Clean', 'Cleaning')")
+    return conn
+
+
+def add_subscription(conn, start, end, auto_renew, next_date=None):
+    return conn.execute('''INSERT INTO subscriptions (customer_id, service_id, start_date, end_date,
+                                                      next_service_date, frequency, status, auto_renew)
+                           VALUES (1, 1, ?, ?, ?, 'weekly', 'active', ?)''',
+                        (start, end, next_date, auto_renew)).lastrowid
+
+
+def row(conn, sql, *params):
+    return conn.execute(sql, params).fetchone()
+
+
+def test_sweeps_expire_renew_and_mark_missed(database):
+    """Each sweep moves only the rows that are due, in batches"""
+    conn = seed(database)
+    expiring = [add_subscription(conn, '2025-01-01', '2025-01-31', 0) for _ in range(5)]
+    renewing = add_subscription(conn, '2025-01-01', '2025-01-15', 1)
+    current = add_subscription(conn, '2025-01-01', '2025-12-31', 0)
+    conn.execute('''INSERT INTO service_requests (subscription_id, customer_id, scheduled_date, status)
+                    VALUES (?, 1, '2025-01-20', 'scheduled'), (?, 1, '2025-03-20', 'scheduled')''',
+                 (current, current))
+    beats = []
+
+    # Four 14-day terms catch the subscription up in one go
+    assert lifecycle.renew_subscriptions(conn, '2025-03-01', 2) == 1
+    assert lifecycle.renew_subscriptions(conn, '2025-03-01', 2) == 0
+    assert row(conn, 'SELECT start_date, end_date, status FROM subscriptions WHERE id = ?', renewing) == \
+        ('2025-02-26', '2025-03-12', 'active')
+
+    assert lifecycle.expire_subscriptions(conn, '2025-03-01', 2, heartbeat=lambda: beats.append(1)) == 5
+    assert len(beats) == 2
+    assert row(conn, "SELECT COUNT(*) FROM subscriptions WHERE status = 'expired'")[0] == len(expiring)
+    assert row(conn, "SELECT COUNT(*) FROM notifications WHERE type = 'subscription_expired'")[0] == 5
+    assert row(conn, "SELECT COUNT(*) FROM notifications WHERE type = 'subscription_renewed'")[0] == 1
+
+    assert lifecycle.mark_missed_visits(conn, '2025-03-01', 10) == 1
+    conn.execute("UPDATE subscriptions SET next_service_date = '2025-01-20' WHERE id = ?", (current,))
+    assert lifecycle.advance_next_service_dates(conn, '2025-03-01', 10) == 1
+    assert row(conn, 'SELECT next_service_date FROM subscriptions WHERE id = ?', current)[0] == '2025-03-20'
+
+
+def test_lease_is_exclusive_until_released_or_expired(database):
+    """Only one owner runs a job; the next run waits for its interval"""
+    conn = seed(database)
+    assert scheduler.acquire(conn, 'job', 'a', 60, now=1000)
+    assert not scheduler.acquire(conn, 'job', 'b', 60, now=1010)
+    assert scheduler.acquire(conn, 'job', 'a', 60, now=1010)
+    # A dead holder's lease lapses
+    assert scheduler.acquire(conn, 'job', 'b', 60, now=1100)
+    scheduler.finish(conn, 'job', 'b', 1100, 0.5, 7, None, next_run_at=2000)
+    assert not scheduler.acquire(conn, 'job', 'a', 60, now=1500)
+    assert scheduler.acquire(conn, 'job', 'a', 60, now=2000)
+
+
+def test_scheduler_runs_due_jobs_once_and_records_stats(database):
+    """A second scheduler finds nothing due; job_leases shows what ran"""
+    conn = seed(database)
+    for _ in range(3):
+        add_subscription(conn, '2025-01-01', '2025-01-31', 0)
+    first = scheduler.Scheduler(database, owner='first', batch_size=2)
+    second = scheduler.Scheduler(database, owner='second', batch_size=2)
+
+    ran = first.run_pending(today='2025-03-01')
+    assert ran['expire_subscriptions'] == 3 and set(ran) == {job.name for job in scheduler.JOBS}
+    assert second.run_pending(today='2025-03-01') == {}
+
+    jobs = {job['name']: job for job in scheduler.status(conn)}
+    assert jobs['expire_subscriptions']['owner'] == 'first'
+    assert jobs['expire_subscriptions']['runs'] == 1 and jobs['expire_subscriptions']['total_rows'] == 3
+    assert all(job['last_error'] is None for job in jobs.values())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the FTS5 services search index
+"""
+import sqlite3
+
+from search import create_search_index, match_expression, search_services
+
+
+def make_db():
+    conn = sqlite3.connect(':memory:', isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('''CREATE TABLE services (id INTEGER PRIMARY KEY, name TEXT, description TEXT,
+                    category TEXT, subcategory TEXT, is_active BOOLEAN DEFAULT 1,
+                    rating REAL DEFAULT 0, total_bookings INTEGER DEFAULT 0)''')
+    create_search_index(conn.cursor())
+    conn.executemany(
+        '''INSERT INTO services (name, description, category, subcategory, rating, total_bookings)
+           VALUES (?, ?, ?, ?, ?, ?)''',
+        [('Deep Cleaning Service', 'Professional deep cleaning', 'Cleaning', 'Deep Cleaning', 4.0, 10),
+         ('Carpet Cleaning Service', 'Carpet shampoo', 'Cleaning', 'Carpet Cleaning', 4.9, 500),
+         ('Leak Detection', 'Find and fix leaks', 'Plumbing', 'Leak Detection', 4.5, 40),
+         ('Lawn Care', 'Mowing and edging', 'Gardening', 'Lawn Care', 3.5, 5)])
+    return conn
+
+
+def test_match_expression():
+    """Terms are quoted and the last one is matched as a prefix"""
+    assert match_expression('deep clea') == '"deep" "clea"*'
+    assert match_expression('"; DROP TABLE') == '"DROP" "TABLE"*'
+    assert match_expression('  ') is None
+
+
+def test_prefix_search_and_category_filter():
+    """Type-ahead prefixes match and the category filter still applies"""
+    c = make_db().cursor()
+    names = [row['name'] for row in search_services(c, 'clea')]
+    assert set(names) == {'Deep Cleaning Service', 'Carpet Cleaning Service'}
+    assert search_services(c, 'clea', 'Plumbing') == []
+    assert [row['name'] for row in search_services(c, 'leak')] == ['Leak Detection']
+
+
+def test_rating_and_bookings_break_ties():
+    """With equal text relevance the better rated, busier service ranks first"""
+    c = make_db().cursor()
+    names = [row['name'] for row in search_services(c, 'cleaning service')]
+    assert names[0] == 'Carpet Cleaning Service'
+
+
+def test_index_follows_updates_and_deletes():
+    """The triggers keep the index in sync with the services table"""
+    conn = make_db()
+    c = conn.cursor()
+    conn.execute("UPDATE services SET name = 'Gutter Cleaning' WHERE name = 'Lawn Care'")
+    assert [row['name'] for row in search_services(c, 'gutter')] == ['Gutter Cleaning']
+    assert [row['name'] for row in search_services(c, 'mowing')] == ['Gutter Cleaning']
+
+    conn.execute("DELETE FROM services WHERE name = 'Leak Detection'")
+    assert search_services(c, 'leak') == []
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the pre-forked server: one worker, one writer, real sockets
+"""
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start(database, *options):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(HERE, 'serve.py'), '--database', database,
+                                '--port', str(port), '--no-scheduler', *options],
+                               cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError('serve.py did not start')
+
+
+def session_cookie(**session):
+    import app as app_module
+    serializer = app_module.app.session_interface.get_signing_serializer(app_module.app)
+    return f"{app_module.app.config['SESSION_COOKIE_NAME']}={serializer.dumps(session)}"
+
+
+def test_one_worker_serves_requests_while_an_event_stream_is_open(database):
+    """A dashboard's open /api/events stream does not block the worker's other requests"""
+    process, port = start(database, '--workers', '1')
+    try:
+        events = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        events.request('GET', '/api/events', headers={'Cookie': session_cookie(user_id=2, user_role='provider')})
+        stream = events.getresponse()
+        assert stream.status == 200 and stream.read1(64).startswith(b'retry:')
+
+        other = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        other.request('GET', '/api/categories')
+        assert other.getresponse().status == 200
+        events.close()
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(10)
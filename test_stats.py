@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for the trigger-maintained dashboard counters
+"""
+import sqlite3
+
+import stats
+from recurrence import materialize
+from manage import init_database
+
+
+def make_db(database):
+    import app as app_module
+    init_database(database)
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return app_module, conn
+
+
+def user_stats(conn, user_id):
+    row = conn.execute('SELECT * FROM user_stats WHERE user_id = ?', (user_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def test_counters_follow_every_write_path(database):
+    """Inserts, status changes, reassignments and deletes keep user_stats exact"""
+    _, conn = make_db(database)
+    c = conn.cursor()
+    c.execute('''INSERT INTO subscriptions (customer_id, service_id, start_date, end_date,
+                 frequency, preferred_time, status) VALUES (1, 1, '2025-03-01', '2025-04-30',
+                 'weekly', 'morning', 'pending')''')
+    sub = c.lastrowid
+    materialize(c, sub, today='2025-03-01', horizon_days=14)
+    c.execute("UPDATE subscriptions SET status = 'active' WHERE id = ?", (sub,))
+    c.execute('''INSERT INTO payments (subscription_id, amount, status)
+                 VALUES (?, 499.5, 'pending')''', (sub,))
+    payment = c.lastrowid
+    c.execute("UPDATE payments SET status = 'completed' WHERE id = ?", (payment,))
+
+    customer = user_stats(conn, 1)
+    assert customer['active_subscriptions'] >= 1
+    assert customer['next_upcoming_date'] <= '2025-03-01'
+
+    first = c.execute('SELECT MIN(id) FROM service_requests WHERE subscription_id = ?',
+                      (sub,)).fetchone()[0]
+    c.execute("UPDATE service_requests SET service_provider_id = 2, status = 'in_progress' WHERE id = ?",
+              (first,))
+    c.execute("UPDATE service_requests SET status = 'completed' WHERE id = ?", (first,))
+    c.execute("UPDATE service_requests SET service_provider_id = 2 WHERE subscription_id = ? AND id != ?",
+              (sub, first))
+    c.execute('DELETE FROM service_requests WHERE id = (SELECT MAX(id) FROM service_requests)')
+    c.execute('UPDATE services SET provider_id = 2 WHERE id = (SELECT MIN(id) FROM services)')
+    c.execute('DELETE FROM payments WHERE id = ?', (payment,))
+
+    assert stats.verify(conn) == []
+    assert user_stats(conn, 2)['completed_requests'] >= 1
+
+
+def test_verify_reports_drift_and_rebuild_repairs_it(database):
+    """A hand-edited counter is caught and rebuilt from the base tables"""
+    _, conn = make_db(database)
+    conn.execute('INSERT OR IGNORE INTO user_stats (user_id) VALUES (2)')
+    conn.execute('UPDATE user_stats SET total_services = total_services + 7 WHERE user_id = 2')
+    drift = stats.verify(conn)
+    assert [(user_id, name) for user_id, name, _, _ in drift] == [(2, 'total_services')]
+
+    stats.rebuild(conn)
+    assert stats.verify(conn) == []
+
+
+def test_dashboard_endpoint_reads_the_counters(database):
+    """/api/dashboard/stats returns the stored row for the session user"""
+    app_module, conn = make_db(database)
+    conn.execute('INSERT OR IGNORE INTO user_stats (user_id) VALUES (42)')
+    conn.execute('''UPDATE user_stats SET scheduled_requests = 3, completed_requests = 5,
+                    in_progress_requests = 1, total_services = 2 WHERE user_id = 42''')
+
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 42
+        sess['user_role'] = 'provider'
+    response = client.get('/api/dashboard/stats')
+    assert response.status_code == 200
+    assert response.get_json() == {'scheduled_requests': 3, 'completed_requests': 5,
+                                   'in_progress_requests': 1, 'total_services': 2}
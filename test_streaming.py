@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed JSON / NDJSON list responses
+"""
+import json
+import sqlite3
+
+from streaming import encode_rows
+from manage import init_database
+
+
+def make_client(database):
+    import app as app_module
+    init_database(database)
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.executemany('''INSERT INTO service_requests (subscription_id, customer_id, service_category,
+                                                      scheduled_date, status)
+                        VALUES (NULL, 1, 'Cleaning', ?, 'scheduled')''',
+                     [(f'2030-01-{day:02d}',) for day in range(1, 29)] * 3)
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['user_role'] = 'customer'
+    return app_module, client
+
+
+def test_encode_rows_in_batches():
+    """Batches are valid JSON once joined, with nothing lost at batch boundaries"""
+    conn = sqlite3.connect(':memory:')
+    for batch_size in (1, 2, 7, 100):
+        c = conn.execute('WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 7) '
+                         'SELECT x, x * 2 AS double FROM n')
+        chunks = list(encode_rows(c, 'json', batch_size))
+        assert json.loads(''.join(chunks)) == [{'x': x, 'double': x * 2} for x in range(1, 8)]
+    c = conn.execute('SELECT 1 AS x WHERE 0')
+    assert ''.join(encode_rows(c, 'json')) == '[]'
+    c = conn.execute("SELECT 'a\nb' AS text UNION ALL SELECT 'c'")
+    assert [json.loads(line) for line in ''.join(encode_rows(c, 'ndjson')).splitlines()] == \
+        [{'text': 'a\nb'}, {'text': 'c'}]
+
+
+def test_streamed_listing_matches_pages(database):
+    """?stream=json returns every row of the listing in page order and frees its connection"""
+    app_module, client = make_client(database)
+    paged, url = [], '/api/customer/service-requests?limit=10'
+    while url:
+        response = client.get(url)
+        paged += response.get_json()
+        url = response.headers.get('Link', '').partition('<')[2].partition('>')[0]
+    assert len(paged) == 84
+
+    response = client.get('/api/customer/service-requests?stream=json')
+    assert response.is_streamed and response.mimetype == 'application/json'
+    assert json.loads(response.get_data()) == paged
+    # The server closes the response when it is done with it, as a WSGI server would
+    response.close()
+    assert app_module.get_pool().stats()['in_use'] == 0
+    # HEAD never iterates the body, so the connection has to go back on close
+    response = client.head('/api/subscriptions?stream=json')
+    assert app_module.get_pool().stats()['in_use'] == 1
+    response.close()
+    assert app_module.get_pool().stats()['in_use'] == 0
+
+    cursor = client.get('/api/customer/service-requests?limit=80').headers['X-Next-Cursor']
+    response = client.get(f'/api/customer/service-requests?cursor={cursor}',
+                          headers={'Accept': 'application/x-ndjson'})
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == paged[80:]
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for ETags and conditional GETs on the polled endpoints
+"""
+import sqlite3
+
+import versions
+from manage import init_database
+
+
+def make_app(database):
+    import app as app_module
+    init_database(database)
+    conn = sqlite3.connect(database, isolation_level=None)
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['user_role'] = 'customer'
+    return client, conn
+
+
+def test_triggers_bump_only_the_affected_scopes(database):
+    """A notification for user 1 leaves user 2's counter alone"""
+    _, conn = make_app(database)
+    c = conn.cursor()
+    before = versions.current(c, ['notifications:1', 'notifications:2'])
+    c.execute("INSERT INTO notifications (user_id, title, message, type) VALUES (1, 't', 'm', 'info')")
+    after = versions.current(c, ['notifications:1', 'notifications:2'])
+    assert after['notifications:1'] == before['notifications:1'] + 1
+    assert after['notifications:2'] == before['notifications:2']
+
+
+def test_unchanged_listing_answers_304(database):
+    """Revalidating with the ETag returns 304 until a write touches the listing"""
+    client, conn = make_app(database)
+    first = client.get('/api/notifications')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag.startswith('W/')
+
+    again = client.get('/api/notifications', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+
+    conn.execute("INSERT INTO notifications (user_id, title, message, type) VALUES (1, 't', 'm', 'info')")
+    changed = client.get('/api/notifications', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+
+def test_etag_depends_on_query_and_user(database):
+    """Different pages and different users never share a validator"""
+    client, conn = make_app(database)
+    etag = client.get('/api/available-jobs').headers['ETag']
+    assert client.get('/api/available-jobs?limit=5',
+                      headers={'If-None-Match': etag}).status_code == 200
+
+    etag = client.get('/api/customer/service-requests').headers['ETag']
+    with client.session_transaction() as sess:
+        sess['user_id'] = 8
+    assert client.get('/api/customer/service-requests',
+                      headers={'If-None-Match': etag}).status_code == 200
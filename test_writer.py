@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Tests for write intents, group commits and the writer process protocol
+"""
+import multiprocessing
+import os
+import sqlite3
+import threading
+
+import claims
+import writer
+from events import Broker, JOBS_TOPIC
+
+
+def seed(database, jobs=0):
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.executemany('''INSERT INTO service_requests (customer_id, service_category, scheduled_date, status)
+                        VALUES (1, 'Cleaning', '2030-01-01', 'scheduled')''', [()] * jobs)
+    return conn
+
+
+@writer.intent('test_locked')
+def locked(c):
+    error = sqlite3.OperationalError('database table is locked')
+    error.sqlite_errorcode = 262  # SQLITE_LOCKED_SHAREDCACHE
+    raise error
+
+
+@writer.intent('test_explode')
+def explode(c, job_id):
+    c.execute("UPDATE service_requests SET status = 'cancelled' WHERE id = ?", (job_id,))
+    raise ValueError('boom')
+
+
+def start_server(path, **options):
+    address = os.path.join(os.path.dirname(path), 'writer.sock')
+    server = writer.WriterServer(path, address, **options)
+    ready = threading.Event()
+    threading.Thread(target=server.serve_forever, args=(ready,), daemon=True).start()
+    ready.wait(5)
+    return server, address
+
+
+def test_failing_intent_rolls_back_alone(database):
+    """One group transaction; the failing intent's savepoint is undone, the rest commit"""
+    conn = seed(database, jobs=3)
+    results = writer.commit_group(conn, [('claim_job', {'job_id': 1, 'provider_id': 5}),
+                                         ('test_explode', {'job_id': 2}),
+                                         ('claim_job', {'job_id': 1, 'provider_id': 6}),
+                                         ('claim_job', {'job_id': 3, 'provider_id': 6})])
+    assert [ok for ok, _ in results] == [True, False, True, True]
+    assert str(results[1][1]) == 'ValueError: boom' and not writer.is_busy(results[1][1])
+    assert results[2][1] == (claims.LOST, None)
+    assert conn.execute('SELECT id, status, service_provider_id FROM service_requests ORDER BY id').fetchall() == \
+        [(1, 'accepted', 5), (2, 'scheduled', None), (3, 'accepted', 6)]
+
+
+def test_concurrent_clients_share_group_commits(database):
+    """Claims from many threads arrive as fewer transactions than claims"""
+    conn = seed(database, jobs=80)
+    server, address = start_server(database, max_batch=16, max_wait=0.005)
+    clients = [writer.WriterClient(address) for _ in range(4)]
+    outcomes = []
+
+    def provider(i):
+        for job_id in range(1 + i, 81, 8):
+            outcomes.append(claims.claim_job(conn, job_id, 100 + i, client=clients[i % 4])[0])
+
+    threads = [threading.Thread(target=provider, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = clients[0].stats()
+    assert outcomes.count(claims.CLAIMED) == 80
+    assert stats['intents'] == 80 and stats['groups'] < 80
+    assert conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0] == 80
+    future = clients[1].submit('test_explode', job_id=1)
+    try:
+        future.result(5)
+        assert False, 'expected WriteFailed'
+    except writer.WriteFailed as e:
+        assert 'boom' in str(e) and not writer.is_busy(e)
+    # The SQLite error code survives the socket, so a busy failure is recognised by code
+    try:
+        clients[2].call('test_locked')
+        assert False, 'expected WriteFailed'
+    except writer.WriteFailed as e:
+        assert e.sqlite_errorcode == 262 and writer.is_busy(e)
+    server.close()
+
+
+def test_events_reach_every_worker(database):
+    """Events published by one worker, or by the writer itself, reach all workers under one id"""
+    server, address = start_server(database, broker=Broker())
+    workers = [writer.WriterClient(address, broker=Broker()) for _ in range(2)]
+    subscriptions = [client.broker.subscribe([JOBS_TOPIC])[0] for client in workers]
+
+    workers[0].publish(JOBS_TOPIC, 'job_created', {'id': 1})
+    assert [s.queue.get(timeout=5).type for s in subscriptions] == ['job_created'] * 2
+    server.broker.publish(JOBS_TOPIC, 'job_claimed', {'id': 1})
+    assert [s.queue.get(timeout=5).id for s in subscriptions] == [2, 2]
+    assert workers[1].broker.subscribe([JOBS_TOPIC], last_event_id=1)[1][0].type == 'job_claimed'
+    server.close()
+
+
+def test_endpoints_write_through_the_writer(database):
+    """With WRITER_ADDRESS set, orders, claims, payments and sign-ups are committed by the writer"""
+    import app as app_module
+    conn = seed(database, jobs=1)
+    conn.execute('''INSERT INTO services (id, name, category, price, discount_percentage)
+                    VALUES (1, 'Clean', 'Cleaning', 1000, 10)''')
+    server, address = start_server(database)
+    app_module.app.config['WRITER_ADDRESS'] = address
+    try:
+        client = app_module.app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 2
+            sess['user_role'] = 'provider'
+        order = client.post('/api/create-order', json={'service_id': 1, 'frequency': 'weekly',
+                                                       'start_date': '2030-01-01'}).get_json()
+        assert order['amount'] == 90000 and order['type'] == 'subscription'
+        assert client.post('/api/accept-job/1').status_code == 200
+        assert client.put('/api/service-requests/1', json={'status': 'in_progress'}).status_code == 200
+        assert conn.execute('SELECT status FROM service_requests WHERE id = 1').fetchone()[0] == 'in_progress'
+
+        with client.session_transaction() as sess:
+            sess['user_role'] = 'customer'
+        assert client.post('/api/verify-payment', json={'subscription_id': order['subscription_id'],
+                                                        'razorpay_order_id': order['order_id'],
+                                                        'razorpay_payment_id': 'pay_1'}).status_code == 200
+        assert client.delete(f"/api/subscriptions/{order['subscription_id']}").status_code == 200
+        assert client.post('/api/register', json={'name': 'New', 'email': 'new@example.com',
+                                                  'password': 'secret'}).status_code == 201
+        assert client.post('/api/register', json={'name': 'New', 'email': 'new@example.com',
+                                                  'password': 'secret'}).status_code == 400
+        assert conn.execute("SELECT razorpay_payment_id FROM payments WHERE razorpay_order_id = ?",
+                            (order['order_id'],)).fetchone()[0] == 'pay_1'
+        assert app_module.get_writer().stats()['intents'] == 7
+    finally:
+        app_module.app.config['WRITER_ADDRESS'] = None
+        server.close()
+
+
+def run_server(path, address):
+    writer.WriterServer(path, address).serve_forever()
+
+
+def start_server_process(path, address):
+    if os.path.exists(address):
+        os.unlink(address)
+    process = multiprocessing.get_context('fork').Process(target=run_server, args=(path, address), daemon=True)
+    process.start()
+    for _ in range(100):
+        if os.path.exists(address):
+            break
+        process.join(0.05)
+    return process
+
+
+def test_lost_writer_is_a_503_and_the_next_request_reconnects(database):
+    """Killing the writer fails the in-flight worker's request, not every later one"""
+    import app as app_module
+    conn = seed(database, jobs=2)
+    address = os.path.join(os.path.dirname(database), 'writer.sock')
+    process = start_server_process(database, address)
+    app_module.app.config['WRITER_ADDRESS'] = address
+    try:
+        client = app_module.app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 2
+            sess['user_role'] = 'provider'
+        assert client.post('/api/accept-job/1').status_code == 200
+
+        process.kill()
+        process.join(5)
+        assert client.post('/api/accept-job/2').status_code == 503
+        response = client.put('/api/service-requests/1', json={'status': 'in_progress'})
+        assert response.status_code == 503 and 'error' in response.get_json()
+
+        process = start_server_process(database, address)
+        assert client.post('/api/accept-job/2').status_code == 200
+        assert conn.execute("SELECT COUNT(*) FROM service_requests WHERE status = 'accepted'").fetchone()[0] == 2
+    finally:
+        app_module.app.config['WRITER_ADDRESS'] = None
+        process.kill()
+
+
+def test_batcher_groups_concurrent_writes_and_can_be_switched_off(database):
+    """Futures resolve after their group commits; WRITE_BATCHING = False writes inline"""
+    import app as app_module
+    conn = seed(database, jobs=40)
+    batcher = writer.WriteBatcher(database, max_batch=8, max_wait=0.01)
+    futures = [batcher.submit('claim_job', job_id=job_id, provider_id=5) for job_id in range(1, 41)]
+    assert [future.result(5)[0] for future in futures] == [claims.CLAIMED] * 40
+    stats = batcher.stats()
+    assert stats['intents'] == 40 and stats['groups'] < 40 and stats['largest_group'] <= 8
+    assert conn.execute("SELECT COUNT(*) FROM service_requests WHERE status = 'accepted'").fetchone()[0] == 40
+    batcher.stop()
+
+    client = app_module.app.test_client()
+    for batching in (True, False):
+        app_module.app.config['WRITE_BATCHING'] = batching
+        created = client.post('/api/customer/service-requests', json={
+            'service_category': 'Cleaning', 'location': 'Pune', 'scheduled_date': '2030-02-01',
+            'scheduled_time': '10:00'}).get_json()['request_id']
+        assert conn.execute('SELECT customer_id FROM service_requests WHERE id = ?', (created,)).fetchone() == (1,)
+    app_module.app.config['WRITE_BATCHING'] = True
+    assert app_module.app.extensions['write_batcher'].stats()['intents'] == 1
+
+
+def test_on_commit_runs_after_each_group(database):
+    """The writer process's hook sees the intents that committed and what they wrote"""
+    conn = seed(database, jobs=6)
+    committed = []
+
+    def on_commit(c, names):
+        committed.append(names)
+        c.execute("DELETE FROM service_requests WHERE status = 'accepted'")
+
+    batcher = writer.WriteBatcher(database, on_commit=on_commit)
+    assert batcher.call('claim_job', job_id=1, provider_id=5)[0] == claims.CLAIMED
+    assert batcher.submit('test_explode', job_id=2).exception(5) is not None
+    batcher.stop()
+    assert committed == [['claim_job'], []]
+    assert conn.execute('SELECT COUNT(*) FROM service_requests').fetchone()[0] == 5
@@ -0,0 +1,92 @@
+"""
+Change counters behind the ETags of the polled list endpoints.
+
+data_versions maps a scope ('notifications:<user>', 'requests:<customer>',
+'service_requests', ...) to a counter that triggers bump on every write to
+the rows it covers. An endpoint's ETag is derived from the counters of the
+scopes it reads, so "has anything changed?" costs one primary-key lookup per
+scope instead of running the query and hashing the body.
+"""
+import hashlib
+
+_CUSTOMER_OF = '(SELECT customer_id FROM subscriptions WHERE id = {row}.subscription_id)'
+
+
+def _bump(*scopes):
+    """Statement incrementing each non-NULL scope expression once"""
+    values = ', '.join(f'({scope})' for scope in scopes)
+    return f'''INSERT INTO data_versions (scope, version)
+        SELECT DISTINCT column1, 1 FROM (VALUES {values}) WHERE column1 IS NOT NULL
+        ON CONFLICT (scope) DO UPDATE SET version = version + 1;'''
+
+
+def _scope(prefix, expression):
+    return f"'{prefix}:' || {expression}"
+
+
+def _request_scopes(row):
+    # A request belongs to its own customer_id and to its subscription's owner
+    return (_scope('requests', f'{row}.customer_id'),
+            _scope('requests', _CUSTOMER_OF.format(row=row)))
+
+
+def _triggers(table, scopes, name=None):
+    """AFTER INSERT/UPDATE/DELETE triggers bumping scopes(row) for new and old rows"""
+    statements = []
+    for event, rows in (('INSERT', ('new',)), ('UPDATE', ('old', 'new')), ('DELETE', ('old',))):
+        bumped = [scope for row in rows for scope in scopes(row)]
+        statements.append(f'''CREATE TRIGGER IF NOT EXISTS data_versions_{name or table}_{event.lower()}
+            AFTER {event} ON {table} BEGIN
+            {_bump(*bumped)}
+        END''')
+    return statements
+
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS data_versions (
+        scope TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    ) WITHOUT ROWID''',
+    *_triggers('notifications', lambda row: (_scope('notifications', f'{row}.user_id'),)),
+    *_triggers('service_requests', lambda row: ("'service_requests'", *_request_scopes(row))),
+    *_triggers('payments', lambda row: (_scope('payments', _CUSTOMER_OF.format(row=row)),)),
+    # Frequency and preferred time show up in schedules, payments and the job feed
+    *_triggers('subscriptions', lambda row: ("'service_requests'",
+                                             _scope('requests', f'{row}.customer_id'),
+                                             _scope('payments', f'{row}.customer_id'))),
+    # Names and contact details are joined into most listings
+    *_triggers('services', lambda row: ("'services'",)),
+    *_triggers('users', lambda row: ("'users'",)),
+]
+
+
+# One service and one category, so a catalogue write only stales the cache entries that show it
+CATALOGUE_SCHEMA = _triggers('services', lambda row: (_scope('service', f'{row}.id'),
+                                                      _scope('category', f'{row}.category')),
+                             name='catalogue')
+
+
+def create_data_versions(c):
+    """Migration: create data_versions and the triggers that maintain it"""
+    for statement in SCHEMA:
+        c.execute(statement)
+
+
+def create_catalogue_versions(c):
+    """Migration: per-service and per-category counters behind the response cache"""
+    for statement in CATALOGUE_SCHEMA:
+        c.execute(statement)
+
+
+def current(c, scopes):
+    """{scope: version} for scopes; scopes never written to read as 0"""
+    scopes = list(scopes)
+    marks = ', '.join('?' * len(scopes))
+    found = dict(c.execute(f'SELECT scope, version FROM data_versions WHERE scope IN ({marks})',
+                           scopes).fetchall())
+    return {scope: found.get(scope, 0) for scope in scopes}
+
+
+def etag(*parts):
+    """Short opaque validator for the given parts (endpoint, user, args, versions)"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
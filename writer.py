@@ -0,0 +1,468 @@
+"""
+Write intents, group commit, and the single SQLite writer behind `python serve.py`.
+
+A write intent is a named function taking a cursor and keyword arguments.
+It runs its statements without opening or committing a transaction itself;
+register one with @intent('name'). When serve.py runs pre-forked workers,
+the workers do not write to SQLite themselves. They send intents over a
+Unix socket to one WriterServer process. That process owns the only write
+connection and commits whatever has queued up, up to max_batch intents
+within max_wait seconds, as one group transaction. Each intent runs in its
+own savepoint, so a failing intent is rolled back alone and the rest of its
+group still commits. Workers keep reading through WAL snapshots on their
+own pooled connections.
+
+The same socket carries server-sent events. A worker sends what it publishes
+to the writer, and the writer relays every event its broker numbers to all
+connected workers.
+
+In a single process (the debug server, tests) a WriteBatcher does the same
+group commit on a thread, and callers wait on a Future. With batching
+switched off, run() applies an intent on the caller's connection in a
+transaction of its own.
+"""
+import itertools
+import queue
+import random
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+from db_pool import PRAGMAS
+
+MAX_BATCH = 64
+MAX_WAIT = 0.002
+BUSY_RETRIES = 8
+BUSY_MAX_DELAY = 0.25
+
+INTENTS = {}
+
+
+def intent(name):
+    """Register fn(c, **params) as the write intent name"""
+    def register(fn):
+        INTENTS[name] = fn
+        return fn
+    return register
+
+
+class WriteFailed(Exception):
+    """An intent raised; the message names the original exception, sqlite_errorcode is its SQLite code if any"""
+
+    def __init__(self, message, sqlite_errorcode=None):
+        super().__init__(message)
+        self.sqlite_errorcode = sqlite_errorcode
+
+    @classmethod
+    def wrap(cls, error):
+        return cls(f'{type(error).__name__}: {error}', getattr(error, 'sqlite_errorcode', None))
+
+
+class WriterUnavailable(WriteFailed):
+    """The connection to the writer process was lost before the intent's result came back"""
+
+
+def is_busy(error):
+    """True for SQLITE_BUSY / SQLITE_LOCKED errors (extended codes included), or a WriteFailed carrying one"""
+    code = getattr(error, 'sqlite_errorcode', None)
+    return code is not None and (code & 0xff) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+def _begin(c, retries=BUSY_RETRIES):
+    # Another process (scheduler, dispatcher, a local write) may hold the lock
+    for attempt in range(retries + 1):
+        try:
+            c.execute('BEGIN IMMEDIATE')
+            return
+        except sqlite3.OperationalError as e:
+            if not is_busy(e) or attempt == retries:
+                raise
+            time.sleep(random.uniform(0, min(BUSY_MAX_DELAY, 0.005 * 2 ** attempt)))
+
+
+def commit_group(conn, batch, retries=BUSY_RETRIES):
+    """
+    Apply [(name, params)] in one transaction, each in its own savepoint.
+    Returns [(ok, result or WriteFailed)] in batch order. Raises
+    sqlite3.OperationalError when the lock stays busy through retries.
+    """
+    c = conn.cursor()
+    results = []
+    _begin(c, retries)
+    try:
+        for name, params in batch:
+            c.execute('SAVEPOINT intent')
+            try:
+                fn = INTENTS.get(name)
+                if fn is None:
+                    raise LookupError(f"Unknown write intent '{name}'")
+                results.append((True, fn(c, **params)))
+                c.execute('RELEASE intent')
+            except Exception as e:
+                c.execute('ROLLBACK TO intent')
+                c.execute('RELEASE intent')
+                results.append((False, WriteFailed.wrap(e)))
+        c.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            c.execute('ROLLBACK')
+        raise
+    return results
+
+
+def run(conn, name, params, retries=BUSY_RETRIES):
+    """Apply one intent on conn in its own transaction; raises WriteFailed"""
+    ok, value = commit_group(conn, [(name, params)], retries)[0]
+    if not ok:
+        raise value
+    return value
+
+
+def percentile_ms(values, p):
+    """The p-th percentile of sorted values (seconds), in milliseconds"""
+    if not values:
+        return 0.0
+    return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 3)
+
+
+class WriterStats:
+    """Group sizes, commit time and how long callers waited, over a recent window"""
+
+    def __init__(self, window=4096):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.groups = 0
+        self.intents = 0
+        self.failed = 0
+        self.largest_group = 0
+        self.commit_seconds = 0.0
+        self._commits = deque(maxlen=window)
+        self._waits = deque(maxlen=window)
+
+    def record(self, size, failed, seconds, waits):
+        with self._lock:
+            self.groups += 1
+            self.intents += size
+            self.failed += failed
+            self.largest_group = max(self.largest_group, size)
+            self.commit_seconds += seconds
+            self._commits.append(seconds)
+            self._waits.extend(waits)
+
+    def snapshot(self):
+        with self._lock:
+            commits = sorted(self._commits)
+            waits = sorted(self._waits)
+            uptime = time.monotonic() - self.started
+            counts = (self.groups, self.intents, self.failed, self.largest_group, self.commit_seconds)
+        groups, intents, failed, largest, commit_seconds = counts
+        return {
+            'groups': groups,
+            'intents': intents,
+            'failed': failed,
+            'mean_group_size': round(intents / groups, 2) if groups else 0.0,
+            'largest_group': largest,
+            'commit_seconds': round(commit_seconds, 6),
+            'intents_per_second': round(intents / uptime, 1) if uptime else 0.0,
+            'commit_p50_ms': percentile_ms(commits, 0.50),
+            'commit_p99_ms': percentile_ms(commits, 0.99),
+            'wait_p50_ms': percentile_ms(waits, 0.50),
+            'wait_p99_ms': percentile_ms(waits, 0.99),
+        }
+
+
+class WriteBatcher:
+    """
+    Group commit inside one process. submit() queues an intent and returns a
+    Future. A single thread commits whatever has queued as one transaction,
+    up to max_batch intents within max_wait seconds, and then resolves the
+    futures. Its connection runs synchronous=FULL, so a resolved future
+    means the row is on disk. The fsync is paid once per group.
+    """
+
+    def __init__(self, database, max_batch=MAX_BATCH, max_wait=MAX_WAIT, synchronous='FULL', on_commit=None):
+        self.database = database
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.synchronous = synchronous
+        # on_commit(conn, names) runs on the write thread after each group with the intents that committed
+        self.on_commit = on_commit
+        self.metrics = WriterStats()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def connect(self):
+        conn = sqlite3.connect(self.database, timeout=10.0, isolation_level=None, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        return conn
+
+    def submit(self, name, **params):
+        """Future resolving to the intent's result once its group has committed"""
+        if self._thread is None:
+            self.start()
+        future = Future()
+        self._queue.put((name, params, future, time.perf_counter()))
+        return future
+
+    def call(self, name, **params):
+        return self.submit(name, **params).result()
+
+    def _next_group(self):
+        group = [self._queue.get()]
+        # A lone write commits at once; only when others are already queued
+        # is the group held open for up to max_wait to collect more
+        while len(group) < self.max_batch and group[-1] is not None:
+            try:
+                group.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if len(group) == 1 or group[-1] is None:
+            return group
+        deadline = time.monotonic() + self.max_wait
+        while len(group) < self.max_batch and group[-1] is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                group.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return group
+
+    def _write_loop(self):
+        conn = self.connect()
+        stopping = False
+        while not stopping:
+            group = self._next_group()
+            if group[-1] is None:
+                stopping = True
+                group.pop()
+            if not group:
+                continue
+            start = time.perf_counter()
+            try:
+                results = commit_group(conn, [(name, params) for name, params, _, _ in group])
+            except Exception as e:
+                results = [(False, WriteFailed.wrap(e)) for _ in group]
+            done = time.perf_counter()
+            self.metrics.record(len(group), sum(not ok for ok, _ in results), done - start,
+                              [done - queued for _, _, _, queued in group])
+            for (_, _, future, _), (ok, value) in zip(group, results):
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+            if self.on_commit is not None:
+                try:
+                    self.on_commit(conn, [name for (name, _, _, _), (ok, _) in zip(group, results) if ok])
+                except Exception as e:
+                    print(f'Writer on_commit failed: {type(e).__name__}: {e}', file=sys.stderr)
+        conn.close()
+
+    def stats(self):
+        return self.metrics.snapshot()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name='write-batcher', daemon=True)
+                self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        """Commit what is queued and stop the thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def _outcome(future):
+    """(ok, value) to send back for a finished intent; a failure travels as (message, sqlite_errorcode)"""
+    error = future.exception()
+    if error is None:
+        return True, future.result()
+    return False, (str(error), getattr(error, 'sqlite_errorcode', None))
+
+
+class WriterServer:
+    """The one process that writes: intents in over a Unix socket, group commits out"""
+
+    def __init__(self, database, address, max_batch=MAX_BATCH, max_wait=MAX_WAIT, broker=None, on_commit=None):
+        self.database = database
+        self.address = address
+        self.batcher = WriteBatcher(database, max_batch, max_wait, on_commit=on_commit)
+        self.broker = broker
+        self._listener = None
+        self._replies = set()
+        self._events = queue.Queue()
+        if broker is not None:
+            broker.listen(self._events.put)
+
+    def _relay_events(self):
+        """Send every event the broker numbers to every worker, in id order"""
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            for reply in list(self._replies):
+                reply(None, 'event', (event.id, event.topic, event.type, event.data))
+
+    def _serve_client(self, client):
+        lock = threading.Lock()
+
+        def reply(request_id, ok, value):
+            with lock:
+                try:
+                    client.send((request_id, ok, value))
+                except OSError:
+                    pass  # the worker went away; its write still committed
+
+        self._replies.add(reply)
+        try:
+            while True:
+                request_id, name, params = client.recv()
+                if name == 'stats':
+                    reply(request_id, True, self.batcher.stats())
+                    continue
+                if name == 'publish':
+                    if self.broker is not None:
+                        self.broker.publish(**params)
+                    continue
+                future = self.batcher.submit(name, **params)
+                future.add_done_callback(lambda f, request_id=request_id: reply(request_id, *_outcome(f)))
+        except (EOFError, OSError):
+            pass
+        finally:
+            self._replies.discard(reply)
+            client.close()
+
+    def serve_forever(self, ready=None):
+        self._listener = Listener(self.address, family='AF_UNIX')
+        self.batcher.start()
+        if self.broker is not None:
+            threading.Thread(target=self._relay_events, name='event-relay', daemon=True).start()
+        if ready is not None:
+            ready.set()
+        try:
+            while True:
+                try:
+                    client = self._listener.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._serve_client, args=(client,), daemon=True).start()
+        finally:
+            self._events.put(None)
+            self.batcher.stop()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+
+
+class WriterClient:
+    """One per worker process; any number of request threads can submit at once"""
+
+    def __init__(self, address, timeout=30.0, broker=None):
+        self.address = address
+        self.timeout = timeout
+        # Receives the events the writer relays (see events.Broker.receive)
+        self.broker = broker
+        try:
+            self._conn = Client(address, family='AF_UNIX')
+        except OSError as e:
+            raise WriterUnavailable(f'Cannot reach the writer: {e}')
+        # False once the writer has gone away; app.get_writer() then connects again
+        self.connected = True
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._reader = threading.Thread(target=self._read_loop, name='writer-client', daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        try:
+            while True:
+                request_id, ok, value = self._conn.recv()
+                if request_id is None:
+                    if self.broker is not None:
+                        self.broker.receive(*value)
+                    continue
+                future = self._pending.pop(request_id, None)
+                if future is None:
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(WriteFailed(*value))
+        except (EOFError, OSError) as e:
+            self.connected = False
+            self._fail_pending(f'Writer connection lost: {e}')
+
+    def _fail_pending(self, message):
+        for request_id in list(self._pending):
+            future = self._pending.pop(request_id, None)
+            if future is not None:
+                future.set_exception(WriterUnavailable(message))
+
+    def _send(self, message):
+        if not self.connected:
+            raise WriterUnavailable('Writer connection lost')
+        try:
+            with self._send_lock:
+                self._conn.send(message)
+        except OSError as e:
+            self.connected = False
+            raise WriterUnavailable(f'Writer connection lost: {e}')
+
+    def submit(self, name, **params):
+        """Future resolving to the intent's result once its group has committed"""
+        future = Future()
+        request_id = next(self._ids)
+        self._pending[request_id] = future
+        try:
+            self._send((request_id, name, params))
+        except WriterUnavailable:
+            self._pending.pop(request_id, None)
+            raise
+        if not self.connected:
+            # The reader may have failed the pending futures just before this one was added
+            self._fail_pending('Writer connection lost')
+        return future
+
+    def call(self, name, **params):
+        return self.submit(name, **params).result(self.timeout)
+
+    def publish(self, topic, event_type, data):
+        """Publish an event through the writer, which relays it to every worker"""
+        self._send((None, 'publish', {'topic': topic, 'event_type': event_type, 'data': data}))
+
+    def stats(self):
+        return self.submit('stats').result(self.timeout)
+
+    def close(self):
+        self._conn.close()
+
+
+def serve(database, address, max_batch=MAX_BATCH, max_wait=MAX_WAIT, scheduler=True):
+    """Writer process entry point used by serve.py"""
+    # Registers the intents defined alongside the routes
+    import app
+    import events
+    app.DATABASE = database
+    if scheduler:
+        from scheduler import Scheduler
+        Scheduler(database).start()
+    # The workers only read; background writers run here, next to the scheduler
+    app.get_outbox()
+    server = WriterServer(database, address, max_batch, max_wait, broker=events.broker,
+                          on_commit=app.after_commit)
+    print(f'Writer listening on {address}', file=sys.stderr)
+    server.serve_forever()